@@ -1,7 +1,20 @@
+import streamlit as st
+
 from modules.controller import controller
+from modules.models import loader
+
+
+@st.cache_resource(show_spinner=False)
+def warm_up_default_model() -> None:
+    """Start warming up the default model, once per process.
+
+    Sessions that switch to another model warm it up from the settings.
+    """
+    loader.warm_up_default_model()
 
 
 def main() -> None:
+    warm_up_default_model()
     controller()
 
 
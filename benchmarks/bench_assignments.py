@@ -0,0 +1,136 @@
+"""
+Benchmark of the assigned totals lookups done by the assignment page
+
+Every rerun of the page gets the assigned total of each listed assignment and
+the differences of all items. This compares the kept index of the split
+managers with a scan of all assignments, as it was done before the index:
+
+    python -m benchmarks.bench_assignments [participants] [items]
+"""
+
+import random
+import sys
+import time
+from typing import Callable
+
+from modules.data.assignment_data import GroupData, SplitManager
+from modules.data.assignment_matrix import MatrixSplitManager
+from modules.data.receipt_data import ItemData, ReceiptData
+
+ASSIGNMENTS_PER_PARTICIPANT = 5
+NUM_RERUNS = 3
+
+
+def build_manager(
+    manager_class: type[SplitManager], num_participants: int, num_items: int
+) -> SplitManager:
+    """Build a manager with random assignments.
+
+    Args:
+        manager_class (type[SplitManager]): the split manager class
+        num_participants (int): number of participants
+        num_items (int): number of receipt items
+
+    Returns:
+        SplitManager: the manager with all assignments added
+    """
+    rng = random.Random(0)
+    items = [
+        ItemData(f"item {idx}", rng.randint(1, 10), rng.randint(100, 50000) / 100)
+        for idx in range(num_items)
+    ]
+    receipt = ReceiptData({item.id: item for item in items}, total=100000.0)
+    group_data = GroupData()
+    for idx in range(num_participants):
+        group_data.add(f"participant {idx}")
+    manager = manager_class(group_data, receipt)
+    for participant in manager.get_all_participants():
+        for item_id in rng.sample(manager.item_ids, ASSIGNMENTS_PER_PARTICIPANT):
+            manager.add_item_assignment(participant.id, item_id)
+    return manager
+
+
+def scan_assignment_total(manager: SplitManager, item_id: int) -> int:
+    """Count the assigned total of an item by scanning all assignments.
+
+    Args:
+        manager (SplitManager): the split manager
+        item_id (int): the item ID
+
+    Returns:
+        int: number of items already assigned from the item
+    """
+    total = 0
+    for participant in manager.get_all_participants():
+        for assigned in manager.get_participant_items_assignment_list(participant.id):
+            if assigned.item.id == item_id:
+                total += assigned.assigned_count
+    return total
+
+
+def simulate_rerun(
+    manager: SplitManager, get_total: Callable[[SplitManager, int], int]
+) -> None:
+    """Do the lookups of one rerun of the assignment page.
+
+    Args:
+        manager (SplitManager): the split manager
+        get_total (Callable[[SplitManager, int], int]): gets the assigned
+            total of an item
+    """
+    for participant in manager.get_all_participants():
+        for assigned in manager.get_participant_items_assignment_list(participant.id):
+            get_total(manager, assigned.item.id)
+    for item in manager.get_all_items():
+        get_total(manager, item.id)
+
+
+def measure(func: Callable[[], object]) -> float:
+    """Get the best time of a few runs.
+
+    Args:
+        func (Callable[[], object]): the measured function
+
+    Returns:
+        float: time in milliseconds
+    """
+    times = []
+    for _ in range(NUM_RERUNS):
+        started_at = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started_at)
+    return min(times) * 1000
+
+
+def main(num_participants: int = 500, num_items: int = 300) -> None:
+    """Print the time of a rerun for each way to get the assigned totals.
+
+    Args:
+        num_participants (int, optional): number of participants.
+            Defaults to 500.
+        num_items (int, optional): number of receipt items. Defaults to 300.
+    """
+    print(
+        f"{num_participants} participants x {num_items} items, "
+        f"{ASSIGNMENTS_PER_PARTICIPANT} assignments per participant"
+    )
+    managers = {}
+    for manager_class in (SplitManager, MatrixSplitManager):
+        started_at = time.perf_counter()
+        manager = build_manager(manager_class, num_participants, num_items)
+        build_ms = (time.perf_counter() - started_at) * 1000
+        assert manager.is_consistent()
+        managers[manager_class] = manager
+        index_ms = measure(
+            lambda: simulate_rerun(manager, type(manager).get_items_assignment_total)
+        )
+        print(f"{manager_class.__name__}: assignments added in {build_ms:.1f} ms")
+        print(f"  rerun with the index: {index_ms:.2f} ms")
+    # the assignment lists of SplitManager, as the scan was done before
+    manager = managers[SplitManager]
+    scan_ms = measure(lambda: simulate_rerun(manager, scan_assignment_total))
+    print(f"SplitManager rerun with a scan of all assignments: {scan_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,191 @@
+"""
+Comparison of the Donut inference precisions on a fixed receipt set
+
+Each precision is loaded in its own process, which reads every receipt of
+the set after a warm-up. The latency, the resident memory and the accuracy
+of the read fields are compared with fp32:
+
+    python -m benchmarks.bench_donut_precision [results.json]
+
+The set is made of the sample receipt, as it is and with a few deterministic
+changes of the photo. The Donut checkpoint is downloaded on the first run.
+The results are printed, and saved as JSON if a path is given.
+"""
+
+import json
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image, ImageEnhance, ImageOps
+
+from modules.data.receipt_data import ReceiptData
+from modules.errors import AIError
+from modules.models.base import InferencePrecision
+
+SAMPLE_RECEIPT = Path(__file__).parent.parent / "receipt1.jpg"
+SAMPLE_EXPECTED = {
+    "items": [
+        {"name": "Bintang Bremer", "count": 1, "total_price": 59000.0},
+        {"name": "Chicken H-H", "count": 1, "total_price": 190000.0},
+        {"name": "Ades", "count": 1, "total_price": 10000.0},
+    ],
+    "total": 302016.0,
+}
+# changes of the sample photo, like the photos taken by the users
+RECEIPT_VARIANTS: dict[str, Callable[[Image.Image], Image.Image]] = {
+    "original": lambda image: image,
+    "half size": lambda image: image.resize((image.width // 2, image.height // 2)),
+    "grayscale": lambda image: ImageOps.grayscale(image).convert("RGB"),
+    "rotated": lambda image: image.rotate(3, expand=True, fillcolor="white"),
+    "dark": lambda image: ImageEnhance.Brightness(image).enhance(0.6),
+}
+NUM_RUNS = 3
+# allowed difference of the read prices
+PRICE_TOLERANCE = 0.5
+
+
+def load_receipt_set() -> dict[str, Image.Image]:
+    """Load the receipts of the set.
+
+    Returns:
+        dict[str, Image.Image]: the receipt images by name
+    """
+    sample = Image.open(SAMPLE_RECEIPT).convert("RGB")
+    return {name: change(sample) for name, change in RECEIPT_VARIANTS.items()}
+
+
+def score_reading(reading: ReceiptData | AIError, expected: dict) -> float:
+    """Get the ratio of the expected fields that have been read correctly.
+
+    The fields are the name, count and price of every item, and the total.
+    An item is matched by its name, ignoring the case and the spaces.
+
+    Args:
+        reading (ReceiptData | AIError): the reading, or the reading error
+        expected (dict): the expected reading, like ReceiptData.to_dict
+
+    Returns:
+        float: the field accuracy, from 0 to 1
+    """
+    num_fields = 3 * len(expected["items"]) + 1
+    if isinstance(reading, AIError):
+        return 0.0
+    unmatched = list(reading.items.values())
+    correct = int(abs(reading.total - expected["total"]) <= PRICE_TOLERANCE)
+    for expected_item in expected["items"]:
+        name = _normalize_name(expected_item["name"])
+        item = next((it for it in unmatched if _normalize_name(it.name) == name), None)
+        if item is None:
+            continue
+        unmatched.remove(item)
+        correct += 1
+        correct += int(item.count == expected_item["count"])
+        is_price_ok = abs(item.total_price - expected_item["total_price"])
+        correct += int(is_price_ok <= PRICE_TOLERANCE)
+    return correct / num_fields
+
+
+def _normalize_name(name: str) -> str:
+    """Normalize an item name for the matching.
+
+    Args:
+        name (str): the item name
+
+    Returns:
+        str: lower case name without spaces
+    """
+    return "".join(name.lower().split())
+
+
+def _rss_mb() -> float:
+    """Get the current resident memory of this process.
+
+    Returns:
+        float: resident memory in MB
+    """
+    with open("/proc/self/statm") as statm:
+        resident_pages = int(statm.read().split()[1])
+    return resident_pages * resource.getpagesize() / 2**20
+
+
+def measure_precision(precision: InferencePrecision) -> dict:
+    """Load Donut with a precision and read the receipt set.
+
+    Runs in a fresh process, so the memory of other precisions is not
+    counted.
+
+    Args:
+        precision (InferencePrecision): the inference precision
+
+    Returns:
+        dict: the measurements
+    """
+    from modules.models.donut import DonutModel
+
+    receipts = load_receipt_set()
+    started_at = time.perf_counter()
+    model = DonutModel(precision)
+    load_seconds = time.perf_counter() - started_at
+    model.warm_up()
+
+    latencies: dict[str, float] = {}
+    accuracies: dict[str, float] = {}
+    for name, image in receipts.items():
+        times = []
+        for _ in range(NUM_RUNS):
+            started_at = time.perf_counter()
+            reading = model.run_batch([image])[0]
+            times.append(time.perf_counter() - started_at)
+        latencies[name] = statistics.median(times)
+        accuracies[name] = score_reading(reading, SAMPLE_EXPECTED)
+    return {
+        "precision": precision.name,
+        "load_seconds": load_seconds,
+        "weights_mb": model.memory_usage() / 2**20,
+        "rss_mb": _rss_mb(),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10,
+        "median_latency_seconds": statistics.median(latencies.values()),
+        "mean_accuracy": statistics.mean(accuracies.values()),
+        "latency_seconds": latencies,
+        "accuracy": accuracies,
+    }
+
+
+def main(results_path: str | None = None) -> None:
+    """Measure every precision and print the comparison with fp32.
+
+    Args:
+        results_path (str | None, optional): path where the results are
+            saved as JSON. Defaults to None.
+    """
+    results = []
+    for precision in InferencePrecision:
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+            results.append(executor.submit(measure_precision, precision).result())
+
+    baseline = results[0]
+    print(
+        f"{'precision':<10}{'latency (s)':>14}{'speedup':>10}"
+        f"{'RSS (MB)':>11}{'peak (MB)':>11}{'weights (MB)':>14}{'accuracy':>10}"
+    )
+    for result in results:
+        speedup = baseline["median_latency_seconds"] / result["median_latency_seconds"]
+        print(
+            f"{result['precision']:<10}"
+            f"{result['median_latency_seconds']:>14.2f}{speedup:>9.2f}x"
+            f"{result['rss_mb']:>11.0f}{result['peak_rss_mb']:>11.0f}"
+            f"{result['weights_mb']:>14.0f}{result['mean_accuracy']:>10.1%}"
+        )
+    if results_path is not None:
+        with open(results_path, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,178 @@
+"""
+Benchmark of the memory and construction time of the data records
+
+Compares the slotted records of the receipt, assignment and report data with
+the plain dataclasses used before and with their frozen variants, on the
+records of a large session:
+
+    python -m benchmarks.bench_records [records]
+"""
+
+import pickle
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Callable
+
+import pandas as pd
+
+from modules.data.assignment_data import (
+    AssignedItemData,
+    FrozenParticipantData,
+    ParticipantData,
+)
+from modules.data.receipt_data import FrozenItemData, ItemData, ReceiptData
+from modules.data.report_data import (
+    FrozenPurchasedItemReportData,
+    PurchasedItemReportData,
+)
+
+NUM_RUNS = 7
+
+
+@dataclass
+class PlainItemData:
+    """ItemData as it was before, without slots."""
+
+    name: str
+    count: int
+    total_price: float
+
+    id: int = 0
+
+
+@dataclass
+class PlainAssignedItemData:
+    """AssignedItemData as it was before, without slots."""
+
+    item: PlainItemData
+    assigned_count: int = 0
+
+    id: int = 0
+    on_count_change: Callable[[int, int], None] | None = field(
+        default=None, repr=False, compare=False
+    )
+
+
+@dataclass
+class PlainParticipantData:
+    """ParticipantData as it was before, without slots."""
+
+    name: str
+
+    id: int = 0
+
+
+@dataclass
+class PlainPurchasedItemReportData:
+    """PurchasedItemReportData as it was before, without slots."""
+
+    item_id: int
+    name: str
+    purchased_count: int
+    unit_price: float
+
+
+def build_records(
+    num: int,
+    item_class: type,
+    assigned_class: type,
+    participant_class: type,
+    purchased_class: type,
+) -> list:
+    """Build the records of a session with the given classes.
+
+    Args:
+        num (int): number of records of each class
+        item_class (type): class of the receipt items
+        assigned_class (type): class of the item assignments
+        participant_class (type): class of the participants
+        purchased_class (type): class of the report items
+
+    Returns:
+        list: all records
+    """
+    items = [item_class(f"item {idx}", 2, 10.0 + idx, id=idx) for idx in range(num)]
+    return [
+        *items,
+        *(assigned_class(item, assigned_count=1, id=item.id) for item in items),
+        *(participant_class(f"participant {idx}", id=idx) for idx in range(num)),
+        *(purchased_class(item.id, item.name, 1, 5.0) for item in items),
+    ]
+
+
+def measure(func: Callable[[], object]) -> tuple[float, float, object]:
+    """Get the best time of a few runs, and the memory allocated by the last one.
+
+    Args:
+        func (Callable[[], object]): the measured function
+
+    Returns:
+        tuple[float, float, object]: time in milliseconds, memory in MB kept
+            by the result, and the result
+    """
+    times = []
+    for _ in range(NUM_RUNS):
+        started_at = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started_at)
+    tracemalloc.start()
+    result = func()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return min(times) * 1000, memory / 2**20, result
+
+
+def main(num: int = 10000) -> None:
+    """Print the time, memory and pickle size of both kinds of records.
+
+    Args:
+        num (int, optional): number of records of each class. Defaults to
+            10000.
+    """
+    print(f"{num} records of each class, {4 * num} in total")
+    variants = {
+        "plain dataclasses": (
+            PlainItemData,
+            PlainAssignedItemData,
+            PlainParticipantData,
+            PlainPurchasedItemReportData,
+        ),
+        "slotted dataclasses": (
+            ItemData,
+            AssignedItemData,
+            ParticipantData,
+            PurchasedItemReportData,
+        ),
+        "frozen variants": (
+            FrozenItemData,
+            AssignedItemData,
+            FrozenParticipantData,
+            FrozenPurchasedItemReportData,
+        ),
+    }
+    for variant, classes in variants.items():
+        build_ms, memory_mb, records = measure(lambda: build_records(num, *classes))
+        pickle_ms, _, pickled = measure(lambda: pickle.dumps(records))
+        load_ms, _, _ = measure(lambda: pickle.loads(pickled))
+        print(
+            f"{variant}: built in {build_ms:.1f} ms, {memory_mb:.2f} MB, "
+            f"pickled in {pickle_ms:.1f} ms, {len(pickled) / 2**20:.2f} MB, "
+            f"loaded in {load_ms:.1f} ms"
+        )
+
+    items = [ItemData(f"item {idx}", 2, 10.0 + idx) for idx in range(num)]
+    plain_items = [PlainItemData(it.name, it.count, it.total_price) for it in items]
+    asdict_ms, _, _ = measure(lambda: pd.DataFrame([asdict(it) for it in plain_items]))
+    columns_ms, _, _ = measure(
+        lambda: ReceiptData({it.id: it for it in items}, total=0.0).to_items_df()
+    )
+    print(
+        f"items DataFrame: {asdict_ms:.1f} ms through asdict, "
+        f"{columns_ms:.1f} ms from columns"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
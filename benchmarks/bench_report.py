@@ -0,0 +1,139 @@
+"""
+Benchmark of the report computation on large synthetic groups
+
+Compares ReportData.from_split_manager with the report as it was computed
+before, one participant at a time with floats, and shows how far the sum of
+the participants totals is from the receipt total for each of them. Both
+spend most of their time creating the item reports, the exact minor units
+computation is not expected to be faster:
+
+    python -m benchmarks.bench_report [participants] [items]
+"""
+
+import random
+import sys
+import time
+
+from modules.data.assignment_data import GroupData, SplitManager
+from modules.data.receipt_data import ItemData, ReceiptData
+from modules.data.report_data import (
+    ParticipantReportData,
+    PurchasedItemReportData,
+    ReportData,
+)
+
+ASSIGNMENTS_PER_PARTICIPANT = 5
+CURRENCY = "USD"
+NUM_RUNS = 5
+
+
+def build_manager(num_participants: int, num_items: int) -> SplitManager:
+    """Build a manager with every item fully assigned.
+
+    Args:
+        num_participants (int): number of participants
+        num_items (int): number of receipt items
+
+    Returns:
+        SplitManager: the manager with all assignments added
+    """
+    rng = random.Random(0)
+    items = [
+        ItemData(f"item {idx}", rng.randint(1, 5), rng.randint(100, 50000) / 100)
+        for idx in range(num_items)
+    ]
+    subtotal = sum(item.total_price for item in items)
+    # with tax and service, and rounded to cents like a printed receipt
+    receipt = ReceiptData(
+        {item.id: item for item in items}, total=round(subtotal * 1.155, 2)
+    )
+    group_data = GroupData()
+    for idx in range(num_participants):
+        group_data.add(f"participant {idx}")
+    manager = SplitManager(group_data, receipt)
+    participants = manager.get_all_participants()
+    for item in items:
+        for _ in range(item.count):
+            manager.add_item_assignment(rng.choice(participants).id, item.id)
+    return manager
+
+
+def previous_report(manager: SplitManager) -> list[ParticipantReportData]:
+    """Compute the participants reports as they were before.
+
+    Args:
+        manager (SplitManager): the split manager
+
+    Returns:
+        list[ParticipantReportData]: report of each participant
+    """
+    receipt_subtotal = manager.receipt_data.subtotal
+    receipt_total = manager.receipt_data.total
+    reports = []
+    for participant in manager.get_all_participants():
+        purchased_items = [
+            PurchasedItemReportData.from_item_assignment_data(it)
+            for it in manager.get_participant_items_assignment_list(participant.id)
+        ]
+        subtotal = sum(it.total for it in purchased_items)
+        reports.append(
+            ParticipantReportData(
+                participant_id=participant.id,
+                name=participant.name,
+                purchased_items=purchased_items,
+                purchased_subtotal=subtotal,
+                purchased_total=(subtotal / receipt_subtotal) * receipt_total,
+            )
+        )
+    return reports
+
+
+def measure(func) -> tuple[float, object]:
+    """Get the best time of a few runs and the result of the last one.
+
+    Args:
+        func (Callable[[], object]): the measured function
+
+    Returns:
+        tuple[float, object]: time in milliseconds, and the result
+    """
+    times = []
+    for _ in range(NUM_RUNS):
+        started_at = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started_at)
+    return min(times) * 1000, result
+
+
+def main(num_participants: int = 500, num_items: int = 300) -> None:
+    """Print the time and the total error of both report computations.
+
+    Args:
+        num_participants (int, optional): number of participants.
+            Defaults to 500.
+        num_items (int, optional): number of receipt items. Defaults to 300.
+    """
+    manager = build_manager(num_participants, num_items)
+    receipt_total = manager.receipt_data.total
+    print(f"{num_participants} participants x {num_items} items")
+
+    previous_ms, previous = measure(lambda: previous_report(manager))
+    # shown in the report page rounded to cents
+    previous_sum = sum(round(r.purchased_total, 2) for r in previous)
+    print(
+        f"previous, floats per participant: {previous_ms:.2f} ms, "
+        f"displayed totals off by {round(previous_sum - receipt_total, 2) + 0.0:+.2f}"
+    )
+
+    report_ms, report = measure(
+        lambda: ReportData.from_split_manager(manager, CURRENCY)
+    )
+    report_sum = sum(r.purchased_total for r in report.participants_reports)
+    report_error = round(report_sum - receipt_total, 2) + 0.0
+    print(
+        f"exact minor units: {report_ms:.2f} ms, " f"totals off by {report_error:+.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -9,7 +9,7 @@ import streamlit as st
 
 from .data import session_data
 from .data.report_data import ReportData
-from .models.loader import get_model
+from .models.loader import get_model, is_model_ready
 from .utils import SettingsError
 from .views import (
     view_1_receipt_upload,
@@ -118,17 +118,31 @@ def view_2_done_func() -> None:
     manager = session_data.split_manager.get()
     if manager is None:
         return
-    session_data.report.set(ReportData.from_split_manager(manager))
+    session_data.report.set(
+        ReportData.from_split_manager(manager, session_data.currency.get())
+    )
+
+
+@st.fragment(run_every=2)
+def model_warm_up_view() -> None:
+    """Element that shows the model is warming up, refresh the app once ready."""
+    if is_model_ready():
+        st.rerun(scope="app")
+    st.info("Model is warming up...", icon=":material/hourglass_top:")
 
 
 def main_view() -> None:
     """Main page view."""
-    model = get_model()
+    model = None
+    if is_model_ready():
+        model = get_model()
+    else:
+        model_warm_up_view()
     section_selection_view()
     current_page = session_data.current_page.get()
 
     page_options = {
-        1: functools.partial(view_1_receipt_upload.controller, model.run),
+        1: functools.partial(view_1_receipt_upload.controller, model),
         2: view_2_assign_participants.controller,
         3: functools.partial(view_3_report.controller, session_data.report.get()),
     }
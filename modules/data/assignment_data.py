@@ -1,7 +1,10 @@
+import functools
+import math
 from dataclasses import dataclass, field
+from typing import Callable
 
-from .base import IDGenerator
-from .receipt_data import ItemData, ReceiptData
+from .base import IDGenerator, Record, frozen_variant
+from .receipt_data import ItemData, ItemsEdit, ReceiptData
 
 
 class AssignedItemIDGenerator(IDGenerator):
@@ -16,14 +19,32 @@ class ParticipantIDGenerator(IDGenerator):
     pass
 
 
-@dataclass
-class AssignedItemData:
+def get_unit_price(item: ItemData) -> float:
+    """Get unit price of an item, which is 0 if the item has no count.
+
+    Args:
+        item (ItemData): the item data
+
+    Returns:
+        float: item's unit price
+    """
+    if item.count == 0:
+        return 0.0
+    return item.unit_price
+
+
+@dataclass(slots=True)
+class AssignedItemData(Record):
     """Class that handles item assignment."""
 
     item: ItemData
     assigned_count: int = 0
 
     id: int = field(default_factory=AssignedItemIDGenerator.get)
+    # called with the item ID and the count difference when the count is set
+    on_count_change: Callable[[int, int], None] | None = field(
+        default=None, repr=False, compare=False
+    )
 
     def set_count(self, count: int) -> None:
         """Set number of item assigned in this data.
@@ -31,11 +52,14 @@ class AssignedItemData:
         Args:
             count (int): number of item
         """
+        difference = count - self.assigned_count
         self.assigned_count = count
+        if self.on_count_change is not None:
+            self.on_count_change(self.item.id, difference)
 
 
-@dataclass
-class ParticipantData:
+@dataclass(slots=True)
+class ParticipantData(Record):
     """Class that handles data about a participant."""
 
     name: str
@@ -43,6 +67,9 @@ class ParticipantData:
     id: int = field(default_factory=ParticipantIDGenerator.get)
 
 
+FrozenParticipantData = frozen_variant(ParticipantData)
+
+
 @dataclass
 class GroupData:
     """Class that contains data about collection of participants."""
@@ -89,6 +116,13 @@ class SplitManager:
         self.group_data = group_data
         self.receipt_data = receipt_data
         self.participant_assignments: dict[int, list[AssignedItemData]] = {}
+        # total assigned count of each item, kept up to date by the assignments
+        self._assigned_totals: dict[int, int] = {}
+        # assigned subtotal of each participant and of all of them, kept up
+        # to date by the assignments
+        self._participant_subtotals: dict[int, float] = {}
+        self._assigned_subtotal = 0.0
+        self._receipt_subtotal = receipt_data.subtotal
 
     @property
     def item_ids(self) -> list[int]:
@@ -134,7 +168,50 @@ class SplitManager:
         """
         self.group_data.remove(participant_id)
         if participant_id in self.participant_assignments:
-            self.participant_assignments.pop(participant_id)
+            for assigned_item in self.participant_assignments.pop(participant_id):
+                self._detach_assignment(participant_id, assigned_item)
+        self._drop_participant_subtotal(participant_id)
+
+    def get_participant_subtotal(self, participant_id: int) -> float:
+        """Get price of the items currently assigned to a participant.
+
+        Args:
+            participant_id (int): participant ID
+
+        Returns:
+            float: the participant subtotal
+        """
+        return self._participant_subtotals.get(participant_id, 0.0)
+
+    def get_participant_total(self, participant_id: int) -> float:
+        """Get the current share of a participant in the receipt total.
+
+        The receipt total, which includes tax, discount, etc., is split
+        proportionally to the participants subtotal.
+
+        Args:
+            participant_id (int): participant ID
+
+        Returns:
+            float: the participant total
+        """
+        return self._get_total_share(self.get_participant_subtotal(participant_id))
+
+    def get_assigned_subtotal(self) -> float:
+        """Get price of all items currently assigned to any participant.
+
+        Returns:
+            float: the assigned subtotal
+        """
+        return self._assigned_subtotal
+
+    def get_assigned_total(self) -> float:
+        """Get the share of the receipt total that is currently assigned.
+
+        Returns:
+            float: the assigned total
+        """
+        return self._get_total_share(self._assigned_subtotal)
 
     def get_items_assignment_total(self, item_id: int) -> int:
         """Get total count of an item that is already assigned to any participant.
@@ -145,14 +222,43 @@ class SplitManager:
         Returns:
             int: number items already assigned from the item
         """
-        total = 0
-        for _, assigned_items in self.participant_assignments.items():
-            total += sum(
-                assigned_item.assigned_count
-                for assigned_item in assigned_items
-                if assigned_item.item.id == item_id
+        return self._assigned_totals.get(item_id, 0)
+
+    def get_assignment_differences(self) -> dict[int, int]:
+        """Get the not assigned count of every item.
+
+        Returns:
+            dict[int, int]: purchased count minus assigned count, by item ID,
+                negative if the item is assigned more than purchased
+        """
+        return {
+            item.id: item.count - self.get_items_assignment_total(item.id)
+            for item in self.get_all_items()
+        }
+
+    def is_consistent(self) -> bool:
+        """Check the assigned totals against a full count of the assignments.
+
+        Returns:
+            bool: True if the totals of all items are correct
+        """
+        totals: dict[int, int] = {}
+        for assigned_items in self.participant_assignments.values():
+            for assigned_item in assigned_items:
+                item_id = assigned_item.item.id
+                totals[item_id] = totals.get(item_id, 0) + assigned_item.assigned_count
+        is_totals_ok = {k: v for k, v in totals.items() if v != 0} == {
+            k: v for k, v in self._assigned_totals.items() if v != 0
+        }
+        is_subtotals_ok = all(
+            math.isclose(
+                sum(it.assigned_count * get_unit_price(it.item) for it in items),
+                self.get_participant_subtotal(participant_id),
+                abs_tol=1e-6,
             )
-        return total
+            for participant_id, items in self.participant_assignments.items()
+        )
+        return is_totals_ok and is_subtotals_ok
 
     def get_participant_items_assignment_list(
         self, participant_id: int
@@ -178,8 +284,13 @@ class SplitManager:
         """
         participant_items = self.get_participant_items_assignment_list(participant_id)
         participant_items.append(
-            AssignedItemData(self.get_item(item_id), assigned_count=1)
+            AssignedItemData(
+                self.get_item(item_id),
+                assigned_count=1,
+                on_count_change=functools.partial(self._change_count, participant_id),
+            )
         )
+        self._change_count(participant_id, item_id, 1)
 
     def remove_items_assignment(
         self, participant_id: int, item_idxs: list[int]
@@ -191,5 +302,119 @@ class SplitManager:
             item_idxs (list[int]): item assignment IDs to be removed
         """
         participant_items = self.get_participant_items_assignment_list(participant_id)
-        for idx in item_idxs:
-            participant_items.pop(idx)
+        # from the last one, so the next indexes are not shifted
+        for idx in sorted(item_idxs, reverse=True):
+            self._detach_assignment(participant_id, participant_items.pop(idx))
+
+    def sync_items(self, edit: ItemsEdit) -> None:
+        """Update the assignments after the receipt items have been edited.
+
+        Assignments of removed items are removed, and assignments of edited
+        items get the new item data. Other assignments are kept.
+
+        Args:
+            edit (ItemsEdit): the changed items
+        """
+        self._receipt_subtotal = self.receipt_data.subtotal
+        edited = set(edit.edited)
+        removed = set(edit.removed)
+        if len(edited) == 0 and len(removed) == 0:
+            return
+        for participant_id, participant_items in self.participant_assignments.items():
+            kept_items = []
+            for assigned_item in participant_items:
+                item_id = assigned_item.item.id
+                if item_id in removed:
+                    self._detach_assignment(participant_id, assigned_item)
+                    continue
+                if item_id in edited:
+                    new_item = self.get_item(item_id)
+                    price_change = get_unit_price(new_item) - get_unit_price(
+                        assigned_item.item
+                    )
+                    self._update_participant_subtotal(
+                        participant_id, assigned_item.assigned_count * price_change
+                    )
+                    assigned_item.item = new_item
+                kept_items.append(assigned_item)
+            participant_items[:] = kept_items
+        for item_id in removed:
+            self._assigned_totals.pop(item_id, None)
+
+    def _change_count(self, participant_id: int, item_id: int, difference: int) -> None:
+        """Apply a change of the assigned count of an item.
+
+        Args:
+            participant_id (int): participant ID
+            item_id (int): the item ID
+            difference (int): change of the assigned count
+        """
+        self._update_assigned_total(item_id, difference)
+        self._update_participant_subtotal(
+            participant_id, difference * get_unit_price(self.get_item(item_id))
+        )
+
+    def _update_participant_subtotal(
+        self, participant_id: int, difference: float
+    ) -> None:
+        """Update the assigned subtotal of a participant.
+
+        Args:
+            participant_id (int): participant ID
+            difference (float): change of the subtotal
+        """
+        self._participant_subtotals[participant_id] = (
+            self._participant_subtotals.get(participant_id, 0.0) + difference
+        )
+        self._assigned_subtotal += difference
+
+    def _drop_participant_subtotal(self, participant_id: int) -> None:
+        """Remove the subtotal of a removed participant.
+
+        Args:
+            participant_id (int): participant ID
+        """
+        self._assigned_subtotal -= self._participant_subtotals.pop(participant_id, 0.0)
+
+    def _get_total_share(self, subtotal: float) -> float:
+        """Get the share of the receipt total that belongs to a subtotal.
+
+        Args:
+            subtotal (float): the assigned subtotal
+
+        Returns:
+            float: the share of the receipt total, 0 if the receipt has no
+                subtotal
+        """
+        if self._receipt_subtotal == 0:
+            return 0.0
+        return subtotal * self.receipt_data.total / self._receipt_subtotal
+
+    def _update_assigned_total(self, item_id: int, difference: int) -> None:
+        """Update the total assigned count of an item.
+
+        Args:
+            item_id (int): the item ID
+            difference (int): change of the assigned count
+        """
+        self._assigned_totals[item_id] = (
+            self._assigned_totals.get(item_id, 0) + difference
+        )
+
+    def _detach_assignment(
+        self, participant_id: int, assigned_item: AssignedItemData
+    ) -> None:
+        """Remove an item assignment from the assigned totals.
+
+        Args:
+            participant_id (int): participant ID
+            assigned_item (AssignedItemData): the removed item assignment
+        """
+        self._update_assigned_total(
+            assigned_item.item.id, -assigned_item.assigned_count
+        )
+        self._update_participant_subtotal(
+            participant_id,
+            -assigned_item.assigned_count * get_unit_price(assigned_item.item),
+        )
+        assigned_item.on_count_change = None
@@ -0,0 +1,248 @@
+import functools
+
+import numpy as np
+
+from .assignment_data import (
+    AssignedItemData,
+    GroupData,
+    SplitManager,
+    get_unit_price,
+)
+from .receipt_data import ItemsEdit, ReceiptData
+
+
+class MatrixSplitManager(SplitManager):
+    """Split manager that stores the assignments in a participant x item matrix.
+
+    A participant has at most one assignment per item. The views get the
+    assignments as AssignedItemData objects, setting their count writes it
+    back to the matrix.
+    """
+
+    def __init__(self, group_data: GroupData, receipt_data: ReceiptData) -> None:
+        """Initialize the data.
+
+        Args:
+            group_data (GroupData): participants data
+            receipt_data (ReceiptData): receipt data from AI reading
+        """
+        super().__init__(group_data, receipt_data)
+        self._items = self.get_all_items()
+        self._item_indexes = {item.id: idx for idx, item in enumerate(self._items)}
+        self._item_counts = np.array([it.count for it in self._items], dtype=np.int64)
+        self._unit_prices = np.array([get_unit_price(it) for it in self._items])
+        self._participant_indexes: dict[int, int] = {}
+        # assigned count of each participant (rows) and item (columns)
+        self._counts = np.zeros((0, len(self._items)), dtype=np.int32)
+        # whether the item is shown in the participant assignments
+        self._listed = np.zeros((0, len(self._items)), dtype=bool)
+        self._totals = np.zeros(len(self._items), dtype=np.int64)
+
+    def remove_participant(self, participant_id: int) -> None:
+        """Remove participant.
+
+        Args:
+            participant_id (int): participant ID that will be removed
+        """
+        self.group_data.remove(participant_id)
+        self._drop_participant_subtotal(participant_id)
+        row = self._participant_indexes.pop(participant_id, None)
+        if row is None:
+            return
+        self._totals -= self._counts[row]
+        self._counts = np.delete(self._counts, row, axis=0)
+        self._listed = np.delete(self._listed, row, axis=0)
+        for other_id, other_row in self._participant_indexes.items():
+            if other_row > row:
+                self._participant_indexes[other_id] = other_row - 1
+
+    def get_items_assignment_total(self, item_id: int) -> int:
+        """Get total count of an item that is already assigned to any participant.
+
+        Args:
+            item_id (int): the item ID.
+
+        Returns:
+            int: number items already assigned from the item
+        """
+        return int(self._totals[self._item_indexes[item_id]])
+
+    def get_assignment_differences(self) -> dict[int, int]:
+        """Get the not assigned count of every item.
+
+        Returns:
+            dict[int, int]: purchased count minus assigned count, by item ID,
+                negative if the item is assigned more than purchased
+        """
+        differences = self._item_counts - self._totals
+        return {item.id: int(diff) for item, diff in zip(self._items, differences)}
+
+    def is_consistent(self) -> bool:
+        """Check the assigned totals against a full count of the assignments.
+
+        Returns:
+            bool: True if the totals of all items are correct
+        """
+        subtotals = [0.0] * len(self._participant_indexes)
+        for participant_id, row in self._participant_indexes.items():
+            subtotals[row] = self.get_participant_subtotal(participant_id)
+        is_totals_ok = np.array_equal(self._counts.sum(axis=0), self._totals)
+        is_subtotals_ok = np.allclose(
+            self._counts @ self._unit_prices, subtotals, rtol=0, atol=1e-6
+        )
+        return bool(is_totals_ok and is_subtotals_ok)
+
+    def get_participant_items_assignment_list(
+        self, participant_id: int
+    ) -> list[AssignedItemData]:
+        """Get item assignments for a participant.
+
+        Args:
+            participant_id (int): requested participant ID
+
+        Returns:
+            list[AssignedItemData]: list of items assignment to the participant,
+                in the receipt order
+        """
+        row = self._get_participant_row(participant_id)
+        on_count_change = functools.partial(self._change_count, participant_id)
+        return [
+            AssignedItemData(
+                self._items[col],
+                assigned_count=int(self._counts[row, col]),
+                id=self._items[col].id,
+                on_count_change=on_count_change,
+            )
+            for col in np.flatnonzero(self._listed[row])
+        ]
+
+    def add_item_assignment(self, participant_id: int, item_id: int) -> None:
+        """Add item assignment to the participant.
+
+        An item that is already assigned to the participant gets its count
+        increased instead.
+
+        Args:
+            participant_id (int): participant ID
+            item_id (int): item ID (from AI) to be assigned to the participant
+        """
+        row = self._get_participant_row(participant_id)
+        col = self._item_indexes[item_id]
+        self._listed[row, col] = True
+        self._counts[row, col] += 1
+        self._totals[col] += 1
+        self._update_participant_subtotal(participant_id, float(self._unit_prices[col]))
+
+    def remove_items_assignment(
+        self, participant_id: int, item_idxs: list[int]
+    ) -> None:
+        """Remove item assignments from a participant.
+
+        Args:
+            participant_id (int): participant ID
+            item_idxs (list[int]): item assignment IDs to be removed
+        """
+        row = self._get_participant_row(participant_id)
+        cols = np.flatnonzero(self._listed[row])[item_idxs]
+        self._update_participant_subtotal(
+            participant_id, -float(self._counts[row, cols] @ self._unit_prices[cols])
+        )
+        self._totals[cols] -= self._counts[row, cols]
+        self._counts[row, cols] = 0
+        self._listed[row, cols] = False
+
+    def sync_items(self, edit: ItemsEdit) -> None:
+        """Update the matrix after the receipt items have been edited.
+
+        Columns of removed items are deleted and new items get empty
+        columns, other columns are kept.
+
+        Args:
+            edit (ItemsEdit): the changed items
+        """
+        self._receipt_subtotal = self.receipt_data.subtotal
+        for item_id in edit.edited:
+            col = self._item_indexes[item_id]
+            self._items[col] = self.get_item(item_id)
+            self._item_counts[col] = self._items[col].count
+            price_change = get_unit_price(self._items[col]) - self._unit_prices[col]
+            self._unit_prices[col] += price_change
+            for participant_id, row in self._participant_indexes.items():
+                self._update_participant_subtotal(
+                    participant_id, float(self._counts[row, col] * price_change)
+                )
+        if len(edit.removed) > 0:
+            cols = [self._item_indexes[item_id] for item_id in edit.removed]
+            for participant_id, row in self._participant_indexes.items():
+                self._update_participant_subtotal(
+                    participant_id,
+                    -float(self._counts[row, cols] @ self._unit_prices[cols]),
+                )
+            self._counts = np.delete(self._counts, cols, axis=1)
+            self._listed = np.delete(self._listed, cols, axis=1)
+            self._totals = np.delete(self._totals, cols)
+            self._item_counts = np.delete(self._item_counts, cols)
+            self._unit_prices = np.delete(self._unit_prices, cols)
+        if len(edit.added) > 0:
+            new_items = [self.get_item(item_id) for item_id in edit.added]
+            num_rows = len(self._participant_indexes)
+            new_cols_shape = (num_rows, len(new_items))
+            self._counts = np.hstack(
+                [self._counts, np.zeros(new_cols_shape, dtype=self._counts.dtype)]
+            )
+            self._listed = np.hstack(
+                [self._listed, np.zeros(new_cols_shape, dtype=bool)]
+            )
+            self._totals = np.concatenate(
+                [self._totals, np.zeros(len(new_items), dtype=self._totals.dtype)]
+            )
+            self._item_counts = np.concatenate(
+                [self._item_counts, [it.count for it in new_items]]
+            )
+            self._unit_prices = np.concatenate(
+                [self._unit_prices, [get_unit_price(it) for it in new_items]]
+            )
+        if len(edit.removed) > 0 or len(edit.added) > 0:
+            self._items = self.get_all_items()
+            self._item_indexes = {item.id: idx for idx, item in enumerate(self._items)}
+
+    def _get_participant_row(self, participant_id: int) -> int:
+        """Get the matrix row of a participant, add it if needed.
+
+        Args:
+            participant_id (int): participant ID
+
+        Returns:
+            int: the row index
+        """
+        row = self._participant_indexes.get(participant_id)
+        if row is None:
+            row = len(self._participant_indexes)
+            self._participant_indexes[participant_id] = row
+            new_row_shape = (1, len(self._items))
+            self._counts = np.vstack(
+                [self._counts, np.zeros(new_row_shape, dtype=self._counts.dtype)]
+            )
+            self._listed = np.vstack(
+                [self._listed, np.zeros(new_row_shape, dtype=bool)]
+            )
+        return row
+
+    def _change_count(self, participant_id: int, item_id: int, difference: int) -> None:
+        """Apply a count change made through an AssignedItemData.
+
+        Args:
+            participant_id (int): participant ID
+            item_id (int): the item ID
+            difference (int): change of the assigned count
+        """
+        row = self._participant_indexes.get(participant_id)
+        col = self._item_indexes[item_id]
+        # the assignment may have been removed since the view was created
+        if row is None or not self._listed[row, col]:
+            return
+        self._counts[row, col] += difference
+        self._totals[col] += difference
+        self._update_participant_subtotal(
+            participant_id, difference * float(self._unit_prices[col])
+        )
@@ -1,13 +1,206 @@
-from typing import ClassVar
+import dataclasses
+import operator
+import threading
+from contextvars import Context, ContextVar, copy_context
+from typing import Callable, TypeVar
 
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-class IDGenerator:
-    """Unique ID generator."""
+T = TypeVar("T")
+
+
+class IDNamespace:
+    """Counters of the IDs allocated for a session.
+
+    IDs are unique within a namespace, so all data of a session use the same
+    one. The namespace can be pickled along with the session data, and
+    allocation continues from the same counters after it has been restored.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty namespace."""
+        self.counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, name: str, num: int = 1) -> int:
+        """Allocate consecutive IDs from a counter.
+
+        Args:
+            name (str): the counter name
+            num (int, optional): number of IDs. Defaults to 1.
+
+        Returns:
+            int: the first allocated ID
+        """
+        with self._lock:
+            start = self.counters.get(name, 0) + 1
+            self.counters[name] = start + num - 1
+        return start
+
+    def __getstate__(self) -> dict:
+        """Get the state to be pickled, without the lock.
+
+        Returns:
+            dict: the counters
+        """
+        with self._lock:
+            return {"counters": dict(self.counters)}
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a pickled namespace.
+
+        Args:
+            state (dict): the counters
+        """
+        self.counters = state["counters"]
+        self._lock = threading.Lock()
+
+
+# used outside of the app sessions, like in the inference workers
+DEFAULT_ID_NAMESPACE = IDNamespace()
+current_id_namespace = ContextVar("current_id_namespace", default=DEFAULT_ID_NAMESPACE)
+# session state key of the session namespace
+SESSION_ID_NAMESPACE_KEY = "id_namespace"
+
+
+def get_current_id_namespace() -> IDNamespace:
+    """Get the namespace where new IDs are allocated.
+
+    In a streamlit script run, including callbacks and fragment reruns, it
+    is the namespace of the session, created on first use. Otherwise, like
+    in the reader threads, it is the namespace of the current context.
+
+    Returns:
+        IDNamespace: the current namespace
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return current_id_namespace.get()
+    namespace = st.session_state.get(SESSION_ID_NAMESPACE_KEY)
+    if namespace is None:
+        namespace = IDNamespace()
+        st.session_state[SESSION_ID_NAMESPACE_KEY] = namespace
+    return namespace
+
+
+def copy_id_context() -> Context:
+    """Copy the current context for a job that allocates IDs in another thread.
+
+    Returns:
+        Context: the copied context, with the current namespace
+    """
+    context = copy_context()
+    context.run(current_id_namespace.set, get_current_id_namespace())
+    return context
 
-    num: ClassVar[int] = 0
+
+class IDGenerator:
+    """Unique ID generator, IDs are taken from the current ID namespace."""
 
     @classmethod
     def get(cls) -> int:
         """Get new ID."""
-        cls.num += 1
-        return cls.num
+        return get_current_id_namespace().allocate(cls.__name__)
+
+    @classmethod
+    def get_many(cls, num: int) -> list[int]:
+        """Get several new IDs at once.
+
+        Args:
+            num (int): number of IDs
+
+        Returns:
+            list[int]: the new IDs, in increasing order
+        """
+        start = get_current_id_namespace().allocate(cls.__name__, num)
+        return list(range(start, start + num))
+
+
+class Record:
+    """Base of the slotted data records, pickled as their constructor arguments.
+
+    Slotted objects are otherwise pickled with a dictionary of their slots,
+    which is slower and larger than the dictionary of plain objects. All
+    fields of the records must be constructor arguments.
+    """
+
+    __slots__ = ()
+    # getter of the constructor arguments of each record class
+    _field_getters: dict[type, Callable[[object], tuple]] = {}
+
+    def __reduce__(self) -> tuple[type, tuple]:
+        """Get the class and the constructor arguments to pickle this record.
+
+        Returns:
+            tuple[type, tuple]: the record class and its field values
+        """
+        cls = type(self)
+        getter = Record._field_getters.get(cls)
+        if getter is None:
+            getter = _get_fields_getter(cls)
+            Record._field_getters[cls] = getter
+        return cls, getter(self)
+
+
+def _get_fields_getter(cls: type) -> Callable[[object], tuple]:
+    """Create a getter of the field values of a dataclass.
+
+    Args:
+        cls (type): the dataclass
+
+    Returns:
+        Callable[[object], tuple]: returns the field values, in their order
+    """
+    names = [f.name for f in dataclasses.fields(cls)]
+    if len(names) == 1:
+        # attrgetter of a single name does not return a tuple
+        return lambda record: (getattr(record, names[0]),)
+    return operator.attrgetter(*names)
+
+
+def frozen_variant(cls: type[T]) -> type[T]:
+    """Create a frozen copy of a slotted record class.
+
+    The records are not frozen, setting the fields of frozen dataclasses is
+    slower, in their constructor and when they are unpickled. This variant
+    is for the records that must not be changed after their creation.
+    It has the same fields, properties and methods, but it is not a subclass
+    of the record class. It must be assigned to Frozen<record class name> in
+    the module of the record class, to be pickled.
+
+    Args:
+        cls (type[T]): the record class, a dataclass
+
+    Returns:
+        type[T]: the frozen and slotted record class
+    """
+    fields = [
+        (
+            f.name,
+            f.type,
+            dataclasses.field(
+                default=f.default,
+                default_factory=f.default_factory,
+                repr=f.repr,
+                compare=f.compare,
+            ),
+        )
+        for f in dataclasses.fields(cls)
+    ]
+    # the slots of the fields are not copied, they are created again
+    methods = {
+        name: value
+        for name, value in vars(cls).items()
+        if not name.startswith("__")
+        and (callable(value) or isinstance(value, (property, classmethod)))
+    }
+    frozen_cls = dataclasses.make_dataclass(
+        f"Frozen{cls.__name__}",
+        fields,
+        bases=(Record,),
+        namespace={**methods, "__doc__": cls.__doc__},
+        frozen=True,
+        slots=True,
+    )
+    frozen_cls.__module__ = cls.__module__
+    return frozen_cls
@@ -0,0 +1,59 @@
+import numpy as np
+from babel.numbers import get_currency_precision
+
+
+def to_minor_units(amounts: np.ndarray, currency: str) -> np.ndarray:
+    """Convert amounts to integer minor units of a currency, like cents.
+
+    Args:
+        amounts (np.ndarray): amounts in major units
+        currency (str): the currency code
+
+    Returns:
+        np.ndarray: rounded amounts in minor units
+    """
+    scale = 10 ** get_currency_precision(currency)
+    return np.rint(np.asarray(amounts, dtype=np.float64) * scale).astype(np.int64)
+
+
+def from_minor_units(amounts: np.ndarray, currency: str) -> np.ndarray:
+    """Convert amounts in integer minor units back to major units.
+
+    Args:
+        amounts (np.ndarray): amounts in minor units
+        currency (str): the currency code
+
+    Returns:
+        np.ndarray: amounts in major units
+    """
+    return np.asarray(amounts) / 10 ** get_currency_precision(currency)
+
+
+def allocate_minor_units(total: int, weights: np.ndarray) -> np.ndarray:
+    """Split an amount proportionally to weights, with largest remainder rounding.
+
+    Every share is rounded down, then the remaining units go to the shares
+    with the largest rounded off fractions, so the shares sum exactly to
+    the amount. Weights can be negative, like for discount lines. If they
+    sum to zero, the amount is split equally.
+
+    Args:
+        total (int): the amount in minor units
+        weights (np.ndarray): weight of each share
+
+    Returns:
+        np.ndarray: the shares in minor units
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(weights) == 0:
+        return np.zeros(0, dtype=np.int64)
+    weight_sum = weights.sum()
+    if np.isclose(weight_sum, 0.0):
+        weights = np.ones_like(weights)
+        weight_sum = len(weights)
+    exact = total * weights / weight_sum
+    shares = np.floor(exact).astype(np.int64)
+    remainder = int(total - shares.sum())
+    largest_fractions = np.argsort(shares - exact, kind="stable")
+    shares[largest_fractions[:remainder]] += 1
+    return shares
@@ -1,8 +1,8 @@
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field, replace
 
 import pandas as pd
 
-from .base import IDGenerator
+from .base import IDGenerator, Record, frozen_variant
 
 
 class ItemIDGenerator(IDGenerator):
@@ -11,8 +11,13 @@ class ItemIDGenerator(IDGenerator):
     pass
 
 
-@dataclass
-class ItemData:
+ITEM_COLUMNS = ("name", "count", "total_price")
+# values of the columns left empty in a new row of the items table
+NEW_ITEM_VALUES = {"name": "", "count": 1, "total_price": 0.0}
+
+
+@dataclass(slots=True)
+class ItemData(Record):
     """Item data from the receipt."""
 
     name: str
@@ -31,12 +36,42 @@ class ItemData:
         return self.total_price / self.count
 
 
+FrozenItemData = frozen_variant(ItemData)
+
+
+@dataclass(slots=True)
+class ItemsEdit:
+    """IDs of the items changed by an edit of the items table."""
+
+    edited: list[int]
+    added: list[int]
+    removed: list[int]
+
+
 @dataclass
 class ReceiptData:
     """Receipt data from AI reading."""
 
     items: dict[int, ItemData]
     total: float
+    # how sure the model is about the reading, from 0 to 1, None if unknown
+    confidence: float | None = None
+    # columnar view of the items, built on first use and dropped when the
+    # items are replaced
+    _items_df: pd.DataFrame | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Set an attribute, replacing the items drops the cached DataFrame.
+
+        Args:
+            name (str): attribute name
+            value (object): new value
+        """
+        super().__setattr__(name, value)
+        if name == "items":
+            super().__setattr__("_items_df", None)
 
     @property
     def subtotal(self) -> float:
@@ -46,13 +81,108 @@ class ReceiptData:
         """
         return sum(item.total_price for item in self.items.values())
 
+    def to_dict(self) -> dict:
+        """Convert data to a JSON serializable dictionary.
+
+        Item IDs are not included, they are generated again on load.
+
+        Returns:
+            dict: data as dictionary
+        """
+        return {
+            "items": [
+                {
+                    "name": str(item.name),
+                    "count": int(item.count),
+                    "total_price": float(item.total_price),
+                }
+                for item in self.items.values()
+            ],
+            "total": float(self.total),
+            "confidence": self.confidence,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReceiptData":
+        """Build this data from a dictionary created by to_dict.
+
+        Args:
+            data (dict): dictionary to be converted
+
+        Returns:
+            ReceiptData: parsed receipt data
+        """
+        items = [
+            ItemData(
+                name=item["name"],
+                count=item["count"],
+                total_price=item["total_price"],
+            )
+            for item in data["items"]
+        ]
+        return cls(
+            items={it.id: it for it in items},
+            total=data["total"],
+            confidence=data.get("confidence"),
+        )
+
     def to_items_df(self) -> pd.DataFrame:
         """Convert data to pandas DataFrame.
 
+        The DataFrame is cached and shared by all callers, it must not be
+        modified. The items dictionary should be replaced, not modified in
+        place, so that the cache is updated.
+
         Returns:
             pd.DataFrame: data as DataFrame
         """
-        return pd.DataFrame([asdict(item) for item in self.items.values()])
+        if self._items_df is None:
+            items = self.items.values()
+            self._items_df = _build_items_df(
+                names=[item.name for item in items],
+                counts=[item.count for item in items],
+                total_prices=[item.total_price for item in items],
+                ids=[item.id for item in items],
+            )
+        return self._items_df
+
+    def apply_items_edits(self, edits: dict) -> ItemsEdit:
+        """Apply the changes made in a table editor of the items DataFrame.
+
+        Only the changed items are replaced, the other items and their IDs
+        stay the same.
+
+        Args:
+            edits (dict): streamlit data editor state, with "edited_rows",
+                "added_rows", and "deleted_rows", the row numbers are
+                positions in the DataFrame from to_items_df
+
+        Returns:
+            ItemsEdit: IDs of the changed items
+        """
+        row_ids = self.to_items_df()["id"]
+        edited = []
+        for row, changes in edits.get("edited_rows", {}).items():
+            item_id = int(row_ids.iat[int(row)])
+            self.items[item_id] = replace(
+                self.items[item_id], **_get_item_values(changes)
+            )
+            edited.append(item_id)
+        removed = [int(row_ids.iat[int(row)]) for row in edits.get("deleted_rows", [])]
+        for item_id in removed:
+            self.items.pop(item_id)
+        added_rows = edits.get("added_rows", [])
+        added = ItemIDGenerator.get_many(len(added_rows))
+        for item_id, values in zip(added, added_rows):
+            self.items[item_id] = ItemData(
+                **{**NEW_ITEM_VALUES, **_get_item_values(values)}, id=item_id
+            )
+        self._items_df = None
+        return ItemsEdit(
+            edited=[item_id for item_id in edited if item_id not in removed],
+            added=added,
+            removed=removed,
+        )
 
     @classmethod
     def from_items_df(cls, items_df: pd.DataFrame, total: float) -> "ReceiptData":
@@ -67,12 +197,55 @@ class ReceiptData:
         Returns:
             ReceiptData: parsed receipt data
         """
-        items = [
-            ItemData(
-                name=row["name"],
-                count=row["count"],
-                total_price=row["total_price"],
-            )
-            for _, row in items_df.iterrows()
-        ]
-        return cls(items={it.id: it for it in items}, total=total)
+        names = items_df["name"].tolist()
+        counts = items_df["count"].tolist()
+        total_prices = items_df["total_price"].tolist()
+        ids = ItemIDGenerator.get_many(len(items_df))
+        receipt = cls(
+            items={
+                item_id: ItemData(
+                    name=name, count=count, total_price=total_price, id=item_id
+                )
+                for name, count, total_price, item_id in zip(
+                    names, counts, total_prices, ids
+                )
+            },
+            total=total,
+        )
+        receipt._items_df = _build_items_df(names, counts, total_prices, ids)
+        return receipt
+
+
+def _get_item_values(values: dict) -> dict:
+    """Get the item fields from a row of the items table.
+
+    Args:
+        values (dict): column values of the row
+
+    Returns:
+        dict: the item fields that have a value
+    """
+    return {
+        column: value
+        for column, value in values.items()
+        if column in ITEM_COLUMNS and value is not None
+    }
+
+
+def _build_items_df(
+    names: list[str], counts: list[int], total_prices: list[float], ids: list[int]
+) -> pd.DataFrame:
+    """Build the items DataFrame from its columns.
+
+    Args:
+        names (list[str]): items name
+        counts (list[int]): items count
+        total_prices (list[float]): items total price
+        ids (list[int]): items ID
+
+    Returns:
+        pd.DataFrame: the items DataFrame
+    """
+    return pd.DataFrame(
+        {"name": names, "count": counts, "total_price": total_prices, "id": ids}
+    )
@@ -1,15 +1,18 @@
 from dataclasses import dataclass
 from typing import Self
 
+import numpy as np
 import pandas as pd
 
 from modules.utils import format_number_to_currency
 
-from .assignment_data import AssignedItemData, ParticipantData, SplitManager
+from .assignment_data import AssignedItemData, SplitManager
+from .base import Record, frozen_variant
+from .money import allocate_minor_units, from_minor_units, to_minor_units
 
 
-@dataclass
-class PurchasedItemReportData:
+@dataclass(slots=True)
+class PurchasedItemReportData(Record):
     """Report data for an item."""
 
     item_id: int
@@ -44,8 +47,11 @@ class PurchasedItemReportData:
         return self.purchased_count * self.unit_price
 
 
-@dataclass
-class ParticipantReportData:
+FrozenPurchasedItemReportData = frozen_variant(PurchasedItemReportData)
+
+
+@dataclass(slots=True)
+class ParticipantReportData(Record):
     """Report data for a participant."""
 
     participant_id: int
@@ -63,40 +69,6 @@ class ParticipantReportData:
         """
         return self.purchased_total - self.purchased_subtotal
 
-    @classmethod
-    def from_assignment_data(
-        cls,
-        participant: ParticipantData,
-        assigned_items: list[AssignedItemData],
-        receipt_subtotal: float,
-        receipt_total: float,
-    ) -> Self:
-        """Generate participant report from assignment data.
-
-        Args:
-            participant (ParticipantData): the participant data
-            assigned_items (list[AssignedItemData]): items assignment for
-                this participant
-            receipt_subtotal (float): subtotal of the overall receipt
-            receipt_total (float): total oft he overall receipt
-
-        Returns:
-            Self: the generated report data
-        """
-        purchased_items = [
-            PurchasedItemReportData.from_item_assignment_data(it)
-            for it in assigned_items
-        ]
-        subtotal = sum(it.total for it in purchased_items)
-        total = (subtotal / receipt_subtotal) * receipt_total
-        return cls(
-            participant_id=participant.id,
-            name=participant.name,
-            purchased_items=purchased_items,
-            purchased_subtotal=subtotal,
-            purchased_total=total,
-        )
-
     def to_dataframe_display(self) -> pd.DataFrame:
         """Convert this data to a DataFrame for display purpose.
 
@@ -117,6 +89,9 @@ class ParticipantReportData:
         ).set_index("Name")
 
 
+FrozenParticipantReportData = frozen_variant(ParticipantReportData)
+
+
 @dataclass
 class ReportData:
     """Complete split report data."""
@@ -124,25 +99,76 @@ class ReportData:
     participants_reports: list[ParticipantReportData]
 
     @classmethod
-    def from_split_manager(cls, manager: SplitManager) -> Self:
+    def from_split_manager(cls, manager: SplitManager, currency: str) -> Self:
         """Create report from split assignment manager.
 
+        Participants subtotals and totals are computed together in integer
+        minor units of the currency. The receipt total is split
+        proportionally to the subtotals, with largest remainder rounding, so
+        the participants totals sum exactly to the receipt total.
+
         Args:
             manager (SplitManager): the split assignment manager.
+            currency (str): currency code of the receipt
 
         Returns:
             Self: generated report data
         """
-        order_subtotal = manager.receipt_data.subtotal
-        order_total = manager.receipt_data.total
+        participants = manager.get_all_participants()
+        assignments = [
+            manager.get_participant_items_assignment_list(p.id) for p in participants
+        ]
+        participant_idxs = np.array(
+            [idx for idx, items in enumerate(assignments) for _ in items],
+            dtype=np.int64,
+        )
+        all_items = [it for assigned_items in assignments for it in assigned_items]
+        assigned_counts = np.array(
+            [it.assigned_count for it in all_items], dtype=np.float64
+        )
+        item_prices = np.array([it.item.total_price for it in all_items])
+        item_counts = np.array([it.item.count for it in all_items], dtype=np.float64)
+        # value of each assignment, in minor units but not rounded yet
+        assigned_values = np.divide(
+            assigned_counts * to_minor_units(item_prices, currency),
+            item_counts,
+            out=np.zeros_like(assigned_counts),
+            where=item_counts > 0,
+        )
+        weights = np.bincount(
+            participant_idxs, weights=assigned_values, minlength=len(participants)
+        )
+
+        receipt_subtotal = to_minor_units(manager.receipt_data.subtotal, currency)
+        receipt_total = to_minor_units(manager.receipt_data.total, currency)
+        assigned_subtotal = int(np.rint(weights.sum()))
+        assigned_total = 0
+        if receipt_subtotal != 0:
+            # equal to the receipt total once every item has been assigned
+            assigned_total = int(
+                np.rint(receipt_total * weights.sum() / receipt_subtotal)
+            )
+        subtotals = from_minor_units(
+            allocate_minor_units(assigned_subtotal, weights), currency
+        )
+        totals = from_minor_units(
+            allocate_minor_units(assigned_total, weights), currency
+        )
+
         return cls(
             participants_reports=[
-                ParticipantReportData.from_assignment_data(
-                    p,
-                    manager.get_participant_items_assignment_list(p.id),
-                    order_subtotal,
-                    order_total,
+                ParticipantReportData(
+                    participant_id=participant.id,
+                    name=participant.name,
+                    purchased_items=[
+                        PurchasedItemReportData.from_item_assignment_data(it)
+                        for it in assigned_items
+                    ],
+                    purchased_subtotal=float(subtotal),
+                    purchased_total=float(total),
+                )
+                for participant, assigned_items, subtotal, total in zip(
+                    participants, assignments, subtotals, totals
                 )
-                for p in manager.get_all_participants()
             ],
         )
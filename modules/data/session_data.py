@@ -1,14 +1,15 @@
+from concurrent.futures import Future
 from typing import Generic
 
 import streamlit as st
 from PIL import Image
 from typing_extensions import TypeVar
 
-from modules.models.base import AIModel
-from modules.models.loader import ModelNames
+from modules.models.base import AIModel, InferencePrecision, ModelNames
 
 from .assignment_data import GroupData, SplitManager
-from .receipt_data import ReceiptData
+from .base import SESSION_ID_NAMESPACE_KEY, IDNamespace
+from .receipt_data import ItemData, ReceiptData
 from .report_data import ReportData
 
 T = TypeVar("T")
@@ -66,15 +67,25 @@ class SessionDataManager(Generic[T, V]):
 
 model = SessionDataManager[AIModel]("model")
 model_name = SessionDataManager[ModelNames, ModelNames]("model_name", ModelNames.GEMINI)
+model_precision = SessionDataManager[InferencePrecision, InferencePrecision](
+    "model_precision", InferencePrecision.FP32
+)
+use_receipt_cache = SessionDataManager[bool, bool]("use_receipt_cache", True)
+use_assignment_matrix = SessionDataManager[bool, bool]("use_assignment_matrix", False)
 currency = SessionDataManager[str, str]("currency", "IDR")
 image = SessionDataManager[Image.Image]("image")
+image_preview = SessionDataManager[Image.Image]("image_preview")
+image_file_id = SessionDataManager[str]("image_file_id")
 receipt_data = SessionDataManager[ReceiptData]("receipt_data")
 group_data = SessionDataManager[GroupData, GroupData]("group_data", GroupData())
 current_page = SessionDataManager[int, int]("current_page", 1)
 split_manager = SessionDataManager[SplitManager]("split_manager")
 report = SessionDataManager[ReportData]("report")
 view1_model_result = SessionDataManager[ReceiptData]("view1_model_result")
+view1_reading_job = SessionDataManager[Future[ReceiptData]]("view1_reading_job")
+view1_partial_items = SessionDataManager[list[ItemData]]("view1_partial_items")
 view1_auto_next_page = SessionDataManager[bool, bool]("view1_auto_next_page", False)
+id_namespace = SessionDataManager[IDNamespace](SESSION_ID_NAMESPACE_KEY)
 
 
 def reset_receipt_data() -> None:
@@ -82,3 +93,7 @@ def reset_receipt_data() -> None:
     receipt_data.reset()
     split_manager.reset()
     view1_model_result.reset()
+    view1_partial_items.reset()
+    job = view1_reading_job.get_once()
+    if job is not None:
+        job.cancel()
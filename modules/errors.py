@@ -0,0 +1,6 @@
+class AIError(Exception):
+    pass
+
+
+class SettingsError(Exception):
+    pass
@@ -0,0 +1,63 @@
+"""
+Event loop shared by all sessions to run asynchronous model calls
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+class AsyncRunner:
+    """Event loop running in a background thread.
+
+    Streamlit scripts are run in regular threads without event loop, this
+    runner lets them start coroutines and wait for their results.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the runner, the loop is started on first use."""
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running event loop.
+
+        Returns:
+            asyncio.AbstractEventLoop: the event loop
+        """
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="async-runner", daemon=True
+                ).start()
+            return self._loop
+
+    def submit(self, coro: Coroutine[None, None, T]) -> Future[T]:
+        """Start a coroutine in the event loop.
+
+        Args:
+            coro (Coroutine[None, None, T]): the coroutine
+
+        Returns:
+            Future[T]: the coroutine result, cancelling it cancels the coroutine
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[None, None, T]) -> T:
+        """Run a coroutine in the event loop and wait for its result.
+
+        Args:
+            coro (Coroutine[None, None, T]): the coroutine
+
+        Returns:
+            T: the coroutine result
+        """
+        return self.submit(coro).result()
+
+
+ASYNC_RUNNER = AsyncRunner()
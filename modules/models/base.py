@@ -1,13 +1,51 @@
+import os
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from typing import Callable
 
 from PIL import Image
 
-from modules.data.receipt_data import ReceiptData
+from modules.data.base import copy_id_context
+from modules.data.receipt_data import ItemData, ReceiptData
+from modules.errors import AIError, SettingsError
+
+from .preprocess import ImagePreprocessor
+
+# threads that run readings submitted by the app sessions, so a slow reading
+# does not block the session script
+READER_THREADS = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("INFERENCE_THREADS", "4")),
+    thread_name_prefix="receipt-reader",
+)
+
+
+class InferencePrecision(Enum):
+    """Numeric precision used by locally run models."""
+
+    FP32 = "fp32"
+    INT8 = "int8 (dynamic quantization)"
+    BF16 = "bf16 (autocast)"
+
+
+class ModelNames(Enum):
+    """Available model names, the loader builds a model for each of them."""
+
+    GEMINI = "Gemini"
+    DONUT = "Donut"
+    DONUT_ONNX = "Donut (ONNX Runtime)"
+    CASCADE = "Donut, then Gemini if unsure"
+    HEDGED = "Donut and Gemini in parallel"
 
 
 class AIModel(ABC):
     "Base class of AI models"
 
+    # change when the model output changes, to invalidate cached results
+    version: str = "1"
+    # applied by the models to the images before reading them
+    preprocessor: ImagePreprocessor = ImagePreprocessor()
+
     @abstractmethod
     def run(self, image: Image.Image) -> ReceiptData:
         """Retrieve data from the receipt.
@@ -19,3 +57,99 @@ class AIModel(ABC):
             ReceiptData: parsed receipt data
         """
         pass
+
+    def submit(
+        self,
+        image: Image.Image,
+        on_item: Callable[[ItemData], None] | None = None,
+    ) -> Future[ReceiptData]:
+        """Start reading the receipt without waiting for the result.
+
+        Args:
+            image (Image.Image): the receipt photo image
+            on_item (Callable[[ItemData], None] | None, optional): called
+                with each item as soon as it is read, only by models that
+                stream their results. Defaults to None.
+
+        Returns:
+            Future[ReceiptData]: the reading result, cancelling it drops
+                the reading if it has not been started yet
+        """
+        # the reading allocates IDs from the namespace of the caller
+        context = copy_id_context()
+        return READER_THREADS.submit(context.run, self.run, image)
+
+    def run_batch(self, images: list[Image.Image]) -> list[ReceiptData | AIError]:
+        """Retrieve data from several receipts.
+
+        By default the receipts are read one by one. A receipt that fails
+        to be read is reported as AIError at its position, without stopping
+        the rest of the batch.
+
+        Args:
+            images (list[Image.Image]): the receipt photo images
+
+        Returns:
+            list[ReceiptData | AIError]: parsed receipt data or the reading
+                error, in the same order as the images
+        """
+        results: list[ReceiptData | AIError] = []
+        for image in images:
+            try:
+                results.append(self.run(image))
+            except SettingsError:
+                raise
+            except Exception as err:
+                results.append(as_ai_error(err))
+        return results
+
+    def warm_up(self) -> None:
+        """Prepare the model so the first reading is not slower than the others.
+
+        By default nothing is done.
+        """
+        pass
+
+    def metrics(self) -> dict[str, float]:
+        """Runtime statistics of the model, shown for diagnostics.
+
+        Returns:
+            dict[str, float]: metric values by name, empty by default
+        """
+        return {}
+
+    def estimated_wait(self) -> float:
+        """Estimated time before the queued readings of the model are started.
+
+        Readings may be queued, for example, to stay within an API quota.
+
+        Returns:
+            float: waiting time in seconds, 0 by default
+        """
+        return 0.0
+
+    def memory_usage(self) -> int:
+        """Memory used by the model resources, such as its weights.
+
+        Returns:
+            int: memory usage in bytes, 0 if the model holds no
+                significant resources
+        """
+        return 0
+
+
+def as_ai_error(err: Exception) -> AIError:
+    """Convert an exception raised while reading a receipt to AIError.
+
+    Args:
+        err (Exception): the raised exception
+
+    Returns:
+        AIError: the exception itself if it is already an AIError,
+            otherwise a new AIError caused by it
+    """
+    if isinstance(err, AIError):
+        return err
+    ai_error = AIError(f"Unable to read the receipt: {err}")
+    ai_error.__cause__ = err
+    return ai_error
@@ -0,0 +1,279 @@
+"""
+Cache of receipt reading results, shared by all sessions
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image
+
+from modules.data.receipt_data import ItemData, ReceiptData
+from modules.errors import AIError
+
+from .base import AIModel
+
+
+@dataclass
+class CacheStats:
+    """Counters of the cache lookups."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Ratio of lookups that are found in any tier.
+
+        Returns:
+            float: hit rate, 0 if there is no lookup yet
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return (self.memory_hits + self.disk_hits) / lookups
+
+
+class ReceiptCache:
+    """Two tiers cache of serialized receipt data.
+
+    Recently used entries are kept in memory, all entries are written to disk.
+    The oldest disk entries are removed when the disk tier exceeds its size.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_memory_entries: int = 256,
+        max_disk_bytes: int = 64 * 2**20,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            cache_dir (str): directory of the disk tier
+            max_memory_entries (int, optional): maximum number of entries
+                in the memory tier. Defaults to 256.
+            max_disk_bytes (int, optional): maximum size of the disk tier.
+                Defaults to 64 MiB.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = CacheStats()
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        """Get a cached entry.
+
+        Args:
+            key (str): the entry key
+
+        Returns:
+            dict | None: the cached entry, None if not found
+        """
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return value
+            path = self._entry_path(key)
+            try:
+                with open(path) as f:
+                    value = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                self.stats.misses += 1
+                return None
+            self.stats.disk_hits += 1
+            self._put_memory(key, value)
+            return value
+
+    def put(self, key: str, value: dict) -> None:
+        """Store an entry in both tiers.
+
+        Args:
+            key (str): the entry key
+            value (dict): JSON serializable entry
+        """
+        with self._lock:
+            self._put_memory(key, value)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self._entry_path(key), "w") as f:
+                json.dump(value, f)
+            self._evict_disk()
+
+    def clear(self) -> None:
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def _entry_path(self, key: str) -> Path:
+        """Path of an entry in the disk tier.
+
+        Args:
+            key (str): the entry key
+
+        Returns:
+            Path: file path of the entry
+        """
+        return self.cache_dir / f"{key}.json"
+
+    def _put_memory(self, key: str, value: dict) -> None:
+        """Store an entry in the memory tier and evict the least recently used.
+
+        Args:
+            key (str): the entry key
+            value (dict): the entry
+        """
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """Remove the least recently used disk entries until it fits its size."""
+        entries = [(p, p.stat()) for p in self.cache_dir.glob("*.json")]
+        total_bytes = sum(stat.st_size for _, stat in entries)
+        for path, stat in sorted(entries, key=lambda it: it[1].st_mtime):
+            if total_bytes <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= stat.st_size
+
+
+class CachedModel(AIModel):
+    """Model wrapper that reuses the results of receipts that have been read."""
+
+    def __init__(self, model: AIModel, cache: ReceiptCache, model_id: str) -> None:
+        """Initialize the wrapper.
+
+        Args:
+            model (AIModel): the wrapped model
+            cache (ReceiptCache): the results cache
+            model_id (str): identifier of the model name and config, results
+                of different models are cached separately
+        """
+        self.model = model
+        self.cache = cache
+        self.model_id = f"{model_id}:{model.version}"
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        """Retrieve data from the receipt, from the cache if possible.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            ReceiptData: parsed receipt data
+        """
+        key = self._cache_key(image)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return ReceiptData.from_dict(cached)
+        receipt = self.model.run(image)
+        self.cache.put(key, receipt.to_dict())
+        return receipt
+
+    def submit(
+        self,
+        image: Image.Image,
+        on_item: Callable[[ItemData], None] | None = None,
+    ) -> Future[ReceiptData]:
+        """Start reading the receipt, cached results are returned immediately.
+
+        Args:
+            image (Image.Image): the receipt photo image
+            on_item (Callable[[ItemData], None] | None, optional): given to
+                the wrapped model when the result is not cached.
+                Defaults to None.
+
+        Returns:
+            Future[ReceiptData]: the reading result
+        """
+        key = self._cache_key(image)
+        cached = self.cache.get(key)
+        if cached is not None:
+            future: Future[ReceiptData] = Future()
+            future.set_result(ReceiptData.from_dict(cached))
+            return future
+
+        def store(done: Future[ReceiptData]) -> None:
+            if not done.cancelled() and done.exception() is None:
+                self.cache.put(key, done.result().to_dict())
+
+        future = self.model.submit(image, on_item)
+        future.add_done_callback(store)
+        return future
+
+    def run_batch(self, images: list[Image.Image]) -> list[ReceiptData | AIError]:
+        """Retrieve data from several receipts, only uncached ones are read.
+
+        Args:
+            images (list[Image.Image]): the receipt photo images
+
+        Returns:
+            list[ReceiptData | AIError]: parsed receipt data or the reading
+                error, in the same order as the images
+        """
+        keys = [self._cache_key(image) for image in images]
+        results: list[ReceiptData | AIError | None] = []
+        for key in keys:
+            cached = self.cache.get(key)
+            results.append(None if cached is None else ReceiptData.from_dict(cached))
+
+        missing_idxs = [idx for idx, result in enumerate(results) if result is None]
+        new_results = self.model.run_batch([images[idx] for idx in missing_idxs])
+        for idx, result in zip(missing_idxs, new_results):
+            results[idx] = result
+            if isinstance(result, ReceiptData):
+                self.cache.put(keys[idx], result.to_dict())
+        return results
+
+    def metrics(self) -> dict[str, float]:
+        """Runtime statistics of the wrapped model.
+
+        Returns:
+            dict[str, float]: metric values by name
+        """
+        return self.model.metrics()
+
+    def estimated_wait(self) -> float:
+        """Estimated waiting time of the wrapped model.
+
+        Returns:
+            float: waiting time in seconds
+        """
+        return self.model.estimated_wait()
+
+    def memory_usage(self) -> int:
+        """Memory used by the wrapped model.
+
+        Returns:
+            int: memory usage in bytes
+        """
+        return self.model.memory_usage()
+
+    def _cache_key(self, image: Image.Image) -> str:
+        """Cache key from the image content and the model.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            str: the cache key
+        """
+        digest = hashlib.sha256(self.model_id.encode())
+        digest.update(f"{image.mode}:{image.size}".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
@@ -0,0 +1,148 @@
+"""
+Cascade of a local model and a remote model, the remote one is only used when
+the local reading does not pass the consistency checks
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from PIL import Image
+
+from modules.data.receipt_data import ReceiptData
+from modules.errors import SettingsError
+
+from .base import AIModel
+from .validation import DEFAULT_THRESHOLDS, ValidationThresholds, validate_receipt
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CascadeStats:
+    """Statistics of the readings done by a cascade."""
+
+    readings: int = 0
+    escalations: int = 0
+    local_latency: float = 0.0
+    remote_latency: float = 0.0
+
+    @property
+    def escalation_rate(self) -> float:
+        """Ratio of readings that have been sent to the remote model.
+
+        Returns:
+            float: escalation rate, 0 if there is no reading yet
+        """
+        if self.readings == 0:
+            return 0.0
+        return self.escalations / self.readings
+
+    @property
+    def average_local_latency(self) -> float:
+        """Average latency of the local model.
+
+        Returns:
+            float: average latency in seconds, 0 if there is no reading yet
+        """
+        if self.readings == 0:
+            return 0.0
+        return self.local_latency / self.readings
+
+    @property
+    def average_remote_latency(self) -> float:
+        """Average latency of the remote model.
+
+        Returns:
+            float: average latency in seconds, 0 if there is no escalation yet
+        """
+        if self.escalations == 0:
+            return 0.0
+        return self.remote_latency / self.escalations
+
+
+class CascadeModel(AIModel):
+    """Model that reads receipts locally first and escalates doubtful ones."""
+
+    def __init__(
+        self,
+        local_model: AIModel,
+        remote_model: AIModel,
+        thresholds: ValidationThresholds = DEFAULT_THRESHOLDS,
+    ) -> None:
+        """Initialize the cascade.
+
+        Args:
+            local_model (AIModel): the free model, always run first
+            remote_model (AIModel): the model used when the local reading
+                fails the checks
+            thresholds (ValidationThresholds, optional): limits of the checks.
+                Defaults to DEFAULT_THRESHOLDS.
+        """
+        self.local_model = local_model
+        self.remote_model = remote_model
+        self.thresholds = thresholds
+        self.stats = CascadeStats()
+        self._stats_lock = threading.Lock()
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        """Retrieve data from the receipt.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            ReceiptData: parsed receipt data
+        """
+        started_at = time.monotonic()
+        try:
+            receipt = self.local_model.run(image)
+            failures = validate_receipt(receipt, self.thresholds)
+        except SettingsError:
+            raise
+        except Exception as err:
+            failures = [f"reading error: {err}"]
+        local_latency = time.monotonic() - started_at
+        with self._stats_lock:
+            self.stats.readings += 1
+            self.stats.local_latency += local_latency
+        if len(failures) == 0:
+            return receipt
+
+        logger.info("Escalating receipt reading, failed checks: %s", failures)
+        started_at = time.monotonic()
+        try:
+            return self.remote_model.run(image)
+        finally:
+            with self._stats_lock:
+                self.stats.escalations += 1
+                self.stats.remote_latency += time.monotonic() - started_at
+
+    def warm_up(self) -> None:
+        """Warm up both models."""
+        self.local_model.warm_up()
+        self.remote_model.warm_up()
+
+    def metrics(self) -> dict[str, float]:
+        """Statistics of the cascade readings.
+
+        Returns:
+            dict[str, float]: metric values by name
+        """
+        with self._stats_lock:
+            return {
+                "readings": self.stats.readings,
+                "escalations": self.stats.escalations,
+                "escalation rate": self.stats.escalation_rate,
+                "average local latency (s)": self.stats.average_local_latency,
+                "average remote latency (s)": self.stats.average_remote_latency,
+            }
+
+    def estimated_wait(self) -> float:
+        """Estimated waiting time of the remote model, in case of escalation.
+
+        Returns:
+            float: waiting time in seconds
+        """
+        return self.remote_model.estimated_wait()
@@ -0,0 +1,125 @@
+"""
+Pool of API clients shared by all sessions, so their connections are reused
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _PooledClient(Generic[T]):
+    """Client in the pool and the last time it has been used."""
+
+    client: T
+    last_used: float
+
+
+class ClientPool(Generic[T]):
+    """Thread-safe pool that keeps one client for each config.
+
+    Clients that have not been used for a while are closed, and unhealthy
+    clients are replaced by new ones when they are requested.
+    """
+
+    def __init__(
+        self,
+        create: Callable[..., T],
+        is_healthy: Callable[[T], bool] | None = None,
+        close: Callable[[T], None] | None = None,
+        max_idle_seconds: float = 300.0,
+    ) -> None:
+        """Initialize the pool.
+
+        Args:
+            create (Callable[..., T]): client constructor, called with the
+                config keyword arguments
+            is_healthy (Callable[[T], bool] | None, optional): checks whether
+                a client can still be used. Defaults to None, which assumes
+                clients are always healthy.
+            close (Callable[[T], None] | None, optional): releases the client
+                resources when it is removed. Defaults to None.
+            max_idle_seconds (float, optional): clients that have not been
+                used for this long are removed. Defaults to 300.
+        """
+        self.create = create
+        self.is_healthy = is_healthy
+        self.close = close
+        self.max_idle_seconds = max_idle_seconds
+        self.created = 0
+        self.evicted = 0
+        self.replaced = 0
+        self._clients: dict[tuple, _PooledClient[T]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, **config: Hashable) -> T:
+        """Get the client of a config, create it if needed.
+
+        Args:
+            config (Hashable): client constructor arguments
+
+        Returns:
+            T: the shared client
+        """
+        key = tuple(sorted(config.items()))
+        now = time.monotonic()
+        removed: list[T] = []
+        with self._lock:
+            for other_key, pooled in list(self._clients.items()):
+                if now - pooled.last_used > self.max_idle_seconds:
+                    removed.append(self._clients.pop(other_key).client)
+                    self.evicted += 1
+            pooled = self._clients.get(key)
+            if pooled is not None and not self._check(pooled.client):
+                removed.append(self._clients.pop(key).client)
+                self.replaced += 1
+                pooled = None
+            if pooled is None:
+                pooled = _PooledClient(self.create(**config), now)
+                self._clients[key] = pooled
+                self.created += 1
+            pooled.last_used = now
+        for client in removed:
+            self._close(client)
+        return pooled.client
+
+    def __len__(self) -> int:
+        """Number of clients in the pool.
+
+        Returns:
+            int: number of clients
+        """
+        with self._lock:
+            return len(self._clients)
+
+    def _check(self, client: T) -> bool:
+        """Run the health check of a client.
+
+        Args:
+            client (T): the pooled client
+
+        Returns:
+            bool: True if the client can be used
+        """
+        if self.is_healthy is None:
+            return True
+        try:
+            return self.is_healthy(client)
+        except Exception:
+            return False
+
+    def _close(self, client: T) -> None:
+        """Release a removed client, errors are ignored.
+
+        Args:
+            client (T): the removed client
+        """
+        if self.close is None:
+            return
+        try:
+            self.close(client)
+        except Exception:
+            pass
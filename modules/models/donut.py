@@ -1,22 +1,56 @@
+import contextlib
+
 import torch
-import xmltodict
 from PIL import Image
-from transformers import AutoModelForVision2Seq, AutoProcessor
+from transformers import (
+    AutoModelForVision2Seq,
+    AutoProcessor,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
 
-from modules.data.receipt_data import ItemData, ReceiptData
+from modules.data.receipt_data import ReceiptData
+from modules.errors import AIError
 
-from .base import AIModel
+from .base import AIModel, InferencePrecision, as_ai_error
+from .donut_common import (
+    CLOSING_TOKEN,
+    DECODE_TIMEOUT_SECONDS,
+    MODEL_NAME,
+    START_TOKEN,
+    WARM_UP_IMAGE_SIZE,
+    estimate_decode_budget,
+    format_receipt_dict,
+    parse_prediction,
+)
+from .preprocess import ImagePreprocessor
 
-MODEL_NAME = "naver-clova-ix/donut-base-finetuned-cord-v2"
+MAX_BATCH_SIZE = 4
 
 
 class DonutModel(AIModel):
     """Receipt reader based on Donut model."""
 
-    def __init__(self) -> None:
-        """Initialize the model."""
+    # results include the reading confidence since version 2
+    version = "2"
+    # the model input is 960x1280, larger images only slow down the processor
+    preprocessor = ImagePreprocessor(max_side=2560)
+
+    def __init__(self, precision: InferencePrecision = InferencePrecision.FP32) -> None:
+        """Initialize the model.
+
+        Args:
+            precision (InferencePrecision, optional): numeric precision used
+                for CPU inference. Defaults to InferencePrecision.FP32.
+        """
+        self.precision = precision
         self.processor = AutoProcessor.from_pretrained(MODEL_NAME)
         self.model = AutoModelForVision2Seq.from_pretrained(MODEL_NAME)
+        self.model.eval()
+        if precision == InferencePrecision.INT8:
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
 
     def run(self, image: Image.Image) -> ReceiptData:
         """Retrieve data from the receipt.
@@ -27,50 +61,164 @@ class DonutModel(AIModel):
         Returns:
             ReceiptData: parsed receipt data
         """
-        text_input, image_input = self._preprocess(image)
-        prediction_str = self._inference(image_input, text_input)
-        receipt_dict = self._postprocess(prediction_str)
-        print(receipt_dict)
-        return self._formatting(receipt_dict)
+        result = self.run_batch([image])[0]
+        if isinstance(result, AIError):
+            raise result
+        return result
+
+    def run_batch(self, images: list[Image.Image]) -> list[ReceiptData | AIError]:
+        """Retrieve data from several receipts.
+
+        Images are stacked and decoded together, up to MAX_BATCH_SIZE images
+        in a single generate call.
+
+        Args:
+            images (list[Image.Image]): the receipt photo images
+
+        Returns:
+            list[ReceiptData | AIError]: parsed receipt data or the reading
+                error, in the same order as the images
+        """
+        results: list[ReceiptData | AIError] = []
+        for start in range(0, len(images), MAX_BATCH_SIZE):
+            batch = images[start : start + MAX_BATCH_SIZE]
+            try:
+                results.extend(self._read_batch(batch))
+            except Exception as err:
+                # the images of a failed batch all get its error
+                results.extend([as_ai_error(err)] * len(batch))
+        return results
+
+    def _read_batch(self, images: list[Image.Image]) -> list[ReceiptData | AIError]:
+        """Decode several receipts in a single generate call.
+
+        Args:
+            images (list[Image.Image]): the receipt photo images, at most
+                MAX_BATCH_SIZE of them
+
+        Returns:
+            list[ReceiptData | AIError]: parsed receipt data or the parsing
+                error, in the same order as the images
+        """
+        images = [self.preprocessor.apply(image) for image in images]
+        text_input, image_input = self._preprocess(images)
+        max_length = max(
+            estimate_decode_budget(
+                img, self.model.decoder.config.max_position_embeddings
+            )
+            for img in images
+        )
+        prediction_strs, confidences = self._inference(
+            image_input, text_input, max_length
+        )
+        results: list[ReceiptData | AIError] = []
+        for prediction_str, confidence in zip(prediction_strs, confidences):
+            try:
+                receipt = self._formatting(self._postprocess(prediction_str))
+                receipt.confidence = confidence
+                results.append(receipt)
+            except Exception as err:
+                results.append(as_ai_error(err))
+        return results
+
+    def warm_up(self) -> None:
+        """Run a dummy inference to trigger the lazy allocations."""
+        # inference errors are raised, unlike in run_batch
+        self._read_batch([Image.new("RGB", WARM_UP_IMAGE_SIZE, "white")])
+
+    def memory_usage(self) -> int:
+        """Memory used by the model weights and buffers.
+
+        Returns:
+            int: memory usage in bytes
+        """
+        tensors: dict[int, torch.Tensor] = {}
+        for value in self.model.state_dict().values():
+            for tensor in _flatten_tensors(value):
+                tensors[tensor.data_ptr()] = tensor
+        return sum(t.numel() * t.element_size() for t in tensors.values())
+
+    def _precision_context(self) -> contextlib.AbstractContextManager:
+        """Context manager that applies the inference precision.
+
+        Returns:
+            contextlib.AbstractContextManager: the precision context
+        """
+        if self.precision == InferencePrecision.BF16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
 
-    def _preprocess(self, image: Image.Image) -> tuple[torch.Tensor, torch.Tensor]:
+    def _preprocess(
+        self, images: list[Image.Image]
+    ) -> tuple[torch.Tensor, torch.Tensor]:
         """Preprocess image data and generate start token.
 
         Args:
-            image (Image.Image): loaded image
+            images (list[Image.Image]): loaded images
 
         Returns:
-            tuple[torch.Tensor, torch.Tensor]: start token and processed image
+            tuple[torch.Tensor, torch.Tensor]: start tokens and processed
+                images, stacked along the batch dimension
         """
         decoder_input_ids = self.processor.tokenizer(
-            "<s_cord-v2>", add_special_tokens=False
+            START_TOKEN, add_special_tokens=False
         ).input_ids
-        decoder_input_ids = torch.tensor(decoder_input_ids).unsqueeze(0)
-        pixel_values = self.processor(image, return_tensors="pt").pixel_values
+        decoder_input_ids = torch.tensor(decoder_input_ids).repeat(len(images), 1)
+        pixel_values = self.processor(images, return_tensors="pt").pixel_values
         return decoder_input_ids, pixel_values
 
-    def _inference(self, image_input: torch.Tensor, text_input: torch.Tensor) -> str:
+    def _inference(
+        self, image_input: torch.Tensor, text_input: torch.Tensor, max_length: int
+    ) -> tuple[list[str], list[float]]:
         """Run model inference.
 
+        Generation stops when the total section of the receipt has been
+        closed, when max_length is reached, or after DECODE_TIMEOUT_SECONDS.
+
         Args:
-            image_input (torch.Tensor): pre-processed image
-            text_input (torch.Tensor): start token
+            image_input (torch.Tensor): pre-processed images
+            text_input (torch.Tensor): start tokens
+            max_length (int): maximum decoding length
 
         Returns:
-            str: read results, still in xml format, not including start token
+            tuple[list[str], list[float]]: read results for each image,
+                still in xml format, not including start token, and their
+                confidence, the geometric mean of the generated tokens
+                probabilities
         """
-        generation_output = self.model.generate(
-            image_input,
-            decoder_input_ids=text_input,
-            max_length=self.model.decoder.config.max_position_embeddings,
-            pad_token_id=self.processor.tokenizer.pad_token_id,
-            eos_token_id=self.processor.tokenizer.eos_token_id,
-            use_cache=True,
-            num_beams=1,
-            bad_words_ids=[[self.processor.tokenizer.unk_token_id]],
-            return_dict_in_generate=True,
+        stopping_criteria = StoppingCriteriaList()
+        closing_token_id = self.processor.tokenizer.convert_tokens_to_ids(CLOSING_TOKEN)
+        if closing_token_id != self.processor.tokenizer.unk_token_id:
+            stopping_criteria.append(TokenEmittedCriteria(closing_token_id))
+        with torch.inference_mode(), self._precision_context():
+            generation_output = self.model.generate(
+                image_input,
+                decoder_input_ids=text_input,
+                max_length=max_length,
+                max_time=DECODE_TIMEOUT_SECONDS,
+                stopping_criteria=stopping_criteria,
+                pad_token_id=self.processor.tokenizer.pad_token_id,
+                eos_token_id=self.processor.tokenizer.eos_token_id,
+                use_cache=True,
+                num_beams=1,
+                bad_words_ids=[[self.processor.tokenizer.unk_token_id]],
+                return_dict_in_generate=True,
+                output_scores=True,
+            )
+            log_probs = self.model.compute_transition_scores(
+                generation_output.sequences,
+                generation_output.scores,
+                normalize_logits=True,
+            )
+        # sequences that are done early are padded, the padding is not counted
+        generated = generation_output.sequences[:, text_input.shape[1] :]
+        is_token = generated != self.processor.tokenizer.pad_token_id
+        log_probs = log_probs.masked_fill(~is_token, 0.0)
+        mean_log_probs = log_probs.sum(dim=1) / is_token.sum(dim=1).clamp(min=1)
+        return (
+            self.processor.batch_decode(generation_output.sequences),
+            mean_log_probs.exp().tolist(),
         )
-        return self.processor.batch_decode(generation_output.sequences)[0]
 
     def _postprocess(self, prediction_str: str) -> dict:
         """Process model predictions.
@@ -81,11 +229,10 @@ class DonutModel(AIModel):
         Returns:
             dict: processed prediction as dictionary
         """
-        prediction_str = prediction_str.replace(self.processor.tokenizer.eos_token, "")
-        prediction_str = prediction_str.replace(self.processor.tokenizer.pad_token, "")
-        prediction_str += "</s_cord-v2>"
-        bill_dict = xmltodict.parse(prediction_str)
-        return bill_dict
+        tokenizer = self.processor.tokenizer
+        return parse_prediction(
+            prediction_str, [tokenizer.eos_token, tokenizer.pad_token]
+        )
 
     def _formatting(self, receipt_dict: dict) -> ReceiptData:
         """Parse dictionary data of model predictions.
@@ -96,31 +243,48 @@ class DonutModel(AIModel):
         Returns:
             ReceiptData: parsed receipt data
         """
-        data_dict = receipt_dict["s_cord-v2"]
-        item_names = data_dict["s_menu"]["s_nm"]
-        item_counts = data_dict["s_menu"]["s_cnt"]
-        item_price = data_dict["s_menu"]["s_price"]
-        items = [
-            ItemData(
-                name=name,
-                count=int(count),
-                total_price=_convert_price_str_to_float(price),
-            )
-            for name, count, price in zip(item_names, item_counts, item_price)
-        ]
-        total = _convert_price_str_to_float(data_dict["s_total"]["s_total_price"])
-        return ReceiptData(items={it.id: it for it in items}, total=total)
+        return format_receipt_dict(receipt_dict)
+
+
+class TokenEmittedCriteria(StoppingCriteria):
+    """Stop generating a sequence once a specific token has been emitted."""
+
+    def __init__(self, token_id: int) -> None:
+        """Initialize the criteria.
+
+        Args:
+            token_id (int): the token that ends the generation
+        """
+        self.token_id = token_id
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> torch.BoolTensor:
+        """Check which sequences are done.
+
+        Args:
+            input_ids (torch.LongTensor): generated sequences so far
+            scores (torch.FloatTensor): prediction scores of the last step
+
+        Returns:
+            torch.BoolTensor: True for each sequence that has emitted the token
+        """
+        return (input_ids == self.token_id).any(dim=-1)
 
 
-def _convert_price_str_to_float(price_str: str) -> float:
-    """Convert price formatted as text to float.
+def _flatten_tensors(value: object) -> list[torch.Tensor]:
+    """Collect tensors from a state dict value.
 
-    In particular, handle the price separator
+    Quantized layers store their packed weights as tuples of tensors.
 
     Args:
-        price_str (str): price as text
+        value (object): state dict value
 
     Returns:
-        float: parsed float price
+        list[torch.Tensor]: tensors found in the value
     """
-    return float(price_str.replace(",", ""))
+    if isinstance(value, torch.Tensor):
+        return [value]
+    if isinstance(value, (tuple, list)):
+        return [t for v in value for t in _flatten_tensors(v)]
+    return []
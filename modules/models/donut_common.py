@@ -0,0 +1,113 @@
+"""
+Donut reading utilities that are shared by all Donut backends
+
+This module must not depend on torch or transformers, so that backends that
+do not need them can be imported quickly.
+"""
+
+import xmltodict
+from PIL import Image, ImageStat
+
+from modules.data.receipt_data import ItemData, ReceiptData
+
+MODEL_NAME = "naver-clova-ix/donut-base-finetuned-cord-v2"
+START_TOKEN = "<s_cord-v2>"
+END_TOKEN = "</s_cord-v2>"
+# generation can stop once the total section, the last one, has been closed
+CLOSING_TOKEN = "</s_total>"
+
+# decode budget estimation, see estimate_decode_budget
+DECODE_BASE_TOKENS = 64
+DECODE_TOKENS_PER_LINE = 32
+DECODE_MIN_TOKENS = 128
+DECODE_TIMEOUT_SECONDS = 20.0
+LINE_DETECTION_WIDTH = 256
+
+WARM_UP_IMAGE_SIZE = (960, 1280)
+
+
+def estimate_decode_budget(image: Image.Image, max_length: int) -> int:
+    """Estimate the number of tokens needed to read a receipt.
+
+    The number of text lines is estimated from the rows of the image
+    that contain dark pixels, each line is given a fixed token budget.
+
+    Args:
+        image (Image.Image): the receipt photo image
+        max_length (int): maximum decoding length supported by the model
+
+    Returns:
+        int: maximum decoding length
+    """
+    width, height = image.size
+    scaled_height = max(1, int(height * LINE_DETECTION_WIDTH / width))
+    gray = image.convert("L").resize((LINE_DETECTION_WIDTH, scaled_height))
+    threshold = ImageStat.Stat(gray).mean[0] * 0.75
+    dark = gray.point(lambda p: 255 if p < threshold else 0)
+    # averaging every row into a single pixel gives the dark pixels ratio
+    dark_ratio = dark.resize((1, scaled_height), Image.Resampling.BOX).getdata()
+    is_text_row = [value > 0.02 * 255 for value in dark_ratio]
+    # a line starts at every text row that follows a non-text row
+    num_lines = sum(
+        1
+        for idx, is_text in enumerate(is_text_row)
+        if is_text and (idx == 0 or not is_text_row[idx - 1])
+    )
+    budget = DECODE_BASE_TOKENS + DECODE_TOKENS_PER_LINE * num_lines
+    return min(max_length, max(DECODE_MIN_TOKENS, budget))
+
+
+def parse_prediction(prediction_str: str, removed_tokens: list[str]) -> dict:
+    """Process raw model predictions.
+
+    Args:
+        prediction_str (str): raw predictions from the model
+        removed_tokens (list[str]): special tokens to be removed, such as
+            end of sequence and padding tokens
+
+    Returns:
+        dict: processed prediction as dictionary
+    """
+    for token in removed_tokens:
+        prediction_str = prediction_str.replace(token, "")
+    prediction_str += END_TOKEN
+    return xmltodict.parse(prediction_str)
+
+
+def format_receipt_dict(receipt_dict: dict) -> ReceiptData:
+    """Parse dictionary data of model predictions.
+
+    Args:
+        receipt_dict (dict): prediction dictionary
+
+    Returns:
+        ReceiptData: parsed receipt data
+    """
+    data_dict = receipt_dict["s_cord-v2"]
+    item_names = data_dict["s_menu"]["s_nm"]
+    item_counts = data_dict["s_menu"]["s_cnt"]
+    item_price = data_dict["s_menu"]["s_price"]
+    items = [
+        ItemData(
+            name=name,
+            count=int(count),
+            total_price=_convert_price_str_to_float(price),
+        )
+        for name, count, price in zip(item_names, item_counts, item_price)
+    ]
+    total = _convert_price_str_to_float(data_dict["s_total"]["s_total_price"])
+    return ReceiptData(items={it.id: it for it in items}, total=total)
+
+
+def _convert_price_str_to_float(price_str: str) -> float:
+    """Convert price formatted as text to float.
+
+    In particular, handle the price separator
+
+    Args:
+        price_str (str): price as text
+
+    Returns:
+        float: parsed float price
+    """
+    return float(price_str.replace(",", ""))
@@ -0,0 +1,38 @@
+"""
+One-off export of the Donut checkpoint to ONNX, used by DonutOnnxModel
+
+Requires optimum with its ONNX exporter, which is not needed to run the app:
+
+    pip install "optimum[exporters]"
+    python -m modules.models.donut_export [output_dir]
+"""
+
+import sys
+
+from transformers import AutoProcessor
+
+from .donut_common import MODEL_NAME
+from .donut_onnx import DEFAULT_EXPORT_DIR
+
+
+def export(output_dir: str = DEFAULT_EXPORT_DIR) -> None:
+    """Export the encoder and the decoders with and without key-value cache.
+
+    Args:
+        output_dir (str, optional): directory where the artifacts are saved.
+            Defaults to DEFAULT_EXPORT_DIR.
+    """
+    from optimum.exporters.onnx import main_export
+
+    main_export(
+        MODEL_NAME,
+        output=output_dir,
+        task="image-to-text-with-past",
+        # keep separate decoders instead of a single merged one
+        no_post_process=True,
+    )
+    AutoProcessor.from_pretrained(MODEL_NAME).save_pretrained(output_dir)
+
+
+if __name__ == "__main__":
+    export(*sys.argv[1:])
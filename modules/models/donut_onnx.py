@@ -0,0 +1,240 @@
+import importlib.util
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from PIL import Image
+from tokenizers import Tokenizer
+
+from modules.data.receipt_data import ReceiptData
+from modules.errors import SettingsError
+
+from .base import AIModel
+from .donut_common import (
+    CLOSING_TOKEN,
+    DECODE_TIMEOUT_SECONDS,
+    START_TOKEN,
+    WARM_UP_IMAGE_SIZE,
+    estimate_decode_budget,
+    format_receipt_dict,
+    parse_prediction,
+)
+from .preprocess import ImagePreprocessor
+
+if TYPE_CHECKING:
+    import onnxruntime as ort
+
+DEFAULT_EXPORT_DIR = os.environ.get("DONUT_ONNX_DIR", "exported/donut-onnx")
+
+ENCODER_FILE = "encoder_model.onnx"
+DECODER_FILE = "decoder_model.onnx"
+DECODER_WITH_PAST_FILE = "decoder_with_past_model.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+PREPROCESSOR_FILE = "preprocessor_config.json"
+
+
+class DonutOnnxModel(AIModel):
+    """Receipt reader based on Donut model exported to ONNX.
+
+    The artifacts are created once with `python -m modules.models.donut_export`.
+    Neither torch nor transformers are needed to run this model, but
+    onnxruntime is, which is installed from requirements-onnx.txt.
+    """
+
+    preprocessor = ImagePreprocessor(max_side=2560)
+
+    def __init__(self, export_dir: str = DEFAULT_EXPORT_DIR) -> None:
+        """Initialize the model.
+
+        Args:
+            export_dir (str, optional): directory of the exported artifacts.
+                Defaults to DONUT_ONNX_DIR env variable or exported/donut-onnx.
+        """
+        self.export_dir = Path(export_dir)
+        required_files = [
+            ENCODER_FILE,
+            DECODER_FILE,
+            DECODER_WITH_PAST_FILE,
+            TOKENIZER_FILE,
+            PREPROCESSOR_FILE,
+        ]
+        missing = [f for f in required_files if not (self.export_dir / f).exists()]
+        if len(missing) > 0:
+            raise SettingsError(
+                f"Exported Donut model is not found in {self.export_dir}. Please "
+                "export it first with: python -m modules.models.donut_export"
+            )
+        if importlib.util.find_spec("onnxruntime") is None:
+            raise SettingsError(
+                "ONNX Runtime is not installed. Please install it with: "
+                "pip install -r requirements-onnx.txt"
+            )
+
+        self.encoder = self._create_session(ENCODER_FILE)
+        self.decoder = self._create_session(DECODER_FILE)
+        self.decoder_with_past = self._create_session(DECODER_WITH_PAST_FILE)
+        self.tokenizer = Tokenizer.from_file(str(self.export_dir / TOKENIZER_FILE))
+        with open(self.export_dir / PREPROCESSOR_FILE) as f:
+            self.preprocessor_config = json.load(f)
+        with open(self.export_dir / "config.json") as f:
+            decoder_config = json.load(f)["decoder"]
+        self.max_length: int = decoder_config["max_position_embeddings"]
+
+        self.start_token_id = self.tokenizer.token_to_id(START_TOKEN)
+        self.eos_token_id = self.tokenizer.token_to_id("</s>")
+        self.unk_token_id = self.tokenizer.token_to_id("<unk>")
+        self.closing_token_id = self.tokenizer.token_to_id(CLOSING_TOKEN)
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        """Retrieve data from the receipt.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            ReceiptData: parsed receipt data
+        """
+        image = self.preprocessor.apply(image)
+        pixel_values = self._preprocess(image)
+        max_length = estimate_decode_budget(image, self.max_length)
+        prediction_str = self._inference(pixel_values, max_length)
+        receipt_dict = parse_prediction(prediction_str, ["</s>", "<pad>"])
+        return format_receipt_dict(receipt_dict)
+
+    def warm_up(self) -> None:
+        """Run a dummy inference to trigger the lazy allocations."""
+        self.run_batch([Image.new("RGB", WARM_UP_IMAGE_SIZE, "white")])
+
+    def memory_usage(self) -> int:
+        """Memory used by the model weights, approximated by the graph sizes.
+
+        Returns:
+            int: memory usage in bytes
+        """
+        files = [ENCODER_FILE, DECODER_FILE, DECODER_WITH_PAST_FILE]
+        return sum((self.export_dir / f).stat().st_size for f in files)
+
+    def _create_session(self, file_name: str) -> "ort.InferenceSession":
+        """Load an exported graph.
+
+        Args:
+            file_name (str): graph file name inside the export directory
+
+        Returns:
+            ort.InferenceSession: the loaded graph
+        """
+        # onnxruntime is optional, it is only imported by this model
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(
+            str(self.export_dir / file_name),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    def _preprocess(self, image: Image.Image) -> np.ndarray:
+        """Resize, pad and normalize the image like DonutImageProcessor.
+
+        The sizes are computed with the same arithmetic as the processor, so
+        the model gets the same pixels as with transformers.
+
+        Args:
+            image (Image.Image): loaded image
+
+        Returns:
+            np.ndarray: processed image with shape (1, 3, height, width)
+        """
+        config = self.preprocessor_config
+        height, width = config["size"]["height"], config["size"]["width"]
+        image = image.convert("RGB")
+
+        is_long_axis_swapped = (width < height and image.width > image.height) or (
+            width > height and image.width < image.height
+        )
+        if config.get("do_align_long_axis", False) and is_long_axis_swapped:
+            image = image.transpose(Image.Transpose.ROTATE_270)
+
+        # the shortest edge is resized to the shortest input side, the
+        # longest edge is truncated
+        shortest_edge = min(height, width)
+        if image.width <= image.height:
+            new_size = (shortest_edge, int(shortest_edge * image.height / image.width))
+        else:
+            new_size = (int(shortest_edge * image.width / image.height), shortest_edge)
+        resample = Image.Resampling(config.get("resample", 2))
+        image = image.resize(new_size, resample)
+
+        # then the image is fitted inside the input size, keeping its ratio
+        thumbnail_height = min(image.height, height)
+        thumbnail_width = min(image.width, width)
+        if (thumbnail_width, thumbnail_height) != image.size:
+            if image.height > image.width:
+                thumbnail_width = int(image.width * thumbnail_height / image.height)
+            elif image.width > image.height:
+                thumbnail_height = int(image.height * thumbnail_width / image.width)
+            image = image.resize(
+                (thumbnail_width, thumbnail_height),
+                Image.Resampling.BICUBIC,
+                reducing_gap=2.0,
+            )
+
+        canvas = Image.new("RGB", (width, height))
+        canvas.paste(image, ((width - image.width) // 2, (height - image.height) // 2))
+
+        rescale_factor = config.get("rescale_factor", 1 / 255)
+        pixels = (np.asarray(canvas, dtype=np.float64) * rescale_factor).astype(
+            np.float32
+        )
+        mean = np.array(config["image_mean"], dtype=np.float32)
+        std = np.array(config["image_std"], dtype=np.float32)
+        pixels = (pixels - mean) / std
+        return pixels.transpose(2, 0, 1)[np.newaxis]
+
+    def _inference(self, pixel_values: np.ndarray, max_length: int) -> str:
+        """Run greedy decoding with explicit key-value cache.
+
+        Args:
+            pixel_values (np.ndarray): pre-processed image
+            max_length (int): maximum decoding length
+
+        Returns:
+            str: read results, still in xml format
+        """
+        (encoder_hidden_states,) = self.encoder.run(
+            ["last_hidden_state"], {"pixel_values": pixel_values}
+        )
+        token_ids = [self.start_token_id]
+        inputs: dict[str, np.ndarray] = {
+            "input_ids": np.array([token_ids], dtype=np.int64),
+            "encoder_hidden_states": encoder_hidden_states,
+            "encoder_attention_mask": np.ones(
+                encoder_hidden_states.shape[:2], dtype=np.int64
+            ),
+        }
+        session = self.decoder
+        deadline = time.monotonic() + DECODE_TIMEOUT_SECONDS
+        while len(token_ids) < max_length and time.monotonic() < deadline:
+            input_names = {it.name for it in session.get_inputs()}
+            output_names = [it.name for it in session.get_outputs()]
+            outputs = session.run(
+                output_names, {k: v for k, v in inputs.items() if k in input_names}
+            )
+            logits = outputs[0][0, -1]
+            logits[self.unk_token_id] = -np.inf
+            next_token_id = int(logits.argmax())
+            token_ids.append(next_token_id)
+            if next_token_id in (self.eos_token_id, self.closing_token_id):
+                break
+
+            # the first step caches the encoder attention too, later steps
+            # only update the decoder self-attention cache
+            for name, value in zip(output_names[1:], outputs[1:]):
+                inputs[name.replace("present", "past_key_values")] = value
+            inputs["input_ids"] = np.array([[next_token_id]], dtype=np.int64)
+            session = self.decoder_with_past
+        return self.tokenizer.decode(token_ids, skip_special_tokens=False)
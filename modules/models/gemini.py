@@ -1,19 +1,89 @@
+import asyncio
 import base64
+import hashlib
 import json
+import math
 import os
-from io import BytesIO
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Callable, Iterator
 
-from langchain_core.messages import HumanMessage
+from google.api_core.exceptions import (
+    BadGateway,
+    DeadlineExceeded,
+    GatewayTimeout,
+    InternalServerError,
+    InvalidArgument,
+    ResourceExhausted,
+    ServiceUnavailable,
+    TooManyRequests,
+)
+from langchain_core.messages import BaseMessage, HumanMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from PIL import Image
 
 from modules.data.receipt_data import ItemData, ReceiptData
-from modules.utils import AIError, SettingsError
+from modules.errors import AIError, SettingsError
 
-from .base import AIModel
+from .async_runner import ASYNC_RUNNER
+from .base import AIModel, as_ai_error
+from .client_pool import ClientPool
+from .menu_stream import MenuStreamParser
+from .preprocess import ImagePreprocessor
+from .rate_limit import KeyRateScheduler, RateLimits
 
 MODEL_NAME = "gemini-2.5-flash"
 
+# maximum number of requests in flight across all sessions
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "60"))
+GEMINI_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 16.0
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    DeadlineExceeded,
+    ResourceExhausted,
+    TooManyRequests,
+    InternalServerError,
+    BadGateway,
+    ServiceUnavailable,
+    GatewayTimeout,
+)
+# status code of errors that only keep it in their message, like "503 The
+# service is unavailable" or "HTTP status code: 503"
+STATUS_CODE_PATTERN = re.compile(
+    r"^(\d{3}) |\b(?:status code|status|HTTP|error code):? (\d{3})\b",
+    re.IGNORECASE,
+)
+# pooled clients unused for this long are closed
+LLM_CLIENT_MAX_IDLE_SECONDS = float(
+    os.environ.get("LLM_CLIENT_MAX_IDLE_SECONDS", "300")
+)
+# quota of each API key, shared by all sessions using the key
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "10"))
+GEMINI_TOKENS_PER_MINUTE = float(os.environ.get("GEMINI_TOKENS_PER_MINUTE", "250000"))
+# token usage estimate of a request, corrected with the reported usage
+IMAGE_TILE_SIZE = 768
+IMAGE_TILE_TOKENS = 258
+CHARS_PER_TOKEN = 4
+ESTIMATED_OUTPUT_TOKENS = 1024
+# receipts packed in one request by run_batch, see _pack_batches
+BATCH_MAX_IMAGES = 8
+# inline request data is limited to 20 MB, base64 adds a third to the images
+BATCH_MAX_IMAGE_BYTES = 14 * 2**20
+# message of the invalid argument errors sent for requests above the limits
+REQUEST_TOO_LARGE_PATTERN = re.compile(
+    r"payload size|too large|exceeds the maximum|token count", re.IGNORECASE
+)
+
 PROMPT = """
 You are given an image of a receipt. Please read the content into JSON format:
 
@@ -38,17 +108,213 @@ Note that no need to give unit price
 return only in JSON format
 """
 
+BATCH_PROMPT = """
+You are given images of several receipts, each of them preceded by its receipt number.
+Please read the content of every receipt into a JSON array, one object per receipt:
+
+```
+[
+    {
+        "index": <receipt_number>,
+        "menus": [
+            {
+                "name": <item_name>,
+                "count": <purchased_count>,
+                "price": <total_price_for_this_item>
+            },
+            ...
+        ],
+        "total": <total_price_in_receipt>
+    },
+    ...
+]
+```
+
+For price/total: do not use comma or point separator, just bare number, except for decimal
+For count: assume 1 if no count number is found in the receipt
+Note that no need to give unit price
+
+return only in JSON format
+"""
+
+# structured output schemas of the prompts, the menus are asked first so they
+# can be shown while the response is streamed
+MENU_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "count": {"type": "integer"},
+        "price": {"type": "number"},
+    },
+    "required": ["name", "count", "price"],
+    "property_ordering": ["name", "count", "price"],
+}
+RECEIPT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "menus": {"type": "array", "items": MENU_SCHEMA},
+        "total": {"type": "number"},
+    },
+    "required": ["menus", "total"],
+    "property_ordering": ["menus", "total"],
+}
+BATCH_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"index": {"type": "integer"}, **RECEIPT_SCHEMA["properties"]},
+        "required": ["index", "menus", "total"],
+        "property_ordering": ["index", "menus", "total"],
+    },
+}
+
+
+@dataclass(frozen=True)
+class _EncodedImage:
+    """Receipt image ready to be sent to Gemini."""
+
+    content: dict
+    num_bytes: int
+    tokens: int
+
+
+@dataclass
+class GeminiMetrics:
+    """Statistics of the Gemini requests of this process."""
+
+    requests: int = 0
+    succeeded: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    failed: int = 0
+    rate_limited: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def average_latency(self) -> float:
+        """Average latency of the succeeded requests.
+
+        Returns:
+            float: average latency in seconds, 0 if no request has succeeded
+        """
+        if self.succeeded == 0:
+            return 0.0
+        return self.total_latency / self.succeeded
+
+
+GEMINI_METRICS = GeminiMetrics()
+_metrics_lock = threading.Lock()
+# created on first use, it must belong to the async runner event loop
+_request_semaphore: asyncio.Semaphore | None = None
+_rate_scheduler = KeyRateScheduler(
+    RateLimits(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
+)
+
+
+def _create_llm(api_key: str, model: str, temperature: float) -> ChatGoogleGenerativeAI:
+    """Create Gemini client.
+
+    Args:
+        api_key (str): Google API key
+        model (str): Gemini model name
+        temperature (float): sampling temperature
+
+    Returns:
+        ChatGoogleGenerativeAI: the client
+    """
+    # retries are done by GeminiModel, see GeminiModel._ainvoke
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        google_api_key=api_key,
+        max_retries=1,
+        response_mime_type="application/json",
+    )
+
+
+def _is_llm_healthy(llm: ChatGoogleGenerativeAI) -> bool:
+    """Check whether the connection of a Gemini client can still be used.
+
+    Args:
+        llm (ChatGoogleGenerativeAI): the client
+
+    Returns:
+        bool: False if the connection is failing or has been closed
+    """
+    # the async client is only created by the first request
+    if llm.async_client_running is None:
+        return True
+    state = llm.async_client_running.transport.grpc_channel.get_state()
+    return state.name not in ("TRANSIENT_FAILURE", "SHUTDOWN")
+
+
+def _close_llm(llm: ChatGoogleGenerativeAI) -> None:
+    """Close the connections of a Gemini client.
+
+    Args:
+        llm (ChatGoogleGenerativeAI): the client
+    """
+    llm.client.transport.close()
+    if llm.async_client_running is not None:
+        # the async connection belongs to the async runner event loop
+        ASYNC_RUNNER.submit(llm.async_client_running.transport.close())
+
+
+# clients are shared by all models using the same key, model and temperature,
+# so their connections are reused
+LLM_CLIENTS = ClientPool(
+    _create_llm,
+    is_healthy=_is_llm_healthy,
+    close=_close_llm,
+    max_idle_seconds=LLM_CLIENT_MAX_IDLE_SECONDS,
+)
+
 
 class GeminiModel(AIModel):
     """Receipt reader based on Gemini model API."""
 
-    def __init__(self) -> None:
-        """Initialize the model."""
-        if "GOOGLE_API_KEY" not in os.environ or os.environ["GOOGLE_API_KEY"] == "":
+    def __init__(
+        self,
+        api_key: str | None = None,
+        max_image_side: int = 2048,
+        image_format: str = "JPEG",
+        image_quality: int = 85,
+    ) -> None:
+        """Initialize the model.
+
+        Args:
+            api_key (str | None, optional): Google API key. Defaults to None,
+                which means the key is taken from GOOGLE_API_KEY env variable.
+            max_image_side (int, optional): images are downscaled to fit this
+                size before being sent. Defaults to 2048.
+            image_format (str, optional): format of the sent images, such as
+                JPEG, WEBP or PNG. Defaults to "JPEG".
+            image_quality (int, optional): quality of lossy image formats.
+                Defaults to 85.
+        """
+        self.preprocessor = ImagePreprocessor(
+            max_side=max_image_side,
+            encode_format=image_format,
+            encode_quality=image_quality,
+        )
+        if api_key is None:
+            api_key = os.environ.get("GOOGLE_API_KEY", "")
+        if api_key == "":
             raise SettingsError(
                 "No Google API key has been set. Please set it when using Gemini."
             )
-        self.llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.0)
+        self.api_key = api_key
+        # identifies the key in the rate scheduler without keeping it there
+        self.api_key_id = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+    @property
+    def llm(self) -> ChatGoogleGenerativeAI:
+        """Gemini client, taken from the shared pool.
+
+        Returns:
+            ChatGoogleGenerativeAI: the client
+        """
+        return LLM_CLIENTS.get(api_key=self.api_key, model=MODEL_NAME, temperature=0.0)
 
     def run(self, image: Image.Image) -> ReceiptData:
         """Retrieve data from the receipt.
@@ -59,40 +325,402 @@ class GeminiModel(AIModel):
         Returns:
             ReceiptData: parsed receipt data
         """
-        image_b64 = self._encode_image(image)
+        return ASYNC_RUNNER.run(self.arun(image))
+
+    def submit(
+        self,
+        image: Image.Image,
+        on_item: Callable[[ItemData], None] | None = None,
+    ) -> Future[ReceiptData]:
+        """Start reading the receipt without waiting for the result.
+
+        Args:
+            image (Image.Image): the receipt photo image
+            on_item (Callable[[ItemData], None] | None, optional): called
+                with each item as soon as it is received, the response is
+                streamed when it is given. Defaults to None.
+
+        Returns:
+            Future[ReceiptData]: the reading result, cancelling it cancels
+                the request
+        """
+        return ASYNC_RUNNER.submit(self.arun(image, on_item))
+
+    async def arun(
+        self,
+        image: Image.Image,
+        on_item: Callable[[ItemData], None] | None = None,
+    ) -> ReceiptData:
+        """Retrieve data from the receipt asynchronously.
+
+        Args:
+            image (Image.Image): the receipt photo image
+            on_item (Callable[[ItemData], None] | None, optional): called
+                with each item as soon as it is received, the response is
+                streamed when it is given. Defaults to None.
+
+        Returns:
+            ReceiptData: parsed receipt data
+        """
+        encoded = await asyncio.to_thread(self._encode_receipt, image)
+        return await self._aread(encoded, on_item)
+
+    def run_batch(self, images: list[Image.Image]) -> list[ReceiptData | AIError]:
+        """Retrieve data from several receipts, packed in few requests.
+
+        Args:
+            images (list[Image.Image]): the receipt photo images
+
+        Returns:
+            list[ReceiptData | AIError]: parsed receipt data or the reading
+                error, in the same order as the images
+        """
+        return ASYNC_RUNNER.run(self.arun_batch(images))
+
+    async def arun_batch(
+        self, images: list[Image.Image]
+    ) -> list[ReceiptData | AIError]:
+        """Retrieve data from several receipts asynchronously.
+
+        The receipts are packed in requests of several images. Receipts
+        missing from a response, or that cannot be parsed, are read again
+        one by one.
+
+        Args:
+            images (list[Image.Image]): the receipt photo images
+
+        Returns:
+            list[ReceiptData | AIError]: parsed receipt data or the reading
+                error, in the same order as the images
+        """
+        encoded = await asyncio.gather(
+            *(asyncio.to_thread(self._encode_receipt, image) for image in images)
+        )
+        results: list[ReceiptData | AIError | None] = [None] * len(images)
+
+        async def read_batch(idxs: list[int]) -> None:
+            batch_results = await self._aread_batch([encoded[idx] for idx in idxs])
+            for idx, result in zip(idxs, batch_results):
+                results[idx] = result
+
+        await asyncio.gather(*(read_batch(idxs) for idxs in _pack_batches(encoded)))
+        return results
+
+    async def _aread(
+        self,
+        encoded: _EncodedImage,
+        on_item: Callable[[ItemData], None] | None = None,
+    ) -> ReceiptData:
+        """Send one receipt to Gemini and parse the response.
+
+        Args:
+            encoded (_EncodedImage): the encoded receipt image
+            on_item (Callable[[ItemData], None] | None, optional): called
+                with each item as soon as it is received. Defaults to None.
+
+        Returns:
+            ReceiptData: parsed receipt data
+        """
+        on_text = None
+        if on_item is not None:
+            parser = MenuStreamParser()
+
+            def on_text(text: str) -> None:
+                for menu in parser.feed(text):
+                    try:
+                        item = self._format_menu_dict(menu)
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    on_item(item)
+
         message = HumanMessage(
-            content=[
-                {
-                    "type": "text",
-                    "text": PROMPT,
-                },
-                {
-                    "type": "image_url",
-                    "image_url": f"data:image/png;base64,{image_b64}",
-                },
-            ]
+            content=[{"type": "text", "text": PROMPT}, encoded.content]
+        )
+        tokens = len(PROMPT) // CHARS_PER_TOKEN + encoded.tokens
+        response = await self._ainvoke(
+            [message], tokens + ESTIMATED_OUTPUT_TOKENS, on_text=on_text
         )
-        response = self.llm.invoke([message]).content
-        if not isinstance(response, str):
-            raise AIError(f"Gemini does not response with string, get: {response}")
+        response_text = self._response_text(response)
         try:
-            return self._format_response(response)
+            return self._format_response(response_text)
         except Exception as err:
-            raise AIError(f"Unable to parse Gemini response: {response}") from err
+            raise AIError(f"Unable to parse Gemini response: {response_text}") from err
+
+    async def _aread_batch(
+        self, encoded: list[_EncodedImage]
+    ) -> list[ReceiptData | AIError]:
+        """Send several receipts in one request and split the response.
+
+        A request that is too large, or whose response cannot be parsed, is
+        split in two smaller requests. Other errors, like quota, permission
+        or timeout errors, are the result of all receipts of the request.
+        Receipts that are not in the response are read individually.
+
+        Args:
+            encoded (list[_EncodedImage]): the encoded receipt images
+
+        Returns:
+            list[ReceiptData | AIError]: parsed receipt data or the reading
+                error, in the same order as the images
+        """
+        if len(encoded) == 1:
+            return [await self._aread_or_error(encoded[0])]
+
+        content: list[dict] = [{"type": "text", "text": BATCH_PROMPT}]
+        for idx, image in enumerate(encoded):
+            content.append({"type": "text", "text": f"Receipt number {idx}:"})
+            content.append(image.content)
+        tokens = len(BATCH_PROMPT) // CHARS_PER_TOKEN + sum(
+            image.tokens + ESTIMATED_OUTPUT_TOKENS for image in encoded
+        )
+        try:
+            response = await self._ainvoke(
+                [HumanMessage(content=content)], tokens, schema=BATCH_SCHEMA
+            )
+        except AIError as err:
+            if not _is_request_too_large(err):
+                return [err] * len(encoded)
+            return await self._aread_halves(encoded)
+        try:
+            parsed = self._format_batch_response(self._response_text(response))
+        except AIError:
+            return await self._aread_halves(encoded)
+
+        async def result_of(idx: int) -> ReceiptData | AIError:
+            if idx in parsed:
+                return parsed[idx]
+            return await self._aread_or_error(encoded[idx])
+
+        return list(await asyncio.gather(*(result_of(i) for i in range(len(encoded)))))
+
+    async def _aread_halves(
+        self, encoded: list[_EncodedImage]
+    ) -> list[ReceiptData | AIError]:
+        """Send the two halves of a batch in separate requests.
+
+        Args:
+            encoded (list[_EncodedImage]): the encoded receipt images
+
+        Returns:
+            list[ReceiptData | AIError]: parsed receipt data or the reading
+                error, in the same order as the images
+        """
+        half = len(encoded) // 2
+        first, second = await asyncio.gather(
+            self._aread_batch(encoded[:half]), self._aread_batch(encoded[half:])
+        )
+        return first + second
+
+    async def _aread_or_error(self, encoded: _EncodedImage) -> ReceiptData | AIError:
+        """Read one receipt, returning the error instead of raising it.
+
+        Args:
+            encoded (_EncodedImage): the encoded receipt image
+
+        Returns:
+            ReceiptData | AIError: parsed receipt data or the reading error
+        """
+        try:
+            return await self._aread(encoded)
+        except Exception as err:
+            return as_ai_error(err)
+
+    def metrics(self) -> dict[str, float]:
+        """Statistics of the Gemini requests of this process.
+
+        Returns:
+            dict[str, float]: metric values by name
+        """
+        with _metrics_lock:
+            return {
+                "requests": GEMINI_METRICS.requests,
+                "succeeded": GEMINI_METRICS.succeeded,
+                "retries": GEMINI_METRICS.retries,
+                "timeouts": GEMINI_METRICS.timeouts,
+                "failed": GEMINI_METRICS.failed,
+                "average latency (s)": GEMINI_METRICS.average_latency,
+                "rate limited": GEMINI_METRICS.rate_limited,
+                "pooled clients": len(LLM_CLIENTS),
+                "created clients": LLM_CLIENTS.created,
+                "replaced clients": LLM_CLIENTS.replaced,
+                "evicted clients": LLM_CLIENTS.evicted,
+            }
+
+    def estimated_wait(self) -> float:
+        """Time until the queued requests of this API key are sent.
+
+        Returns:
+            float: waiting time in seconds
+        """
+        return _rate_scheduler.estimated_wait(self.api_key_id)
+
+    def _encode_receipt(self, image: Image.Image) -> _EncodedImage:
+        """Preprocess and encode a receipt image for Gemini requests.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            _EncodedImage: the message content of the image, with its size
+                and estimated token usage
+        """
+        image = self.preprocessor.apply(image)
+        image_b64, mime_type = self._encode_image(image)
+        return _EncodedImage(
+            content={
+                "type": "image_url",
+                "image_url": f"data:{mime_type};base64,{image_b64}",
+            },
+            num_bytes=len(image_b64),
+            tokens=_estimate_image_tokens(image),
+        )
+
+    async def _ainvoke(
+        self,
+        messages: list[BaseMessage],
+        tokens: int,
+        schema: dict = RECEIPT_SCHEMA,
+        on_text: Callable[[str], None] | None = None,
+    ) -> BaseMessage:
+        """Send request to Gemini with deadline and retries.
+
+        Retryable errors are retried with jittered exponential backoff. The
+        number of requests in flight across sessions is limited by
+        GEMINI_MAX_CONCURRENCY, and every attempt waits until the quota of
+        the API key allows it. A streamed request is not retried once part
+        of its response has been received.
+
+        Args:
+            messages (list[BaseMessage]): the request messages
+            tokens (int): estimated token usage of the request
+            schema (dict, optional): JSON schema of the response.
+                Defaults to RECEIPT_SCHEMA.
+            on_text (Callable[[str], None] | None, optional): called with
+                each chunk of the response text, the response is streamed
+                when it is given. Defaults to None.
+
+        Raises:
+            AIError: if the request fails after all attempts
 
-    def _encode_image(self, image: Image.Image) -> str:
+        Returns:
+            BaseMessage: Gemini response
+        """
+        global _request_semaphore
+        if _request_semaphore is None:
+            _request_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+        received_chunks: list[str] = []
+
+        def on_chunk(text: str) -> None:
+            received_chunks.append(text)
+            if on_text is not None:
+                on_text(text)
+
+        for attempt in range(GEMINI_MAX_ATTEMPTS):
+            if await _rate_scheduler.acquire(self.api_key_id, tokens):
+                with _metrics_lock:
+                    GEMINI_METRICS.rate_limited += 1
+            started_at = time.monotonic()
+            try:
+                async with _request_semaphore:
+                    response = await asyncio.wait_for(
+                        self._arequest(
+                            messages, schema, None if on_text is None else on_chunk
+                        ),
+                        GEMINI_TIMEOUT_SECONDS,
+                    )
+            except Exception as err:
+                is_last_attempt = attempt == GEMINI_MAX_ATTEMPTS - 1
+                should_retry = (
+                    _is_retryable(err) and not is_last_attempt and not received_chunks
+                )
+                with _metrics_lock:
+                    GEMINI_METRICS.requests += 1
+                    if isinstance(err, asyncio.TimeoutError):
+                        GEMINI_METRICS.timeouts += 1
+                    if should_retry:
+                        GEMINI_METRICS.retries += 1
+                    else:
+                        GEMINI_METRICS.failed += 1
+                if not should_retry:
+                    raise AIError(f"Gemini request failed: {err!r}") from err
+                delay = min(
+                    RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2**attempt
+                )
+                await asyncio.sleep(random.uniform(0, delay))
+            else:
+                with _metrics_lock:
+                    GEMINI_METRICS.requests += 1
+                    GEMINI_METRICS.succeeded += 1
+                    GEMINI_METRICS.total_latency += time.monotonic() - started_at
+                usage = getattr(response, "usage_metadata", None)
+                if usage:
+                    _rate_scheduler.record_usage(
+                        self.api_key_id, tokens, usage["total_tokens"]
+                    )
+                return response
+        raise AIError("Gemini request failed")
+
+    async def _arequest(
+        self,
+        messages: list[BaseMessage],
+        schema: dict,
+        on_text: Callable[[str], None] | None,
+    ) -> BaseMessage:
+        """Send one request to Gemini.
+
+        Args:
+            messages (list[BaseMessage]): the request messages
+            schema (dict): JSON schema of the response
+            on_text (Callable[[str], None] | None): called with each chunk
+                of the response text, None to not stream the response
+
+        Raises:
+            AIError: if the streamed response is empty
+
+        Returns:
+            BaseMessage: Gemini response
+        """
+        if on_text is None:
+            return await self.llm.ainvoke(messages, response_schema=schema)
+        response = None
+        async for chunk in self.llm.astream(messages, response_schema=schema):
+            response = chunk if response is None else response + chunk
+            if isinstance(chunk.content, str) and chunk.content:
+                on_text(chunk.content)
+        if response is None:
+            raise AIError("Gemini response is empty")
+        return response
+
+    def _encode_image(self, image: Image.Image) -> tuple[str, str]:
         """Encode image to base64 for Gemini request.
 
         Args:
             image (Image.Image): image data
 
         Returns:
-            str: encoded image
+            tuple[str, str]: encoded image and its MIME type
         """
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
-        img_bytes = buffer.getvalue()
-        return base64.b64encode(img_bytes).decode("utf-8")
+        img_bytes, mime_type = self.preprocessor.encode(image)
+        return base64.b64encode(img_bytes).decode("utf-8"), mime_type
+
+    def _response_text(self, response: BaseMessage) -> str:
+        """Get the text of a Gemini response.
+
+        Args:
+            response (BaseMessage): Gemini response
+
+        Raises:
+            AIError: if the response content is not a text
+
+        Returns:
+            str: the response text
+        """
+        if not isinstance(response.content, str):
+            raise AIError(
+                f"Gemini does not response with string, get: {response.content}"
+            )
+        return response.content
 
     def _format_response(self, response: str) -> ReceiptData:
         """Parse Gemini response into app receipt data.
@@ -103,28 +731,171 @@ class GeminiModel(AIModel):
         Returns:
             ReceiptData: the parsed data
         """
-        dict_data = self._parse_response_to_dict(response)
+        return self._format_receipt_dict(self._parse_response_to_dict(response))
+
+    def _format_batch_response(self, response: str) -> dict[int, ReceiptData]:
+        """Parse Gemini response of several receipts.
+
+        Receipts that cannot be parsed are left out.
+
+        Args:
+            response (str): Gemini response text raw
+
+        Raises:
+            AIError: if the response is not a JSON array
+
+        Returns:
+            dict[int, ReceiptData]: the parsed data by receipt number
+        """
+        try:
+            list_data = self._parse_response_to_dict(response)
+        except ValueError as err:
+            raise AIError(f"Unable to parse Gemini response: {response}") from err
+        if not isinstance(list_data, list):
+            raise AIError(f"Gemini does not response with array, get: {response}")
+        receipts: dict[int, ReceiptData] = {}
+        for dict_data in list_data:
+            try:
+                receipts[int(dict_data["index"])] = self._format_receipt_dict(dict_data)
+            except (KeyError, TypeError, ValueError):
+                continue
+        return receipts
+
+    def _format_receipt_dict(self, dict_data: dict) -> ReceiptData:
+        """Convert a receipt read by Gemini into app receipt data.
+
+        Args:
+            dict_data (dict): the receipt, in the format asked by the prompt
+
+        Returns:
+            ReceiptData: the parsed data
+        """
         total = dict_data["total"]
-        menus_list = dict_data["menus"]
-        items: list[ItemData] = []
-        for item in menus_list:
-            items.append(
-                ItemData(
-                    name=str(item["name"]),
-                    count=int(item["count"]),
-                    total_price=float(item["price"]),
-                )
-            )
+        items = [self._format_menu_dict(item) for item in dict_data["menus"]]
         return ReceiptData(items={it.id: it for it in items}, total=float(total))
 
-    def _parse_response_to_dict(self, response: str) -> dict:
+    def _format_menu_dict(self, menu: dict) -> ItemData:
+        """Convert an item read by Gemini into app item data.
+
+        Args:
+            menu (dict): the item, in the format asked by the prompt
+
+        Returns:
+            ItemData: the parsed item
+        """
+        return ItemData(
+            name=str(menu["name"]),
+            count=int(menu["count"]),
+            total_price=float(menu["price"]),
+        )
+
+    def _parse_response_to_dict(self, response: str) -> dict | list:
         """Parse Gemini response text to data in dictionary format.
 
         Args:
             response (str): raw Gemini response
 
         Returns:
-            dict: parsed dictionary
+            dict | list: parsed dictionary, or list of them for several receipts
         """
-        clean_json_str = response.replace("```json", "").replace("```", "")
-        return json.loads(clean_json_str)
+        return json.loads(response)
+
+
+def _pack_batches(encoded: list[_EncodedImage]) -> list[list[int]]:
+    """Group receipt images into requests within the size limits.
+
+    Args:
+        encoded (list[_EncodedImage]): the encoded receipt images
+
+    Returns:
+        list[list[int]]: indexes of the images of each request
+    """
+    batches: list[list[int]] = []
+    batch_bytes = 0
+    for idx, image in enumerate(encoded):
+        is_full = (
+            not batches
+            or len(batches[-1]) >= BATCH_MAX_IMAGES
+            or batch_bytes + image.num_bytes > BATCH_MAX_IMAGE_BYTES
+        )
+        if is_full:
+            batches.append([])
+            batch_bytes = 0
+        batches[-1].append(idx)
+        batch_bytes += image.num_bytes
+    return batches
+
+
+def _estimate_image_tokens(image: Image.Image) -> int:
+    """Estimate the tokens used by an image in a Gemini request.
+
+    Gemini splits large images into tiles, each of them counted as a fixed
+    number of tokens.
+
+    Args:
+        image (Image.Image): the sent image
+
+    Returns:
+        int: estimated number of tokens
+    """
+    tiles = math.ceil(image.width / IMAGE_TILE_SIZE) * math.ceil(
+        image.height / IMAGE_TILE_SIZE
+    )
+    return tiles * IMAGE_TILE_TOKENS
+
+
+def _error_chain(err: BaseException) -> Iterator[BaseException]:
+    """Iterate over an error and the errors that caused it.
+
+    Args:
+        err (BaseException): the last error
+
+    Yields:
+        BaseException: the error, then its causes
+    """
+    while err is not None:
+        yield err
+        err = err.__cause__
+
+
+def _is_request_too_large(err: BaseException) -> bool:
+    """Check whether a request failed because it is above the size limits.
+
+    Args:
+        err (BaseException): the request error
+
+    Returns:
+        bool: True if a smaller request may succeed
+    """
+    for cause in _error_chain(err):
+        if getattr(cause, "code", None) == HTTPStatus.REQUEST_ENTITY_TOO_LARGE:
+            return True
+        if isinstance(cause, InvalidArgument) and REQUEST_TOO_LARGE_PATTERN.search(
+            str(cause)
+        ):
+            return True
+    return False
+
+
+def _is_retryable(err: BaseException) -> bool:
+    """Check whether a failed request may succeed when sent again.
+
+    The error and its causes are checked by type, then by status code, and
+    by the status code in their message if they have no code attribute.
+
+    Args:
+        err (BaseException): the request error
+
+    Returns:
+        bool: True for timeouts, rate limits and server errors
+    """
+    for cause in _error_chain(err):
+        if isinstance(cause, RETRYABLE_ERRORS):
+            return True
+        code = getattr(cause, "code", None) or getattr(cause, "status_code", None)
+        if isinstance(code, int):
+            return code in RETRYABLE_STATUS_CODES
+        match = STATUS_CODE_PATTERN.search(str(cause))
+        if match is not None:
+            return int(match.group(1) or match.group(2)) in RETRYABLE_STATUS_CODES
+    return False
@@ -0,0 +1,238 @@
+"""
+Hedged reading that sends a receipt to several models at the same time and
+keeps the first valid result
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image
+
+from modules.data.receipt_data import ItemData, ReceiptData
+
+from .base import AIModel, as_ai_error
+from .validation import DEFAULT_THRESHOLDS, ValidationThresholds, validate_receipt
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HedgeStats:
+    """Statistics of the readings done by a hedged model."""
+
+    readings: int = 0
+    # readings where no result passes the checks
+    fallbacks: int = 0
+    failed: int = 0
+    total_latency: float = 0.0
+    wins: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def average_latency(self) -> float:
+        """Average time until a reading result is chosen.
+
+        Returns:
+            float: average latency in seconds, 0 if there is no reading yet
+        """
+        if self.readings == 0:
+            return 0.0
+        return self.total_latency / self.readings
+
+
+class HedgedModel(AIModel):
+    """Model that runs several models in parallel and keeps the first valid one."""
+
+    def __init__(
+        self,
+        models: dict[str, AIModel],
+        thresholds: ValidationThresholds = DEFAULT_THRESHOLDS,
+        results_log: str | None = None,
+    ) -> None:
+        """Initialize the hedged model.
+
+        Args:
+            models (dict[str, AIModel]): the models by name, when no result
+                is valid the result of the first model that succeeded is used
+            thresholds (ValidationThresholds, optional): limits of the checks.
+                Defaults to DEFAULT_THRESHOLDS.
+            results_log (str | None, optional): JSON lines file where the
+                results of all models are appended for offline comparison,
+                the slower models are then not cancelled. Defaults to None,
+                which cancels the slower models.
+        """
+        self.models = models
+        self.thresholds = thresholds
+        self.results_log = None if results_log is None else Path(results_log)
+        self.stats = HedgeStats()
+        self._lock = threading.Lock()
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        """Retrieve data from the receipt.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            ReceiptData: parsed receipt data
+        """
+        return self.submit(image).result()
+
+    def submit(
+        self,
+        image: Image.Image,
+        on_item: Callable[[ItemData], None] | None = None,
+    ) -> Future[ReceiptData]:
+        """Start reading the receipt with all models.
+
+        Args:
+            image (Image.Image): the receipt photo image
+            on_item (Callable[[ItemData], None] | None, optional): not used,
+                the streamed items of the models may not be the chosen ones.
+                Defaults to None.
+
+        Returns:
+            Future[ReceiptData]: the chosen result, cancelling it cancels
+                the readings of all models
+        """
+        started_at = time.monotonic()
+        future: Future[ReceiptData] = Future()
+        futures = {name: model.submit(image) for name, model in self.models.items()}
+        state_lock = threading.Lock()
+        is_decided = False
+        is_logged = False
+
+        def cancel_all(done: Future[ReceiptData]) -> None:
+            if done.cancelled():
+                for model_future in futures.values():
+                    model_future.cancel()
+
+        def decide(name: str, done: Future[ReceiptData]) -> None:
+            nonlocal is_decided, is_logged
+            with state_lock:
+                is_all_done = all(f.done() for f in futures.values())
+                if is_all_done and self.results_log is not None and not is_logged:
+                    is_logged = True
+                    self._log_results(futures)
+                if is_decided:
+                    return
+                is_fallback = not _is_valid(done, self.thresholds)
+                if not is_fallback:
+                    winner = name
+                elif is_all_done:
+                    winner = self._fallback(futures)
+                else:
+                    return
+                is_decided = True
+            if self.results_log is None:
+                for model_future in futures.values():
+                    model_future.cancel()
+            self._record(winner, is_fallback, time.monotonic() - started_at)
+            if not future.set_running_or_notify_cancel():
+                return
+            if winner is None:
+                errors = [f.exception() for f in futures.values() if not f.cancelled()]
+                future.set_exception(
+                    as_ai_error(errors[0]) if errors else CancelledError()
+                )
+            else:
+                future.set_result(futures[winner].result())
+
+        future.add_done_callback(cancel_all)
+        for name, model_future in futures.items():
+            model_future.add_done_callback(lambda done, name=name: decide(name, done))
+        return future
+
+    def warm_up(self) -> None:
+        """Warm up all models."""
+        for model in self.models.values():
+            model.warm_up()
+
+    def metrics(self) -> dict[str, float]:
+        """Statistics of the hedged readings.
+
+        Returns:
+            dict[str, float]: metric values by name
+        """
+        with self._lock:
+            return {
+                "readings": self.stats.readings,
+                "fallbacks": self.stats.fallbacks,
+                "failed": self.stats.failed,
+                "average latency (s)": self.stats.average_latency,
+                **{f"{name} wins": wins for name, wins in self.stats.wins.items()},
+            }
+
+    def _fallback(self, futures: dict[str, Future[ReceiptData]]) -> str | None:
+        """Choose a result when no result is valid.
+
+        Args:
+            futures (dict[str, Future[ReceiptData]]): the finished readings
+
+        Returns:
+            str | None: name of the first model that succeeded, None if all
+                of them failed
+        """
+        for name, model_future in futures.items():
+            if not model_future.cancelled() and model_future.exception() is None:
+                return name
+        return None
+
+    def _record(self, winner: str | None, is_fallback: bool, latency: float) -> None:
+        """Update the statistics with a chosen result.
+
+        Args:
+            winner (str | None): name of the chosen model, None if all failed
+            is_fallback (bool): True if the chosen result fails the checks
+            latency (float): time until the result has been chosen
+        """
+        with self._lock:
+            self.stats.readings += 1
+            self.stats.total_latency += latency
+            if is_fallback:
+                self.stats.fallbacks += 1
+            if winner is None:
+                self.stats.failed += 1
+            else:
+                self.stats.wins[winner] = self.stats.wins.get(winner, 0) + 1
+
+    def _log_results(self, futures: dict[str, Future[ReceiptData]]) -> None:
+        """Append the results of all models to the results log.
+
+        Args:
+            futures (dict[str, Future[ReceiptData]]): the finished readings
+        """
+        record: dict[str, dict | str] = {}
+        for name, model_future in futures.items():
+            if model_future.cancelled():
+                record[name] = "cancelled"
+            elif model_future.exception() is not None:
+                record[name] = repr(model_future.exception())
+            else:
+                record[name] = model_future.result().to_dict()
+        try:
+            self.results_log.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock, open(self.results_log, "a") as f:
+                f.write(json.dumps({"time": time.time(), "results": record}) + "\n")
+        except OSError:
+            logger.exception("Unable to write hedged results to %s", self.results_log)
+
+
+def _is_valid(future: Future[ReceiptData], thresholds: ValidationThresholds) -> bool:
+    """Check whether a finished reading succeeded and passes the checks.
+
+    Args:
+        future (Future[ReceiptData]): the finished reading
+        thresholds (ValidationThresholds): limits of the checks
+
+    Returns:
+        bool: True if the result can be used
+    """
+    if future.cancelled() or future.exception() is not None:
+        return False
+    return len(validate_receipt(future.result(), thresholds)) == 0
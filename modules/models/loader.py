@@ -1,29 +1,174 @@
-from enum import Enum
-from typing import Type
+import functools
+import os
+from typing import Callable, Hashable
 
 from modules.data import session_data
-from modules.utils import SettingsError
+from modules.errors import SettingsError
 
-from .base import AIModel
-from .donut import DonutModel
-from .gemini import GeminiModel
+from .base import AIModel, InferencePrecision, ModelNames
+from .cache import CachedModel, ReceiptCache
+from .registry import ModelKey, ModelRegistry, ModelStatus
+from .service import InferenceService, PooledModel
 
+# number of worker processes for local models, 0 runs them in this process
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))
+# intra-op threads of each worker process, 0 keeps the library default
+INFERENCE_TORCH_THREADS = int(os.environ.get("INFERENCE_TORCH_THREADS", "0"))
+# results of all hedged models are appended here when it is set
+HEDGED_RESULTS_LOG = os.environ.get("HEDGED_RESULTS_LOG") or None
 
-class ModelNames(Enum):
-    """Available model names."""
 
-    GEMINI = "Gemini"
-    DONUT = "Donut"
+# backends are imported only when they are loaded, importing torch and
+# transformers is slow and not needed by every backend
 
 
-MODELS_LOADER: dict[ModelNames, Type[AIModel]] = {
-    ModelNames.GEMINI: GeminiModel,
-    ModelNames.DONUT: DonutModel,
+def _load_gemini(**config) -> AIModel:
+    from .gemini import GeminiModel
+
+    return GeminiModel(**config)
+
+
+def _load_donut(**config) -> AIModel:
+    from .donut import DonutModel
+
+    return DonutModel(**config)
+
+
+def _load_donut_onnx(**config) -> AIModel:
+    from .donut_onnx import DonutOnnxModel
+
+    return DonutOnnxModel(**config)
+
+
+def _load_cascade(precision: InferencePrecision, **gemini_config) -> AIModel:
+    from .cascade import CascadeModel
+
+    # both models are shared with the sessions that use them directly
+    local_model = MODEL_REGISTRY.get(
+        ModelKey.create(ModelNames.DONUT, precision=precision)
+    )
+    remote_model = MODEL_REGISTRY.get(
+        ModelKey.create(ModelNames.GEMINI, **gemini_config)
+    )
+    return CascadeModel(local_model, remote_model)
+
+
+def _load_hedged(precision: InferencePrecision, **gemini_config) -> AIModel:
+    from .hedged import HedgedModel
+
+    models = {
+        ModelNames.DONUT.value: MODEL_REGISTRY.get(
+            ModelKey.create(ModelNames.DONUT, precision=precision)
+        ),
+        ModelNames.GEMINI.value: MODEL_REGISTRY.get(
+            ModelKey.create(ModelNames.GEMINI, **gemini_config)
+        ),
+    }
+    return HedgedModel(models, results_log=HEDGED_RESULTS_LOG)
+
+
+MODELS_LOADER: dict[ModelNames, Callable[..., AIModel]] = {
+    ModelNames.GEMINI: _load_gemini,
+    ModelNames.DONUT: _load_donut,
+    ModelNames.DONUT_ONNX: _load_donut_onnx,
+    ModelNames.CASCADE: _load_cascade,
+    ModelNames.HEDGED: _load_hedged,
 }
 
+# models that run locally, they can be served by worker processes
+LOCAL_MODELS = [ModelNames.DONUT, ModelNames.DONUT_ONNX]
+
+
+def _load_pooled(load: Callable[..., AIModel], **config) -> AIModel:
+    """Load a model served by a pool of worker processes.
+
+    Args:
+        load (Callable[..., AIModel]): model constructor used by the workers
+
+    Returns:
+        AIModel: model that delegates readings to the workers
+    """
+    service = InferenceService(
+        load, config, INFERENCE_WORKERS, torch_threads=INFERENCE_TORCH_THREADS
+    )
+    return PooledModel(service)
+
+
+MODEL_REGISTRY = ModelRegistry(
+    {
+        name: (
+            functools.partial(_load_pooled, load)
+            if INFERENCE_WORKERS > 0 and name in LOCAL_MODELS
+            else load
+        )
+        for name, load in MODELS_LOADER.items()
+    }
+)
+
+RECEIPT_CACHE = ReceiptCache(os.environ.get("RECEIPT_CACHE_DIR", ".cache/receipts"))
+
+
+def _get_model_config(
+    model_name: ModelNames, precision: InferencePrecision
+) -> dict[str, Hashable]:
+    """Get the config used to construct a model.
+
+    Args:
+        model_name (ModelNames): the model name
+        precision (InferencePrecision): precision of the local models
+
+    Returns:
+        dict[str, Hashable]: model constructor arguments
+    """
+    if model_name == ModelNames.GEMINI:
+        return {
+            "api_key": os.environ.get("GOOGLE_API_KEY", ""),
+            "image_format": os.environ.get("GEMINI_IMAGE_FORMAT", "JPEG"),
+            "image_quality": int(os.environ.get("GEMINI_IMAGE_QUALITY", "85")),
+        }
+    if model_name == ModelNames.DONUT:
+        return {"precision": precision}
+    if model_name in [ModelNames.CASCADE, ModelNames.HEDGED]:
+        return {
+            **_get_model_config(ModelNames.GEMINI, precision),
+            **_get_model_config(ModelNames.DONUT, precision),
+        }
+    return {}
+
+
+def get_model_key() -> ModelKey:
+    """Get key of the model configured in the current session.
+
+    Raises:
+        SettingsError: if the configured model name is not recognized
+
+    Returns:
+        ModelKey: key of the configured model
+    """
+    model_name = session_data.model_name.get()
+    if model_name not in MODELS_LOADER:
+        raise SettingsError(f"Model name is not recognized {model_name}")
+    return ModelKey.create(
+        model_name,
+        **_get_model_config(model_name, session_data.model_precision.get()),
+    )
+
+
+def get_default_model_key() -> ModelKey:
+    """Get key of the model configured in new sessions.
+
+    Returns:
+        ModelKey: key of the default model
+    """
+    model_name = session_data.model_name.default
+    return ModelKey.create(
+        model_name,
+        **_get_model_config(model_name, session_data.model_precision.default),
+    )
+
 
 def _load_model() -> AIModel:
-    """Load new model.
+    """Load model from the shared registry.
 
     Raises:
         SettingsError: if the settings are not configured correctly
@@ -32,15 +177,18 @@ def _load_model() -> AIModel:
     Returns:
         AIModel: loaded AI model.
     """
-    model_name = session_data.model_name.get()
-    if model_name not in MODELS_LOADER:
-        raise SettingsError(f"Model name is not recognized {model_name}")
-    return MODELS_LOADER[model_name]()
+    key = get_model_key()
+    model = MODEL_REGISTRY.get(key)
+    if session_data.use_receipt_cache.get():
+        model = CachedModel(model, RECEIPT_CACHE, str(key))
+    return model
 
 
 def get_model() -> AIModel:
     """Get receipt reader model.
 
+    The session only keeps a handle to the model shared by all sessions.
+
     Returns:
         AIModel: the loaded AI model
     """
@@ -49,3 +197,30 @@ def get_model() -> AIModel:
         model = _load_model()
         session_data.model.set(model)
     return model
+
+
+def warm_up_model() -> None:
+    """Start loading and warming up the configured model in the background."""
+    try:
+        MODEL_REGISTRY.warm_up(get_model_key())
+    except SettingsError:
+        pass
+
+
+def warm_up_default_model() -> None:
+    """Start loading and warming up the default model in the background."""
+    MODEL_REGISTRY.warm_up(get_default_model_key())
+
+
+def is_model_ready() -> bool:
+    """Check whether the model can be used without waiting for its warm-up.
+
+    Returns:
+        bool: False if the configured model is still warming up
+    """
+    if session_data.model.get() is not None:
+        return True
+    try:
+        return MODEL_REGISTRY.status(get_model_key()) != ModelStatus.WARMING_UP
+    except SettingsError:
+        return True
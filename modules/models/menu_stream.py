@@ -0,0 +1,82 @@
+"""
+Incremental parsing of the receipt items in a streamed JSON response
+"""
+
+import json
+import re
+
+MENUS_START_PATTERN = re.compile(r'"menus"\s*:\s*\[')
+
+
+class MenuStreamParser:
+    """Parser of the "menus" array of a receipt JSON object received in chunks.
+
+    Each menu object is returned as soon as it is complete, before the rest
+    of the response is received.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the parser."""
+        self._buffer = ""
+        # position of the next character to scan, -1 before the menus array
+        self._pos = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = 0
+        self._done = False
+
+    def feed(self, text: str) -> list[dict]:
+        """Add the next chunk of the response.
+
+        Args:
+            text (str): the received chunk
+
+        Returns:
+            list[dict]: menu objects completed by this chunk
+        """
+        self._buffer += text
+        if self._done:
+            return []
+        if self._pos < 0:
+            match = MENUS_START_PATTERN.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        menus: list[dict] = []
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = self._pos - 1
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    menus.append(
+                        json.loads(self._buffer[self._object_start : self._pos])
+                    )
+            elif char == "]" and self._depth == 0:
+                self._done = True
+                break
+        return menus
+
+    @property
+    def text(self) -> str:
+        """Whole text received so far.
+
+        Returns:
+            str: the received text
+        """
+        return self._buffer
@@ -0,0 +1,115 @@
+"""
+Image preprocessing done before a receipt is given to an AI model
+"""
+
+import logging
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+
+logger = logging.getLogger(__name__)
+
+# receipt region detection, see _crop_receipt
+CROP_DETECTION_SIZE = 256
+CROP_MARGIN = 0.02
+CROP_MIN_AREA = 0.2
+CROP_MAX_AREA = 0.9
+
+
+@dataclass(frozen=True)
+class ImagePreprocessor:
+    """Preprocessing steps of receipt images for a specific model."""
+
+    max_side: int | None = None
+    crop_receipt: bool = True
+    encode_format: str = "PNG"
+    encode_quality: int = 90
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        """Fix orientation, crop the receipt and limit the image resolution.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            Image.Image: the processed image
+        """
+        original_size = image.size
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        if self.crop_receipt:
+            image = _crop_receipt(image)
+        if self.max_side is not None and max(image.size) > self.max_side:
+            image = image.copy()
+            image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+        logger.info(
+            "Preprocessed image from %s to %s (%d to %d bytes of pixels)",
+            original_size,
+            image.size,
+            original_size[0] * original_size[1] * 3,
+            image.size[0] * image.size[1] * 3,
+        )
+        return image
+
+    def encode(self, image: Image.Image) -> tuple[bytes, str]:
+        """Compress the image for sending it to a remote model.
+
+        Args:
+            image (Image.Image): the processed image
+
+        Returns:
+            tuple[bytes, str]: encoded image and its MIME type
+        """
+        buffer = BytesIO()
+        if self.encode_format == "PNG":
+            image.save(buffer, format="PNG")
+        else:
+            image.save(buffer, format=self.encode_format, quality=self.encode_quality)
+        encoded = buffer.getvalue()
+        logger.info(
+            "Encoded image as %s, %d bytes of pixels to %d bytes",
+            self.encode_format,
+            image.size[0] * image.size[1] * 3,
+            len(encoded),
+        )
+        return encoded, Image.MIME[self.encode_format]
+
+
+def _crop_receipt(image: Image.Image) -> Image.Image:
+    """Crop the image to the receipt paper.
+
+    The receipt is assumed to be the bright region of the photo. The image
+    is kept as it is when the detected region is too small or covers almost
+    the whole image.
+
+    Args:
+        image (Image.Image): the receipt photo image
+
+    Returns:
+        Image.Image: the cropped image
+    """
+    small = ImageOps.contain(image, (CROP_DETECTION_SIZE, CROP_DETECTION_SIZE))
+    small = small.convert("L")
+    stat = ImageStat.Stat(small)
+    threshold = stat.mean[0] + 0.5 * stat.stddev[0]
+    bright = small.point(lambda p: 255 if p > threshold else 0)
+    # remove small bright spots, like reflections, outside of the receipt
+    bbox = bright.filter(ImageFilter.MinFilter(5)).getbbox()
+    if bbox is None:
+        return image
+
+    scale = image.width / small.width
+    left, top, right, bottom = (int(v * scale) for v in bbox)
+    area_ratio = (right - left) * (bottom - top) / (image.width * image.height)
+    if not CROP_MIN_AREA <= area_ratio <= CROP_MAX_AREA:
+        return image
+    margin_x = int(image.width * CROP_MARGIN)
+    margin_y = int(image.height * CROP_MARGIN)
+    return image.crop(
+        (
+            max(0, left - margin_x),
+            max(0, top - margin_y),
+            min(image.width, right + margin_x),
+            min(image.height, bottom + margin_y),
+        )
+    )
@@ -0,0 +1,204 @@
+"""
+Client side rate limiting of API requests, per API key
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+
+class TokenBucket:
+    """Token bucket that refills continuously up to its capacity.
+
+    Consuming more than available is allowed, the debt is paid by the refill.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_per_second: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize a full bucket.
+
+        Args:
+            capacity (float): maximum amount in the bucket
+            refill_per_second (float): amount added every second
+            clock (Callable[[], float], optional): current time in seconds.
+                Defaults to time.monotonic.
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.clock = clock
+        self.available = capacity
+        self._updated_at = clock()
+
+    def wait_time(self, amount: float) -> float:
+        """Time until an amount is available.
+
+        Args:
+            amount (float): requested amount, capped at the bucket capacity
+
+        Returns:
+            float: waiting time in seconds, 0 if it is available now
+        """
+        missing = min(amount, self.capacity) - self._available_at(self.clock())
+        return max(0.0, missing / self.refill_per_second)
+
+    def consume(self, amount: float) -> None:
+        """Take an amount from the bucket.
+
+        Args:
+            amount (float): the consumed amount, negative to give it back
+        """
+        now = self.clock()
+        self.available = min(self.capacity, self._available_at(now) - amount)
+        self._updated_at = now
+
+    def _available_at(self, now: float) -> float:
+        """Amount in the bucket, including the refill since the last update.
+
+        Args:
+            now (float): the current time
+
+        Returns:
+            float: the available amount
+        """
+        elapsed = now - self._updated_at
+        return min(self.capacity, self.available + elapsed * self.refill_per_second)
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    """Quota of an API key."""
+
+    requests_per_minute: float
+    tokens_per_minute: float
+
+
+class KeyRateScheduler:
+    """Queue requests of each API key so they stay within its quota.
+
+    Requests of the same key are served in order, a request waits until both
+    the request and the token budgets allow it. Requests must be acquired
+    from a single event loop.
+    """
+
+    def __init__(
+        self,
+        limits: RateLimits,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            limits (RateLimits): quota of every API key
+            clock (Callable[[], float], optional): current time in seconds.
+                Defaults to time.monotonic.
+            sleep (Callable[[float], Awaitable[None]], optional): waits for a
+                number of seconds of the clock. Defaults to asyncio.sleep.
+        """
+        self.limits = limits
+        self.clock = clock
+        self.sleep = sleep
+        self._request_buckets: dict[str, TokenBucket] = {}
+        self._token_buckets: dict[str, TokenBucket] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._queued_requests: dict[str, int] = defaultdict(int)
+        self._queued_tokens: dict[str, float] = defaultdict(float)
+
+    async def acquire(self, key: str, tokens: float) -> bool:
+        """Wait until a request can be sent without exceeding the quota.
+
+        Args:
+            key (str): identifier of the API key
+            tokens (float): estimated number of tokens used by the request
+
+        Returns:
+            bool: True if the request has been delayed by the quota
+        """
+        self._ensure_key(key)
+        delayed = self._locks[key].locked()
+        self._queued_requests[key] += 1
+        self._queued_tokens[key] += tokens
+        try:
+            async with self._locks[key]:
+                wait = self._wait_time(key, 1, tokens)
+                while wait > 0:
+                    delayed = True
+                    await self.sleep(wait)
+                    wait = self._wait_time(key, 1, tokens)
+                self._request_buckets[key].consume(1)
+                self._token_buckets[key].consume(tokens)
+        finally:
+            self._queued_requests[key] -= 1
+            self._queued_tokens[key] -= tokens
+        return delayed
+
+    def record_usage(
+        self, key: str, estimated_tokens: float, used_tokens: float
+    ) -> None:
+        """Correct the token budget with the actual usage of a request.
+
+        Args:
+            key (str): identifier of the API key
+            estimated_tokens (float): tokens consumed when acquiring
+            used_tokens (float): tokens actually used by the request
+        """
+        self._ensure_key(key)
+        self._token_buckets[key].consume(used_tokens - estimated_tokens)
+
+    def estimated_wait(self, key: str) -> float:
+        """Estimate time until the queued requests of a key are sent.
+
+        Args:
+            key (str): identifier of the API key
+
+        Returns:
+            float: waiting time in seconds, 0 if there is no queued request
+        """
+        # called from the app sessions threads, so nothing is created here
+        if self._queued_requests.get(key, 0) == 0:
+            return 0.0
+        return self._wait_time(
+            key, self._queued_requests[key], self._queued_tokens[key]
+        )
+
+    def _ensure_key(self, key: str) -> None:
+        """Create the buckets of a key on its first request.
+
+        Args:
+            key (str): identifier of the API key
+        """
+        if key in self._locks:
+            return
+        self._request_buckets[key] = TokenBucket(
+            self.limits.requests_per_minute,
+            self.limits.requests_per_minute / 60,
+            self.clock,
+        )
+        self._token_buckets[key] = TokenBucket(
+            self.limits.tokens_per_minute,
+            self.limits.tokens_per_minute / 60,
+            self.clock,
+        )
+        self._locks[key] = asyncio.Lock()
+
+    def _wait_time(self, key: str, requests: float, tokens: float) -> float:
+        """Time until both budgets allow the given usage.
+
+        Args:
+            key (str): identifier of the API key
+            requests (float): number of requests
+            tokens (float): number of tokens
+
+        Returns:
+            float: waiting time in seconds
+        """
+        return max(
+            self._request_buckets[key].wait_time(requests),
+            self._token_buckets[key].wait_time(tokens),
+        )
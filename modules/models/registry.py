@@ -0,0 +1,181 @@
+"""
+Process-wide registry of loaded AI models shared by all sessions
+"""
+
+import threading
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Hashable
+
+from .base import AIModel
+
+
+class ModelStatus(Enum):
+    """Loading status of a model in the registry."""
+
+    NOT_LOADED = "not loaded"
+    WARMING_UP = "warming up"
+    READY = "ready"
+    FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class ModelKey:
+    """Identifier of a loaded model, its name and its config."""
+
+    name: Enum
+    config: tuple[tuple[str, Hashable], ...] = ()
+
+    @classmethod
+    def create(cls, name: Enum, **config: Hashable) -> "ModelKey":
+        """Create key from model name and config keyword arguments.
+
+        Args:
+            name (Enum): the model name
+
+        Returns:
+            ModelKey: the model key
+        """
+        return cls(name=name, config=tuple(sorted(config.items())))
+
+    @property
+    def kwargs(self) -> dict[str, Any]:
+        """Config as keyword arguments for the model constructor.
+
+        Returns:
+            dict[str, Any]: model constructor arguments
+        """
+        return dict(self.config)
+
+    def __str__(self) -> str:
+        """Human readable key, secret config values are masked.
+
+        Returns:
+            str: key description
+        """
+        config_str = ", ".join(
+            f"{k}={'***' if k.endswith('key') else v}" for k, v in self.config
+        )
+        return f"{self.name.value}({config_str})"
+
+
+class ModelRegistry:
+    """Thread-safe registry that lazily loads each model only once."""
+
+    def __init__(self, loaders: dict[Any, Callable[..., AIModel]]) -> None:
+        """Initialize the registry.
+
+        Args:
+            loaders (dict[Any, Callable[..., AIModel]]): model constructors
+                for each model name
+        """
+        self.loaders = loaders
+        self._models: dict[ModelKey, AIModel] = {}
+        self._statuses: dict[ModelKey, ModelStatus] = {}
+        self._load_locks: dict[ModelKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: ModelKey) -> AIModel:
+        """Get a loaded model, load it first if it has not been loaded.
+
+        When several threads request the same cold model at the same time,
+        only one of them loads it and the others wait for the result.
+
+        Args:
+            key (ModelKey): the requested model
+
+        Returns:
+            AIModel: the shared loaded model
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self.loaders[key.name](**key.kwargs)
+                with self._lock:
+                    self._models[key] = model
+                    if self._statuses.get(key) != ModelStatus.WARMING_UP:
+                        self._statuses[key] = ModelStatus.READY
+        return model
+
+    def status(self, key: ModelKey) -> ModelStatus:
+        """Get loading status of a model.
+
+        Args:
+            key (ModelKey): the model
+
+        Returns:
+            ModelStatus: the model status
+        """
+        with self._lock:
+            return self._statuses.get(key, ModelStatus.NOT_LOADED)
+
+    def warm_up(self, key: ModelKey) -> None:
+        """Load and warm up a model in a background thread.
+
+        Nothing is done if the model has been loaded or is being warmed up.
+
+        Args:
+            key (ModelKey): the model to be warmed up
+        """
+        with self._lock:
+            if self._statuses.get(key, ModelStatus.NOT_LOADED) != (
+                ModelStatus.NOT_LOADED
+            ):
+                return
+            self._statuses[key] = ModelStatus.WARMING_UP
+        threading.Thread(
+            target=self._warm_up, args=(key,), name=f"warm-up {key}", daemon=True
+        ).start()
+
+    def _warm_up(self, key: ModelKey) -> None:
+        """Load and warm up a model, to be run in a background thread.
+
+        Args:
+            key (ModelKey): the model to be warmed up
+        """
+        try:
+            self.get(key).warm_up()
+        except Exception:
+            status = ModelStatus.FAILED
+        else:
+            status = ModelStatus.READY
+        with self._lock:
+            self._statuses[key] = status
+
+    def unload(self, key: ModelKey) -> None:
+        """Remove a model from the registry.
+
+        Sessions still holding the model keep it alive until they release it.
+
+        Args:
+            key (ModelKey): the model to be removed
+        """
+        with self._lock:
+            self._models.pop(key, None)
+            self._statuses.pop(key, None)
+
+    def memory_usage(self) -> dict[ModelKey, int]:
+        """Memory used by each resident model.
+
+        Returns:
+            dict[ModelKey, int]: memory usage in bytes for each model
+        """
+        with self._lock:
+            models = list(self._models.items())
+        return {key: model.memory_usage() for key, model in models}
+
+    def metrics(self) -> dict[ModelKey, dict[str, float]]:
+        """Runtime statistics of each resident model that reports any.
+
+        Returns:
+            dict[ModelKey, dict[str, float]]: metric values for each model
+        """
+        with self._lock:
+            models = list(self._models.items())
+        metrics = {key: model.metrics() for key, model in models}
+        return {key: values for key, values in metrics.items() if len(values) > 0}
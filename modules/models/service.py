@@ -0,0 +1,240 @@
+"""
+Inference service that runs models in a pool of worker processes
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from PIL import Image
+
+from modules.data.base import copy_id_context
+from modules.data.receipt_data import ItemData, ReceiptData
+
+from .base import AIModel
+
+# model loaded in a worker process, see _init_worker
+_worker_model: AIModel | None = None
+
+
+@dataclass
+class ServiceStats:
+    """Statistics of the jobs submitted to an inference service."""
+
+    num_workers: int
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    total_latency: float = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs that are waiting or running.
+
+        Returns:
+            int: number of unfinished jobs
+        """
+        return self.submitted - self.completed - self.failed - self.cancelled
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs that are waiting for a free worker.
+
+        Returns:
+            int: number of waiting jobs
+        """
+        return max(0, self.in_flight - self.num_workers)
+
+    @property
+    def average_latency(self) -> float:
+        """Average time from job submission to its result.
+
+        Returns:
+            float: average latency in seconds, 0 if no job has completed
+        """
+        if self.completed == 0:
+            return 0.0
+        return self.total_latency / self.completed
+
+
+class InferenceService:
+    """Pool of worker processes, each of them holds its own loaded model."""
+
+    def __init__(
+        self,
+        load: Callable[..., AIModel],
+        config: dict[str, Any],
+        num_workers: int,
+        torch_threads: int = 0,
+    ) -> None:
+        """Initialize the service, workers are started on the first job.
+
+        Args:
+            load (Callable[..., AIModel]): model constructor, it must be
+                picklable, like a module level function
+            config (dict[str, Any]): model constructor arguments
+            num_workers (int): number of worker processes
+            torch_threads (int, optional): number of intra-op threads used by
+                each worker. Defaults to 0, which keeps the library default.
+        """
+        self.stats = ServiceStats(num_workers=num_workers)
+        self._stats_lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            # forking a process that already runs torch threads is not safe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(load, config, torch_threads),
+        )
+
+    def submit(self, image: Image.Image) -> Future[ReceiptData]:
+        """Submit a receipt reading job.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            Future[ReceiptData]: the job result, cancelling it removes the job
+                from the queue if no worker has picked it up yet
+        """
+        submitted_at = time.monotonic()
+        context = copy_id_context()
+        worker_future = self._executor.submit(_run_in_worker, image)
+        future: Future[ReceiptData] = Future()
+        future.add_done_callback(
+            lambda f: worker_future.cancel() if f.cancelled() else None
+        )
+        with self._stats_lock:
+            self.stats.submitted += 1
+
+        def on_done(done: Future[dict]) -> None:
+            with self._stats_lock:
+                if done.cancelled():
+                    self.stats.cancelled += 1
+                elif done.exception() is not None:
+                    self.stats.failed += 1
+                else:
+                    self.stats.completed += 1
+                    self.stats.total_latency += time.monotonic() - submitted_at
+            if not future.set_running_or_notify_cancel():
+                return
+            if done.cancelled():
+                future.set_exception(CancelledError("Inference service is stopped"))
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                # IDs are generated again in the namespace of the caller, the
+                # ones created in the worker process are not unique here
+                future.set_result(context.run(ReceiptData.from_dict, done.result()))
+
+        worker_future.add_done_callback(on_done)
+        return future
+
+    def ping(self) -> None:
+        """Wait until a worker is started and its model is loaded."""
+        self._executor.submit(os.getpid).result()
+
+    def shutdown(self) -> None:
+        """Stop the workers, waiting jobs are cancelled."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PooledModel(AIModel):
+    """Model that delegates readings to an inference service."""
+
+    def __init__(self, service: InferenceService) -> None:
+        """Initialize the model.
+
+        Args:
+            service (InferenceService): the inference service
+        """
+        self.service = service
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        """Retrieve data from the receipt.
+
+        Args:
+            image (Image.Image): the receipt photo image
+
+        Returns:
+            ReceiptData: parsed receipt data
+        """
+        return self.submit(image).result()
+
+    def submit(
+        self,
+        image: Image.Image,
+        on_item: Callable[[ItemData], None] | None = None,
+    ) -> Future[ReceiptData]:
+        """Start reading the receipt in a worker process.
+
+        Args:
+            image (Image.Image): the receipt photo image
+            on_item (Callable[[ItemData], None] | None, optional): not used,
+                the results of worker processes are not streamed.
+                Defaults to None.
+
+        Returns:
+            Future[ReceiptData]: the reading result
+        """
+        return self.service.submit(image)
+
+    def warm_up(self) -> None:
+        """Start a worker and load its model."""
+        self.service.ping()
+
+    def metrics(self) -> dict[str, float]:
+        """Statistics of the inference service.
+
+        Returns:
+            dict[str, float]: metric values by name
+        """
+        stats = self.service.stats
+        return {
+            "workers": stats.num_workers,
+            "queue depth": stats.queue_depth,
+            "in flight": stats.in_flight,
+            "completed": stats.completed,
+            "failed": stats.failed,
+            "cancelled": stats.cancelled,
+            "average latency (s)": stats.average_latency,
+        }
+
+
+def _init_worker(
+    load: Callable[..., AIModel], config: dict[str, Any], torch_threads: int
+) -> None:
+    """Load the model in a worker process.
+
+    Args:
+        load (Callable[..., AIModel]): model constructor
+        config (dict[str, Any]): model constructor arguments
+        torch_threads (int): number of intra-op threads, 0 to keep the default
+    """
+    global _worker_model
+    if torch_threads > 0:
+        os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    _worker_model = load(**config)
+    if torch_threads > 0 and "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(torch_threads)
+    _worker_model.warm_up()
+
+
+def _run_in_worker(image: Image.Image) -> dict:
+    """Read a receipt with the model of this worker process.
+
+    Args:
+        image (Image.Image): the receipt photo image
+
+    Returns:
+        dict: the parsed receipt data, as dictionary
+    """
+    if _worker_model is None:
+        raise RuntimeError("Inference worker has not been initialized")
+    return _worker_model.run(image).to_dict()
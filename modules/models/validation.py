@@ -0,0 +1,60 @@
+"""
+Consistency checks of receipt readings, to decide whether a reading is trusted
+"""
+
+import os
+from dataclasses import dataclass
+
+from modules.data.receipt_data import ReceiptData
+
+
+@dataclass(frozen=True)
+class ValidationThresholds:
+    """Limits used by the receipt reading checks."""
+
+    # allowed difference between subtotal and total, relative to the total,
+    # the total may include tax, service charge and discount
+    max_total_mismatch: float = 0.25
+    # minimum model confidence, readings without confidence are not checked
+    min_confidence: float = 0.8
+
+
+DEFAULT_THRESHOLDS = ValidationThresholds(
+    max_total_mismatch=float(os.environ.get("VALIDATION_MAX_TOTAL_MISMATCH", "0.25")),
+    min_confidence=float(os.environ.get("VALIDATION_MIN_CONFIDENCE", "0.8")),
+)
+
+
+def validate_receipt(
+    receipt: ReceiptData, thresholds: ValidationThresholds = DEFAULT_THRESHOLDS
+) -> list[str]:
+    """Check whether a receipt reading is consistent.
+
+    Args:
+        receipt (ReceiptData): the read receipt data
+        thresholds (ValidationThresholds, optional): limits of the checks.
+            Defaults to DEFAULT_THRESHOLDS.
+
+    Returns:
+        list[str]: names of the failed checks, empty if the reading passes
+    """
+    failures: list[str] = []
+    if len(receipt.items) == 0:
+        failures.append("no items")
+    if any(item.count <= 0 for item in receipt.items.values()):
+        failures.append("invalid count")
+    if any(item.total_price < 0 for item in receipt.items.values()):
+        failures.append("negative price")
+    if receipt.total <= 0:
+        failures.append("invalid total")
+    elif (
+        abs(receipt.subtotal - receipt.total) / receipt.total
+        > thresholds.max_total_mismatch
+    ):
+        failures.append("subtotal mismatch")
+    if (
+        receipt.confidence is not None
+        and receipt.confidence < thresholds.min_confidence
+    ):
+        failures.append("low confidence")
+    return failures
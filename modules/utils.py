@@ -1,6 +1,6 @@
 from babel.numbers import format_currency
 
-from modules.data import session_data
+from modules.errors import AIError, SettingsError
 
 CURRENCY_LIST = {
     "USD": "en_US",
@@ -27,16 +27,11 @@ CURRENCY_LIST = {
 
 
 def format_number_to_currency(val: float) -> str:
+    # imported here, the session data imports modules that use this module
+    from modules.data import session_data
+
     currency = session_data.currency.get()
     locale = CURRENCY_LIST.get(currency)
     if not locale:
         return str(val)
     return format_currency(val, currency, locale=locale, format="¤ #,##0.00")
-
-
-class AIError(Exception):
-    pass
-
-
-class SettingsError(Exception):
-    pass
@@ -1,13 +1,23 @@
-from typing import Callable
+import time
 
 import streamlit as st
 from PIL import Image
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 from modules.data import session_data
-from modules.data.receipt_data import ReceiptData
+from modules.data.receipt_data import ItemData, ReceiptData
+from modules.models.base import AIModel
 from modules.utils import format_number_to_currency
 
 IMAGE_DISPLAY_HEIGHT = 480
+# uploads are decoded at a reduced scale when they are larger than this,
+# the models do not need more resolution
+UPLOAD_MAX_SIDE = 2000
+READING_POLL_SECONDS = 0.2
+# the model waiting time is shown to the user when it is longer than this
+WAIT_NOTICE_SECONDS = 1.0
+CONFIRM_EDITOR_KEY = "confirm_items_editor"
+RECEIPT_EDITOR_KEY = "receipt_items_editor"
 
 
 def get_items_table_columns_config() -> dict:
@@ -43,6 +53,31 @@ def resize_to_height(image: Image.Image, target_height: int) -> Image.Image:
     return resized_image
 
 
+def load_uploaded_image(uploaded_file: UploadedFile) -> Image.Image:
+    """Decode uploaded image, at a reduced scale if it is too large.
+
+    JPEG images are decoded directly at a lower resolution, which avoids
+    allocating the full resolution image.
+
+    Args:
+        uploaded_file (UploadedFile): the uploaded image file
+
+    Returns:
+        Image.Image: the decoded image
+    """
+    image = Image.open(uploaded_file)
+    scale = UPLOAD_MAX_SIDE / max(image.size)
+    if scale < 1:
+        image.draft("RGB", (int(image.width * scale), int(image.height * scale)))
+        image.load()
+        if max(image.size) > UPLOAD_MAX_SIDE:
+            # formats without reduced scale decoding, or a scale in between
+            image.thumbnail(
+                (UPLOAD_MAX_SIDE, UPLOAD_MAX_SIDE), Image.Resampling.LANCZOS
+            )
+    return image
+
+
 def image_input_view() -> Image.Image | None:
     """Element for user to upload image.
 
@@ -57,28 +92,62 @@ def image_input_view() -> Image.Image | None:
     )
     if uploaded_file is None:
         return session_data.image.get()
-    image = Image.open(uploaded_file)
-    session_data.image.set(image)
-    return image
+    if uploaded_file.file_id != session_data.image_file_id.get():
+        image = load_uploaded_image(uploaded_file)
+        session_data.image.set(image)
+        session_data.image_preview.set(resize_to_height(image, IMAGE_DISPLAY_HEIGHT))
+        session_data.image_file_id.set(uploaded_file.file_id)
+    return session_data.image.get()
 
 
 @st.dialog("Reading your receipt...")
-def read_receipt_view(
-    receipt_reader: Callable[[Image.Image], ReceiptData], image: Image.Image
-) -> None:
+def read_receipt_view(model: AIModel, image: Image.Image) -> None:
     """Pop-up when AI reading the receipt.
 
     Args:
-        receipt_reader (Callable[[Image.Image], ReceiptData]): the callable
-            that will trigger the AI to run inference on the image
+        model (AIModel): the AI model that will read the image
         image (Image.Image): uploaded image by user
     """
+    job = session_data.view1_reading_job.get()
+    if job is None:
+        # filled from the reader thread as the items are received
+        partial_items: list[ItemData] = []
+        job = model.submit(image, on_item=partial_items.append)
+        session_data.view1_reading_job.set(job)
+        session_data.view1_partial_items.set(partial_items)
+    partial_items = session_data.view1_partial_items.get()
+    started_at = time.monotonic()
     _, col2, _ = st.columns([4.75, 0.5, 4.75])
-    with col2:
-        with st.spinner(""):
-            receipt = receipt_reader(image)
-            session_data.view1_model_result.set(receipt)
-            st.rerun()
+    wait_notice = st.empty()
+    items_table = st.empty()
+    num_shown_items = 0
+    with col2, st.spinner(""):
+        while not job.done():
+            if len(partial_items) > num_shown_items:
+                num_shown_items = len(partial_items)
+                items_table.dataframe(
+                    ReceiptData(
+                        items={it.id: it for it in partial_items[:num_shown_items]},
+                        total=0.0,
+                    ).to_items_df(),
+                    hide_index=True,
+                    column_config=get_items_table_columns_config(),
+                )
+            # something is rendered at every poll, that is where streamlit
+            # stops this run when a new file is uploaded
+            wait = model.estimated_wait()
+            if wait > WAIT_NOTICE_SECONDS:
+                wait_notice.caption(
+                    f"Many receipts are being read, waiting about {wait:.0f} seconds"
+                )
+            else:
+                elapsed = time.monotonic() - started_at
+                wait_notice.caption(f"Reading for {elapsed:.0f} seconds")
+            time.sleep(READING_POLL_SECONDS)
+    session_data.view1_reading_job.reset()
+    session_data.view1_partial_items.reset()
+    session_data.view1_model_result.set(job.result())
+    st.rerun()
 
 
 @st.dialog("Confirm Data")
@@ -96,6 +165,7 @@ def receipt_read_confirmation_view(receipt: ReceiptData) -> None:
         num_rows="dynamic",
         hide_index=True,
         column_config=get_items_table_columns_config(),
+        key=CONFIRM_EDITOR_KEY,
     )
     subtotal_str = format_number_to_currency(edited_data["total_price"].sum())
     st.markdown(f"Subtotal: {subtotal_str}")
@@ -113,19 +183,35 @@ def receipt_read_confirmation_view(receipt: ReceiptData) -> None:
     confirmation_pressed = st.button("Confirm", key="confirm_button")
     if confirmation_pressed:
         session_data.view1_auto_next_page.set(True)
-        session_data.receipt_data.set(
-            ReceiptData.from_items_df(edited_data, edited_total)
-        )
+        receipt.apply_items_edits(st.session_state[CONFIRM_EDITOR_KEY])
+        receipt.total = edited_total
+        session_data.receipt_data.set(receipt)
         st.rerun()
 
 
-def image_preview_view(image: Image.Image) -> None:
+def image_preview_view(preview: Image.Image) -> None:
     """Eelemnt to preview the uploaded image.
 
     Args:
-        image (Image.Image): the uploaded image
+        preview (Image.Image): the uploaded image, already resized for display
+    """
+    st.image(preview, width="stretch")
+
+
+def apply_receipt_edits() -> None:
+    """Apply the edits of the confirmed receipt table.
+
+    The edited items keep their ID, so the items assignment is kept except
+    for the removed items. The report has to be created again.
     """
-    st.image(resize_to_height(image, IMAGE_DISPLAY_HEIGHT), width="stretch")
+    receipt = session_data.receipt_data.get()
+    if receipt is None:
+        return
+    edit = receipt.apply_items_edits(st.session_state[RECEIPT_EDITOR_KEY])
+    manager = session_data.split_manager.get()
+    if manager is not None:
+        manager.sync_items(edit)
+    session_data.report.reset()
 
 
 def final_receipt_view() -> None:
@@ -134,21 +220,24 @@ def final_receipt_view() -> None:
     if receipt is None:
         st.warning("No data has been read yet...")
         return
-    st.dataframe(
+    st.data_editor(
         receipt.to_items_df(),
+        num_rows="dynamic",
         hide_index=True,
         column_config=get_items_table_columns_config(),
+        key=RECEIPT_EDITOR_KEY,
+        on_change=apply_receipt_edits,
     )
     st.markdown(f"##### Subtotal: {format_number_to_currency(receipt.subtotal)}")
     st.markdown(f"##### Total: {format_number_to_currency(receipt.total)}")
 
 
-def controller(receipt_reader: Callable[[Image.Image], ReceiptData]) -> bool:
+def controller(model: AIModel | None) -> bool:
     """Main controller of the page 1, receipt upload.
 
     Args:
-        receipt_reader (Callable[[Image.Image], ReceiptData]): the callable
-            that will trigger the AI to run inference on the image
+        model (AIModel | None): the AI model that will read the receipt,
+            None if the AI is not ready yet
 
     Returns:
         bool: True if user has completed all required actions in
@@ -160,14 +249,15 @@ def controller(receipt_reader: Callable[[Image.Image], ReceiptData]) -> bool:
     if session_data.receipt_data.get() is None:
         reading_data = session_data.view1_model_result.get_once()
         if reading_data is None:
-            read_receipt_view(receipt_reader, image)
+            if model is not None:
+                read_receipt_view(model, image)
         else:
             receipt_read_confirmation_view(reading_data)
 
     st.markdown("### Your receipt data")
     col1, col2 = st.columns([3, 7])
     with col1:
-        image_preview_view(image)
+        image_preview_view(session_data.image_preview.get())
     with col2:
         final_receipt_view()
     return session_data.view1_auto_next_page.get_once()
@@ -7,6 +7,8 @@ from modules.data.assignment_data import (
     ParticipantData,
     SplitManager,
 )
+from modules.data.assignment_matrix import MatrixSplitManager
+from modules.utils import format_number_to_currency
 
 
 def participant_data_view(participant: ParticipantData, manager: SplitManager) -> None:
@@ -20,6 +22,10 @@ def participant_data_view(participant: ParticipantData, manager: SplitManager) -
         col1, col2 = st.columns([9, 1])
         with col1:
             st.markdown(f"##### {participant.name}")
+            total_str = format_number_to_currency(
+                manager.get_participant_total(participant.id)
+            )
+            st.caption(f"Current total: {total_str}")
         with col2:
             delete_button = st.button(
                 label="",
@@ -89,7 +95,7 @@ def added_item_view(
             unsafe_allow_html=True,
         )
     with num_col:
-        key_name = f"count_input_{participant.id}_{item.id}"
+        key_name = get_count_input_key(participant.id, item.id)
         st.number_input(
             f"Item count for {participant.id} {item.id}",
             value=item.assigned_count,
@@ -108,6 +114,19 @@ def added_item_view(
     return del_item
 
 
+def get_count_input_key(participant_id: int, assignment_id: int) -> str:
+    """Get key of the count input of an item assignment.
+
+    Args:
+        participant_id (int): participant ID
+        assignment_id (int): the item assignment ID
+
+    Returns:
+        str: the count input element key name
+    """
+    return f"count_input_{participant_id}_{assignment_id}"
+
+
 def on_item_count_change(key_name: str, item: AssignedItemData) -> None:
     """Callbacks to be called when user change count of the assigned item.
 
@@ -171,24 +190,43 @@ def new_item_selection_view(
     """
     _, item_col, add_col, _ = st.columns([0.5, 4, 2, 3.5])
     with item_col:
-        selected_item = st.selectbox(
+        selection_key = f"item_selection_{participant.id}"
+        st.selectbox(
             "Purhcased item",
             manager.item_ids,
             index=None,
             placeholder="New item",
             label_visibility="collapsed",
-            key=f"item_selection_{participant.id}",
+            key=selection_key,
             format_func=lambda x: manager.get_item(int(x)).name,
         )
     with add_col:
-        add_item = st.button(
+        st.button(
             label="",
             key=f"add_item_{participant.id}",
             icon=":material/add:",
+            on_click=lambda: on_item_add(participant.id, selection_key, manager),
         )
-    if add_item and selected_item is not None:
-        manager.add_item_assignment(participant.id, selected_item)
-        st.rerun()
+
+
+def on_item_add(participant_id: int, selection_key: str, manager: SplitManager) -> None:
+    """Callback to be called when user add an item to a participant.
+
+    Args:
+        participant_id (int): participant ID
+        selection_key (str): the item selection element key name
+        manager (SplitManager): the split assignment manager
+    """
+    item_id = st.session_state.get(selection_key)
+    if item_id is None:
+        return
+    manager.add_item_assignment(participant_id, item_id)
+    # an already listed item may get its count increased instead of a new
+    # assignment, its count input would keep showing the old count
+    for assigned_item in manager.get_participant_items_assignment_list(participant_id):
+        key_name = get_count_input_key(participant_id, assigned_item.id)
+        if assigned_item.item.id == item_id and key_name in st.session_state:
+            st.session_state[key_name] = assigned_item.assigned_count
 
 
 def warning_summary_view(manager: SplitManager) -> bool:
@@ -203,17 +241,20 @@ def warning_summary_view(manager: SplitManager) -> bool:
     Returns:
         bool: True if all items are assigned well, False otherwise
     """
-    items = manager.get_all_items()
+    differences = manager.get_assignment_differences()
     unassigned_list = []
     over_list = []
-    for item in items:
-        current_assigned = manager.get_items_assignment_total(item.id)
-        difference = item.count - current_assigned
+    for item in manager.get_all_items():
+        difference = differences[item.id]
         if difference > 0:
             unassigned_list.append(f"{item.name} ({difference})")
         if difference < 0:
             over_list.append(f"{item.name} ({-difference})")
 
+    assigned_str = format_number_to_currency(manager.get_assigned_total())
+    receipt_str = format_number_to_currency(manager.receipt_data.total)
+    st.markdown(f"Assigned: {assigned_str} of {receipt_str}")
+
     check_ok = True
     if len(unassigned_list) > 0:
         st.warning(
@@ -278,7 +319,10 @@ def controller() -> bool:
             st.error("Upload a receipt first...")
             return False
         group_data = session_data.group_data.get()
-        manager = SplitManager(group_data, receipt)
+        if session_data.use_assignment_matrix.get():
+            manager = MatrixSplitManager(group_data, receipt)
+        else:
+            manager = SplitManager(group_data, receipt)
         session_data.split_manager.set(manager)
 
     for participant in list(manager.group_data.participants.values()):
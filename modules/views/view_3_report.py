@@ -18,9 +18,7 @@ def participant_view(participant_report: ParticipantReportData) -> None:
         with total_str_col:
             st.markdown("##### Total:")
         with total_col:
-            total_str = format_number_to_currency(
-                int(participant_report.purchased_total)
-            )
+            total_str = format_number_to_currency(participant_report.purchased_total)
             st.markdown(f"##### {total_str}")
         st.table(participant_report.to_dataframe_display(), border="horizontal")
         subtotal_str = format_number_to_currency(participant_report.purchased_subtotal)
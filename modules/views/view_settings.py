@@ -5,9 +5,18 @@ import streamlit as st
 from babel.numbers import get_currency_name
 
 from modules.data import session_data
-from modules.models.loader import ModelNames
+from modules.models.base import InferencePrecision
+from modules.models.loader import (
+    MODEL_REGISTRY,
+    RECEIPT_CACHE,
+    ModelNames,
+    warm_up_model,
+)
 from modules.utils import CURRENCY_LIST
 
+# int8 and bf16 are not measured on Donut yet, they are only offered when set
+EXPERIMENTAL_PRECISIONS = os.environ.get("DONUT_EXPERIMENTAL_PRECISIONS") == "1"
+
 
 @dataclass
 class SettingsData:
@@ -15,18 +24,37 @@ class SettingsData:
 
     currency: str = field(default_factory=session_data.currency.get)
     model_name: ModelNames = field(default_factory=session_data.model_name.get)
+    model_precision: InferencePrecision = field(
+        default_factory=session_data.model_precision.get
+    )
     gemini_api_key: str | None = field(
         default_factory=lambda: os.environ.get("GOOGLE_API_KEY")
     )
+    use_receipt_cache: bool = field(default_factory=session_data.use_receipt_cache.get)
+    use_assignment_matrix: bool = field(
+        default_factory=session_data.use_assignment_matrix.get
+    )
 
     def apply(self) -> None:
         """Apply the settings stored in this object."""
         session_data.currency.set(self.currency)
-        if self.model_name != session_data.model_name.get():
+        is_model_changed = (
+            self.model_name != session_data.model_name.get()
+            or self.model_precision != session_data.model_precision.get()
+            or self.gemini_api_key != os.environ.get("GOOGLE_API_KEY")
+            or self.use_receipt_cache != session_data.use_receipt_cache.get()
+        )
+        if is_model_changed:
             session_data.model.reset()
         session_data.model_name.set(self.model_name)
+        session_data.model_precision.set(self.model_precision)
+        session_data.use_receipt_cache.set(self.use_receipt_cache)
+        session_data.use_assignment_matrix.set(self.use_assignment_matrix)
         if self.gemini_api_key is not None and self.gemini_api_key != "":
             os.environ["GOOGLE_API_KEY"] = self.gemini_api_key
+        if is_model_changed:
+            # the default model is warmed up by the app, other ones from here
+            warm_up_model()
 
 
 def currency_settings_view(settings: SettingsData) -> SettingsData:
@@ -73,15 +101,84 @@ def model_selection_view(settings: SettingsData) -> SettingsData:
         format_func=lambda x: x.value,
         index=current_idx,
     )
-    if selected_model == ModelNames.GEMINI:
+    if selected_model in [ModelNames.GEMINI, ModelNames.CASCADE, ModelNames.HEDGED]:
         google_key = st.text_input(
             "Google API Key", type="password", value=settings.gemini_api_key
         )
         settings.gemini_api_key = google_key
+    if not EXPERIMENTAL_PRECISIONS:
+        settings.model_precision = InferencePrecision.FP32
+    elif selected_model in [ModelNames.DONUT, ModelNames.CASCADE, ModelNames.HEDGED]:
+        precision_options = list(InferencePrecision)
+        settings.model_precision = st.selectbox(
+            "Inference precision",
+            precision_options,
+            format_func=lambda x: x.value,
+            index=precision_options.index(settings.model_precision),
+            help="Experimental, compare it with fp32 on your receipts before use",
+        )
     settings.model_name = selected_model
     return settings
 
 
+def cache_settings_view(settings: SettingsData) -> SettingsData:
+    """Element for receipt results cache settings input.
+
+    Args:
+        settings (SettingsData): the current settings data
+
+    Returns:
+        SettingsData: the updated settings data
+    """
+    settings.use_receipt_cache = st.checkbox(
+        "Reuse results of receipts that have been read before",
+        value=settings.use_receipt_cache,
+    )
+    if st.button("Clear cached results", key="clear_cache_button"):
+        RECEIPT_CACHE.clear()
+        st.toast("Cached results have been cleared")
+    return settings
+
+
+def assignment_settings_view(settings: SettingsData) -> SettingsData:
+    """Element for items assignment storage settings input.
+
+    Args:
+        settings (SettingsData): the current settings data
+
+    Returns:
+        SettingsData: the updated settings data
+    """
+    settings.use_assignment_matrix = st.checkbox(
+        "Compact assignments storage",
+        value=settings.use_assignment_matrix,
+        help=(
+            "Uses less memory and is faster for large groups, assigned items "
+            "are listed in the receipt order. Applied to the next receipt."
+        ),
+    )
+    return settings
+
+
+def diagnostics_view() -> None:
+    """Element that shows resources used by the application."""
+    with st.expander("Diagnostics"):
+        memory_usage = MODEL_REGISTRY.memory_usage()
+        if len(memory_usage) == 0:
+            st.markdown("No model has been loaded yet")
+        for key, usage in memory_usage.items():
+            st.markdown(f"{key}: {usage / 2**20:.1f} MiB")
+        for key, metrics in MODEL_REGISTRY.metrics().items():
+            metrics_str = ", ".join(f"{k}: {v:g}" for k, v in metrics.items())
+            st.markdown(f"{key}: {metrics_str}")
+        stats = RECEIPT_CACHE.stats
+        st.markdown(
+            f"Cached results: {stats.memory_hits} memory hits, "
+            f"{stats.disk_hits} disk hits, {stats.misses} misses "
+            f"({stats.hit_rate:.0%} hit rate)"
+        )
+
+
 @st.dialog("Settings")
 def controller(error_msg: str | None = None) -> None:
     """Controller of the settings page pop-up.
@@ -96,6 +193,9 @@ def controller(error_msg: str | None = None) -> None:
     settings = SettingsData()
     settings = currency_settings_view(settings)
     settings = model_selection_view(settings)
+    settings = cache_settings_view(settings)
+    settings = assignment_settings_view(settings)
+    diagnostics_view()
     if st.button("Apply", key="settings_apply_button"):
         settings.apply()
         st.rerun()
@@ -0,0 +1,59 @@
+from streamlit.testing.v1 import AppTest
+
+from modules.data.assignment_data import GroupData
+from modules.data.base import DEFAULT_ID_NAMESPACE
+from modules.data.receipt_data import ItemData, ReceiptData
+
+
+def assignment_page() -> None:
+    from modules.views import view_2_assign_participants
+
+    view_2_assign_participants.controller()
+
+
+def test_readding_listed_item_updates_count_input() -> None:
+    """In matrix mode adding a listed item again increases its shown count."""
+    item = ItemData(name="pizza", count=3, total_price=30.0)
+    group = GroupData()
+    group.add("alice")
+    participant_id = next(iter(group.participants))
+    at = AppTest.from_function(assignment_page)
+    at.session_state["receipt_data"] = ReceiptData(items={item.id: item}, total=30.0)
+    at.session_state["group_data"] = group
+    at.session_state["use_assignment_matrix"] = True
+    at.run()
+    for _ in range(2):
+        at.selectbox(key=f"item_selection_{participant_id}").select(item.id)
+        at.button(key=f"add_item_{participant_id}").click().run()
+    assert not at.exception
+
+    manager = at.session_state["split_manager"]
+    assert manager.get_items_assignment_total(item.id) == 2
+    count_input = at.number_input(key=f"count_input_{participant_id}_{item.id}")
+    assert count_input.value == 2
+
+    count_input.set_value(3).run()
+    assert manager.get_items_assignment_total(item.id) == 3
+    assert manager.is_consistent()
+
+
+def test_item_add_callback_allocates_from_session_namespace() -> None:
+    """The add callback runs before the script, its IDs still come from the session."""
+    item = ItemData(name="pizza", count=3, total_price=30.0)
+    group = GroupData()
+    group.add("alice")
+    participant_id = next(iter(group.participants))
+    default_counters = dict(DEFAULT_ID_NAMESPACE.counters)
+    at = AppTest.from_function(assignment_page)
+    at.session_state["receipt_data"] = ReceiptData(items={item.id: item}, total=30.0)
+    at.session_state["group_data"] = group
+    at.run()
+    at.selectbox(key=f"item_selection_{participant_id}").select(item.id)
+    at.button(key=f"add_item_{participant_id}").click().run()
+    assert not at.exception
+
+    manager = at.session_state["split_manager"]
+    (assigned_item,) = manager.get_participant_items_assignment_list(participant_id)
+    namespace = at.session_state["id_namespace"]
+    assert namespace.counters["AssignedItemIDGenerator"] == assigned_item.id
+    assert DEFAULT_ID_NAMESPACE.counters == default_counters
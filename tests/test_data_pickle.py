@@ -0,0 +1,108 @@
+import dataclasses
+import pickle
+
+import pytest
+
+from modules.data.assignment_data import (
+    AssignedItemData,
+    FrozenParticipantData,
+    GroupData,
+    ParticipantData,
+    SplitManager,
+)
+from modules.data.assignment_matrix import MatrixSplitManager
+from modules.data.base import Record
+from modules.data.receipt_data import FrozenItemData, ItemData, ReceiptData
+from modules.data.report_data import (
+    FrozenParticipantReportData,
+    FrozenPurchasedItemReportData,
+    ParticipantReportData,
+    PurchasedItemReportData,
+)
+
+
+def round_trip(obj: object) -> object:
+    """Pickle and load an object, like the session data."""
+    return pickle.loads(pickle.dumps(obj))
+
+
+def test_slotted_records_round_trip() -> None:
+    item = ItemData("soup", 2, 12.5)
+    purchased = PurchasedItemReportData(item.id, item.name, 1, item.unit_price)
+    records = [
+        item,
+        ParticipantData("a"),
+        purchased,
+        ParticipantReportData(7, "a", [purchased], 6.25, 7.0),
+    ]
+    for record in records:
+        restored = round_trip(record)
+        assert restored == record
+        assert not hasattr(restored, "__dict__")
+
+
+def test_frozen_variants_round_trip() -> None:
+    item = FrozenItemData("soup", 2, 12.5)
+    purchased = FrozenPurchasedItemReportData.from_item_assignment_data(
+        AssignedItemData(ItemData("soup", 2, 12.5), assigned_count=1)
+    )
+    records = [
+        item,
+        FrozenParticipantData("a"),
+        purchased,
+        FrozenParticipantReportData(7, "a", [purchased], 6.25, 7.0),
+    ]
+    assert item.unit_price == 6.25
+    assert purchased.total == 6.25
+    assert hash(item) == hash(FrozenItemData("soup", 2, 12.5, id=item.id))
+    for record in records:
+        restored = round_trip(record)
+        assert restored == record
+        assert not hasattr(restored, "__dict__")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            restored.name = "b"
+
+
+@dataclasses.dataclass(slots=True)
+class SingleFieldRecord(Record):
+    """Record with a single field."""
+
+    value: int
+
+
+def test_single_field_record_round_trip() -> None:
+    assert round_trip(SingleFieldRecord(3)) == SingleFieldRecord(3)
+
+
+def test_assigned_item_round_trip() -> None:
+    assigned = AssignedItemData(ItemData("soup", 2, 12.5), assigned_count=2)
+    restored = round_trip(assigned)
+    assert restored == assigned
+    assert restored.id == assigned.id
+    restored.set_count(1)
+    assert restored.assigned_count == 1
+    assert assigned.assigned_count == 2
+
+
+@pytest.mark.parametrize("manager_class", [SplitManager, MatrixSplitManager])
+def test_split_manager_round_trip(manager_class: type[SplitManager]) -> None:
+    items = [ItemData("soup", 2, 12.5), ItemData("tea", 1, 3.0)]
+    receipt = ReceiptData({item.id: item for item in items}, total=16.5)
+    group_data = GroupData()
+    group_data.add("a")
+    group_data.add("b")
+    manager = manager_class(group_data, receipt)
+    participant_id = manager.get_all_participants()[0].id
+    manager.add_item_assignment(participant_id, items[0].id)
+    manager.add_item_assignment(participant_id, items[1].id)
+
+    restored = round_trip(manager)
+
+    assert restored.get_all_participants() == manager.get_all_participants()
+    assert restored.receipt_data.items == receipt.items
+    # the restored assignments update the restored manager only
+    restored.get_participant_items_assignment_list(participant_id)[0].set_count(2)
+    assert restored.get_items_assignment_total(items[0].id) == 2
+    assert manager.get_items_assignment_total(items[0].id) == 1
+    assert restored.get_participant_subtotal(participant_id) == pytest.approx(15.5)
+    assert restored.is_consistent()
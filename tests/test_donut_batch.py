@@ -0,0 +1,27 @@
+from PIL import Image
+
+from modules.data.receipt_data import ReceiptData
+from modules.errors import AIError
+from modules.models.donut import MAX_BATCH_SIZE, DonutModel
+
+
+def test_failed_sub_batch_yields_errors_for_its_images() -> None:
+    model = DonutModel.__new__(DonutModel)
+    read_batches: list[int] = []
+
+    def read_batch(images: list[Image.Image]) -> list[ReceiptData]:
+        read_batches.append(len(images))
+        if len(read_batches) == 2:
+            raise RuntimeError("out of memory")
+        return [ReceiptData(items={}, total=float(img.width)) for img in images]
+
+    model._read_batch = read_batch
+    images = [Image.new("RGB", (idx + 1, 1)) for idx in range(MAX_BATCH_SIZE + 2)]
+    results = model.run_batch(images)
+
+    assert read_batches == [MAX_BATCH_SIZE, 2]
+    assert [r.total for r in results[:MAX_BATCH_SIZE]] == [
+        float(idx + 1) for idx in range(MAX_BATCH_SIZE)
+    ]
+    assert all(isinstance(r, AIError) for r in results[MAX_BATCH_SIZE:])
+    assert isinstance(results[-1].__cause__, RuntimeError)
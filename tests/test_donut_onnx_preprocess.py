@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+from transformers import DonutImageProcessor
+
+from modules.models.donut_onnx import DonutOnnxModel
+
+RECEIPT_IMAGE = Path(__file__).parent.parent / "receipt1.jpg"
+
+
+def onnx_model_without_weights(processor: DonutImageProcessor) -> DonutOnnxModel:
+    model = DonutOnnxModel.__new__(DonutOnnxModel)
+    # like the preprocessor_config.json saved by the export
+    model.preprocessor_config = processor.to_dict()
+    return model
+
+
+def sample_images() -> list[Image.Image]:
+    receipt = Image.open(RECEIPT_IMAGE)
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 256, (333, 517, 3), dtype=np.uint8))
+    return [
+        receipt,
+        receipt.resize((receipt.width // 3, receipt.height // 3)),
+        receipt.rotate(90, expand=True),
+        receipt.convert("L"),
+        noise,
+        noise.resize((960, 960)),
+        noise.resize((961, 1279)),
+    ]
+
+
+@pytest.mark.parametrize("do_align_long_axis", [False, True])
+def test_preprocess_matches_donut_processor(do_align_long_axis: bool) -> None:
+    processor = DonutImageProcessor(
+        size={"height": 1280, "width": 960},
+        do_align_long_axis=do_align_long_axis,
+        image_mean=[0.5, 0.5, 0.5],
+        image_std=[0.5, 0.5, 0.5],
+    )
+    model = onnx_model_without_weights(processor)
+    for image in sample_images():
+        expected = processor(image.convert("RGB"), return_tensors="np").pixel_values
+        pixel_values = model._preprocess(image)
+        assert pixel_values.shape == expected.shape == (1, 3, 1280, 960)
+        assert pixel_values.dtype == np.float32
+        np.testing.assert_allclose(pixel_values, expected, rtol=0, atol=1e-6)
@@ -0,0 +1,190 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from huggingface_hub import try_to_load_from_cache
+from PIL import Image
+
+from modules.models.donut import DonutModel
+from modules.models.donut_common import (
+    MODEL_NAME,
+    format_receipt_dict,
+    parse_prediction,
+)
+
+RECEIPT_IMAGE = Path(__file__).parent.parent / "receipt1.jpg"
+# special tokens removed by the ONNX backend, which has no transformers tokenizer
+ONNX_REMOVED_TOKENS = ["</s>", "<pad>"]
+
+PREDICTIONS = [
+    "<s_cord-v2><s_menu><s_nm>Nasi Goreng</s_nm><s_cnt>2</s_cnt>"
+    "<s_price>50,000</s_price><sep/><s_nm>Es Teh</s_nm><s_cnt>1</s_cnt>"
+    "<s_price>8,000</s_price></s_menu><s_total><s_total_price>58,000"
+    "</s_total_price></s_total></s>",
+    "<s_cord-v2><s_menu><s_nm>Latte</s_nm><s_cnt>1</s_cnt>"
+    "<s_price>4.50</s_price><sep/><s_nm>Bagel</s_nm><s_cnt>3</s_cnt>"
+    "<s_price>9.75</s_price></s_menu><s_total><s_total_price>14.25"
+    "</s_total_price></s_total></s><pad><pad>",
+]
+
+
+def receipt_rows(receipt) -> tuple[list[tuple], float]:
+    items = [(it.name, it.count, it.total_price) for it in receipt.items.values()]
+    return items, receipt.total
+
+
+@pytest.mark.parametrize(
+    "prediction, expected",
+    list(
+        zip(
+            PREDICTIONS,
+            [
+                ([("Nasi Goreng", 2, 50000.0), ("Es Teh", 1, 8000.0)], 58000.0),
+                ([("Latte", 1, 4.5), ("Bagel", 3, 9.75)], 14.25),
+            ],
+        )
+    ),
+)
+def test_common_parsing_reads_prices(prediction: str, expected: tuple) -> None:
+    receipt = format_receipt_dict(parse_prediction(prediction, ONNX_REMOVED_TOKENS))
+    assert receipt_rows(receipt) == expected
+
+
+def test_greedy_decoding_matches_torch_model() -> None:
+    pytest.importorskip("onnxruntime")
+    from modules.models.donut_onnx import DEFAULT_EXPORT_DIR, DonutOnnxModel
+
+    if not isinstance(try_to_load_from_cache(MODEL_NAME, "config.json"), str):
+        pytest.skip("Donut weights are not downloaded")
+    if not Path(DEFAULT_EXPORT_DIR, "encoder_model.onnx").exists():
+        pytest.skip("Donut is not exported to ONNX")
+
+    image = Image.open(RECEIPT_IMAGE).convert("RGB")
+    torch_receipt = DonutModel().run(image)
+    onnx_receipt = DonutOnnxModel().run(image)
+    assert receipt_rows(onnx_receipt) == receipt_rows(torch_receipt)
+
+
+class StubDecoder:
+    """Tiny attention decoder with the inputs and outputs of the exported graphs.
+
+    Without past, it reads the whole sequence and returns the cache of the
+    decoder and encoder attentions, like decoder_model.onnx. With past, it
+    reads the last token and the cache, and returns the updated decoder
+    cache, like decoder_with_past_model.onnx.
+    """
+
+    def __init__(self, weights: dict[str, np.ndarray], with_past: bool) -> None:
+        self.weights = weights
+        self.with_past = with_past
+        self.cache_names = ["0.decoder.key", "0.decoder.value"]
+        if not with_past:
+            self.cache_names += ["0.encoder.key", "0.encoder.value"]
+
+    def get_inputs(self) -> list[SimpleNamespace]:
+        names = ["input_ids", "encoder_attention_mask"]
+        if self.with_past:
+            names += [
+                f"past_key_values.0.{part}"
+                for part in ["decoder.key", "decoder.value"]
+                + ["encoder.key", "encoder.value"]
+            ]
+        else:
+            names += ["encoder_hidden_states"]
+        return [SimpleNamespace(name=name) for name in names]
+
+    def get_outputs(self) -> list[SimpleNamespace]:
+        names = ["logits"] + [f"present.{name}" for name in self.cache_names]
+        return [SimpleNamespace(name=name) for name in names]
+
+    def run(self, output_names: list[str], inputs: dict) -> list[np.ndarray]:
+        w = self.weights
+        assert set(inputs) == {it.name for it in self.get_inputs()}
+        embeddings = w["embedding"][inputs["input_ids"][0]]
+        keys = embeddings @ w["key"]
+        values = embeddings @ w["value"]
+        if self.with_past:
+            assert len(embeddings) == 1
+            keys = np.concatenate([inputs["past_key_values.0.decoder.key"], keys])
+            values = np.concatenate([inputs["past_key_values.0.decoder.value"], values])
+            encoder_keys = inputs["past_key_values.0.encoder.key"]
+            encoder_values = inputs["past_key_values.0.encoder.value"]
+        else:
+            encoder_states = inputs["encoder_hidden_states"][0]
+            encoder_keys = encoder_states @ w["key"]
+            encoder_values = encoder_states @ w["value"]
+        queries = embeddings @ w["query"]
+        # position of the queries in the sequence, for the causal mask
+        positions = np.arange(len(keys) - len(queries), len(keys))
+        scores = queries @ keys.T
+        scores[np.arange(len(keys)) > positions[:, np.newaxis]] = -np.inf
+        hidden = embeddings + _attend(scores, values)
+        hidden += _attend(queries @ encoder_keys.T, encoder_values)
+        logits = (hidden @ w["output"] + w["output_bias"])[np.newaxis]
+        cache = [keys, values, encoder_keys, encoder_values]
+        return [logits, *cache[: len(self.cache_names)]]
+
+
+def _attend(scores: np.ndarray, values: np.ndarray) -> np.ndarray:
+    weights = np.exp(scores - scores.max(axis=-1, keepdims=True))
+    return weights / weights.sum(axis=-1, keepdims=True) @ values
+
+
+def stub_onnx_model(seed: int) -> "DonutOnnxModel":
+    from modules.models.donut_onnx import DonutOnnxModel
+
+    rng = np.random.default_rng(seed)
+    vocab_size, dim = 20, 8
+    weights = {
+        name: rng.normal(size=(vocab_size if name == "embedding" else dim, dim))
+        for name in ["embedding", "query", "key", "value"]
+    }
+    weights["output"] = rng.normal(size=(dim, vocab_size)) * 3
+    # the special tokens are never predicted, so decoding runs to max_length
+    weights["output_bias"] = np.zeros(vocab_size)
+    weights["output_bias"][:4] = -1e9
+    encoder_states = rng.normal(size=(1, 6, dim))
+
+    model = DonutOnnxModel.__new__(DonutOnnxModel)
+    model.encoder = SimpleNamespace(run=lambda names, inputs: [encoder_states])
+    model.decoder = StubDecoder(weights, with_past=False)
+    model.decoder_with_past = StubDecoder(weights, with_past=True)
+    model.tokenizer = SimpleNamespace(
+        decode=lambda ids, skip_special_tokens: " ".join(map(str, ids))
+    )
+    model.start_token_id = 0
+    model.unk_token_id = 1
+    model.eos_token_id = 2
+    model.closing_token_id = 3
+    return model
+
+
+def decode_without_cache(model: "DonutOnnxModel", max_length: int) -> str:
+    """Greedy decoding that reads the whole sequence at every step."""
+    (encoder_states,) = model.encoder.run(["last_hidden_state"], {})
+    token_ids = [model.start_token_id]
+    while len(token_ids) < max_length:
+        logits, *_ = model.decoder.run(
+            ["logits"],
+            {
+                "input_ids": np.array([token_ids], dtype=np.int64),
+                "encoder_hidden_states": encoder_states,
+                "encoder_attention_mask": np.ones((1, 6), dtype=np.int64),
+            },
+        )
+        logits = logits[0, -1]
+        logits[model.unk_token_id] = -np.inf
+        token_ids.append(int(logits.argmax()))
+        if token_ids[-1] in (model.eos_token_id, model.closing_token_id):
+            break
+    return model.tokenizer.decode(token_ids, skip_special_tokens=False)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_cached_decoding_matches_full_decoding(seed: int) -> None:
+    model = stub_onnx_model(seed)
+    pixel_values = np.zeros((1, 3, 4, 4), dtype=np.float32)
+    cached = model._inference(pixel_values, max_length=30)
+    assert cached == decode_without_cache(model, max_length=30)
+    assert len(cached.split()) == 30
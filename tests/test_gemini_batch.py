@@ -0,0 +1,86 @@
+import json
+
+from google.api_core.exceptions import InvalidArgument, ResourceExhausted
+from langchain_core.messages import AIMessage, BaseMessage
+from PIL import Image
+
+from modules.errors import AIError
+from modules.models.gemini import BATCH_SCHEMA, GeminiModel
+
+
+def receipt_dict(total: float) -> dict:
+    return {"menus": [{"name": "tea", "count": 1, "price": total}], "total": total}
+
+
+class FakeGemini:
+    """Replaces GeminiModel._ainvoke, records the number of receipts per request."""
+
+    def __init__(self, error: Exception | None = None, max_receipts: int = 8) -> None:
+        self.error = error
+        self.max_receipts = max_receipts
+        self.requests: list[int] = []
+
+    async def __call__(
+        self, messages: list[BaseMessage], tokens: int, schema: dict, on_text=None
+    ) -> BaseMessage:
+        num_receipts = sum(
+            1 for part in messages[0].content if part.get("type") == "image_url"
+        )
+        self.requests.append(num_receipts)
+        if self.error is not None:
+            raise AIError("Gemini request failed") from self.error
+        if num_receipts > self.max_receipts:
+            raise AIError("Gemini request failed") from InvalidArgument(
+                "Request payload size exceeds the limit: 20971520 bytes."
+            )
+        if schema is BATCH_SCHEMA:
+            content = [{"index": i, **receipt_dict(i)} for i in range(num_receipts)]
+        else:
+            content = receipt_dict(0)
+        return AIMessage(content=json.dumps(content))
+
+
+def run_batch(fake: FakeGemini, num_images: int) -> list:
+    model = GeminiModel(api_key="test-key")
+    model._ainvoke = fake
+    return model.run_batch([Image.new("RGB", (32, 32))] * num_images)
+
+
+def test_quota_error_is_result_of_all_receipts() -> None:
+    fake = FakeGemini(error=ResourceExhausted("Quota exceeded"))
+    results = run_batch(fake, 8)
+    assert fake.requests == [8]
+    assert all(isinstance(result, AIError) for result in results)
+
+
+def test_permission_error_is_not_split() -> None:
+    fake = FakeGemini(error=InvalidArgument("API key not valid"))
+    results = run_batch(fake, 4)
+    assert fake.requests == [4]
+    assert all(isinstance(result, AIError) for result in results)
+
+
+def test_too_large_request_is_split() -> None:
+    fake = FakeGemini(max_receipts=2)
+    results = run_batch(fake, 8)
+    assert fake.requests[0] == 8
+    assert sorted(fake.requests[1:]) == [2, 2, 2, 2, 4, 4]
+    assert [result.total for result in results] == [0, 1, 0, 1, 0, 1, 0, 1]
+
+
+def test_unparsable_response_is_split() -> None:
+    fake = FakeGemini()
+    model = GeminiModel(api_key="test-key")
+    calls = 0
+
+    async def invoke(messages, tokens, schema, on_text=None) -> BaseMessage:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return AIMessage(content="not json")
+        return await fake(messages, tokens, schema, on_text)
+
+    model._ainvoke = invoke
+    results = model.run_batch([Image.new("RGB", (32, 32))] * 4)
+    assert sorted(fake.requests) == [2, 2]
+    assert [result.total for result in results] == [0, 1, 0, 1]
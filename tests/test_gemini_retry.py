@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from google.api_core.exceptions import (
+    DeadlineExceeded,
+    InvalidArgument,
+    NotFound,
+    PermissionDenied,
+    ResourceExhausted,
+    ServiceUnavailable,
+)
+from langchain_google_genai.chat_models import ChatGoogleGenerativeAIError
+
+from modules.models.gemini import _is_retryable
+
+
+class StatusError(Exception):
+    """Error of an HTTP client, with its status code."""
+
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def wrapped(err: Exception) -> Exception:
+    """Wrap an error like langchain does."""
+    wrapper = ChatGoogleGenerativeAIError(f"Invalid argument provided to Gemini: {err}")
+    wrapper.__cause__ = err
+    return wrapper
+
+
+@pytest.mark.parametrize(
+    "err",
+    [
+        asyncio.TimeoutError(),
+        ConnectionResetError("connection reset by peer"),
+        ResourceExhausted("Quota exceeded"),
+        ServiceUnavailable("The model is overloaded"),
+        DeadlineExceeded("Deadline exceeded"),
+        StatusError("Bad gateway", 502),
+        wrapped(ServiceUnavailable("The model is overloaded")),
+        Exception("503 The service is currently unavailable."),
+        Exception("Request failed with HTTP status code: 429"),
+        Exception("Error code: 500 - internal error"),
+    ],
+)
+def test_transient_errors_are_retried(err: Exception) -> None:
+    assert _is_retryable(err)
+
+
+@pytest.mark.parametrize(
+    "err",
+    [
+        InvalidArgument("Request contains an invalid argument."),
+        PermissionDenied("API key not valid. Please pass a valid API key."),
+        NotFound("models/gemini-2.5-flash is not found"),
+        StatusError("Unprocessable entity", 422),
+        wrapped(InvalidArgument("Request payload size exceeds the limit: 500 MB")),
+        ValueError("Unexpected total 502,000 in the receipt"),
+        ValueError("The receipt has 429 items, read in 503 ms"),
+        Exception("404 Not found, retry after 500 ms"),
+    ],
+)
+def test_other_errors_are_not_retried(err: Exception) -> None:
+    assert not _is_retryable(err)
@@ -0,0 +1,144 @@
+import contextvars
+import pickle
+import threading
+
+from streamlit.testing.v1 import AppTest
+
+from modules.data.assignment_data import ParticipantIDGenerator
+from modules.data.base import (
+    DEFAULT_ID_NAMESPACE,
+    IDNamespace,
+    current_id_namespace,
+)
+from modules.data.receipt_data import ItemIDGenerator
+
+NUM_THREADS = 8
+NUM_IDS = 500
+
+
+def run_in_threads(target, contexts: list[contextvars.Context]) -> None:
+    """Run the target in one thread per context, all starting together."""
+    barrier = threading.Barrier(len(contexts))
+
+    def run(context: contextvars.Context, idx: int) -> None:
+        barrier.wait()
+        context.run(target, idx)
+
+    threads = [
+        threading.Thread(target=run, args=(context, idx))
+        for idx, context in enumerate(contexts)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def allocate_ids(results: list[dict[str, list[int]]], idx: int) -> None:
+    """Allocate IDs of two generators, one at a time and in blocks."""
+    items, participants = [], []
+    for _ in range(NUM_IDS // 10):
+        items.extend(ItemIDGenerator.get_many(5))
+        items.extend(ItemIDGenerator.get() for _ in range(5))
+        participants.append(ParticipantIDGenerator.get())
+    results[idx] = {"items": items, "participants": participants}
+
+
+def test_namespaces_are_contiguous_per_context() -> None:
+    namespaces = [IDNamespace() for _ in range(NUM_THREADS)]
+    contexts = []
+    for namespace in namespaces:
+        context = contextvars.copy_context()
+        context.run(current_id_namespace.set, namespace)
+        contexts.append(context)
+    results: list[dict[str, list[int]]] = [{}] * NUM_THREADS
+
+    run_in_threads(lambda idx: allocate_ids(results, idx), contexts)
+
+    for namespace, result in zip(namespaces, results):
+        assert result["items"] == list(range(1, NUM_IDS + 1))
+        assert result["participants"] == list(range(1, NUM_IDS // 10 + 1))
+        assert namespace.counters == {
+            "ItemIDGenerator": NUM_IDS,
+            "ParticipantIDGenerator": NUM_IDS // 10,
+        }
+
+
+def test_shared_namespace_ids_are_unique() -> None:
+    namespace = IDNamespace()
+    context = contextvars.copy_context()
+    context.run(current_id_namespace.set, namespace)
+    results: list[dict[str, list[int]]] = [{}] * NUM_THREADS
+
+    # each thread gets a copy of the context, all with the same namespace
+    run_in_threads(
+        lambda idx: allocate_ids(results, idx),
+        [context.copy() for _ in range(NUM_THREADS)],
+    )
+
+    items = sorted(id for result in results for id in result["items"])
+    assert items == list(range(1, NUM_THREADS * NUM_IDS + 1))
+    for result in results:
+        # blocks from get_many are never interleaved with other threads
+        blocks = [result["items"][idx : idx + 5] for idx in range(0, NUM_IDS, 10)]
+        assert all(block == list(range(block[0], block[0] + 5)) for block in blocks)
+
+
+def test_namespace_pickle_keeps_counters() -> None:
+    namespace = IDNamespace()
+    namespace.allocate("ItemIDGenerator", 7)
+    namespace.allocate("ParticipantIDGenerator")
+
+    restored = pickle.loads(pickle.dumps(namespace))
+
+    assert restored.counters == namespace.counters
+    assert restored.counters is not namespace.counters
+    assert restored.allocate("ItemIDGenerator", 3) == 8
+    assert restored.allocate("AssignedItemIDGenerator") == 1
+    # the original is not changed by the restored copy
+    assert namespace.allocate("ItemIDGenerator") == 8
+
+
+def allocate_in_session() -> None:
+    import threading
+
+    import streamlit as st
+
+    from modules.data.base import copy_id_context
+    from modules.data.receipt_data import ItemData
+
+    ids = st.session_state.setdefault("ids", [])
+    ids.append(ItemData("tea", 1, 1.0).id)
+    # like the reading jobs, run in a thread without the script run context
+    context = copy_id_context()
+    thread = threading.Thread(
+        target=context.run, args=(lambda: ids.append(ItemData("tea", 1, 1.0).id),)
+    )
+    thread.start()
+    thread.join()
+
+
+def test_script_runs_allocate_from_session_namespace() -> None:
+    """Every rerun thread of a session allocates from the session namespace."""
+    default_counters = dict(DEFAULT_ID_NAMESPACE.counters)
+    for _ in range(2):
+        at = AppTest.from_function(allocate_in_session)
+        for _ in range(3):
+            at.run()
+            assert not at.exception
+        assert at.session_state["ids"] == list(range(1, 7))
+        assert at.session_state["id_namespace"].counters == {"ItemIDGenerator": 6}
+    assert DEFAULT_ID_NAMESPACE.counters == default_counters
+
+
+def test_thread_outside_streamlit_uses_context_namespace() -> None:
+    namespace = IDNamespace()
+    context = contextvars.copy_context()
+    context.run(current_id_namespace.set, namespace)
+    results: list[int] = []
+
+    run_in_threads(
+        lambda idx: results.append(ItemIDGenerator.get()), [context, context.copy()]
+    )
+
+    assert sorted(results) == [1, 2]
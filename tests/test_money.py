@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from modules.data.assignment_data import GroupData, SplitManager
+from modules.data.money import allocate_minor_units, from_minor_units, to_minor_units
+from modules.data.receipt_data import ItemData, ReceiptData
+from modules.data.report_data import ReportData
+
+
+def test_three_way_split_sums_to_total() -> None:
+    shares = allocate_minor_units(to_minor_units(100.00, "USD"), [1, 1, 1])
+    assert shares.tolist() == [3334, 3333, 3333]
+    assert from_minor_units(shares, "USD").tolist() == [33.34, 33.33, 33.33]
+
+
+def test_zero_decimal_currency() -> None:
+    assert to_minor_units([1000.4, 999.6], "JPY").tolist() == [1000, 1000]
+    shares = allocate_minor_units(to_minor_units(1000, "JPY"), [1, 1, 1])
+    assert shares.tolist() == [334, 333, 333]
+    assert from_minor_units(shares, "JPY").sum() == 1000
+
+
+@pytest.mark.parametrize(
+    "total, weights",
+    [
+        (10000, [0, 0, 0]),
+        (10000, [500, -500]),
+        (10000, [700, 300, -250]),
+        (-1001, [1, 2, 3]),
+        (-1001, [-1, -2, -3]),
+        (1001, [-1, -2, -3]),
+    ],
+)
+def test_shares_sum_to_total_for_any_weights(total: int, weights: list) -> None:
+    shares = allocate_minor_units(total, weights)
+    assert shares.dtype == np.int64
+    assert shares.sum() == total
+
+
+def test_weights_summing_to_zero_split_equally() -> None:
+    assert allocate_minor_units(10, [0, 0, 0]).tolist() == [4, 3, 3]
+    assert allocate_minor_units(10, [5, -5]).tolist() == [5, 5]
+    assert allocate_minor_units(10, []).tolist() == []
+
+
+def test_discount_weights_reduce_the_share() -> None:
+    shares = allocate_minor_units(1000, [1000, 1000, -500])
+    assert shares.sum() == 1000
+    assert shares.tolist() in ([667, 667, -334], [667, 666, -333])
+
+
+def test_random_shares_sum_to_total() -> None:
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        weights = rng.integers(-1000, 100000, size=rng.integers(1, 50))
+        total = int(rng.integers(-(10**9), 10**9))
+        shares = allocate_minor_units(total, weights)
+        assert shares.sum() == total
+        if weights.sum() != 0:
+            exact = total * weights / weights.sum()
+            assert np.all(np.abs(shares - exact) < 1)
+
+
+def test_report_totals_sum_to_receipt_total() -> None:
+    items = [
+        ItemData("soup", 3, 100.00),
+        ItemData("tea", 1, 10.01),
+        ItemData("discount", 1, -20.00),
+    ]
+    receipt = ReceiptData({item.id: item for item in items}, total=99.99)
+    group_data = GroupData()
+    for name in ["a", "b", "c"]:
+        group_data.add(name)
+    manager = SplitManager(group_data, receipt)
+    participants = manager.get_all_participants()
+    for participant in participants:
+        manager.add_item_assignment(participant.id, items[0].id)
+    manager.add_item_assignment(participants[0].id, items[1].id)
+    manager.add_item_assignment(participants[1].id, items[2].id)
+
+    report = ReportData.from_split_manager(manager, "USD")
+
+    totals = [r.purchased_total for r in report.participants_reports]
+    subtotals = [r.purchased_subtotal for r in report.participants_reports]
+    assert to_minor_units(totals, "USD").sum() == 9999
+    assert to_minor_units(subtotals, "USD").sum() == 9001
+    # 43.3433, 13.3333 and 33.3333, the tie of the remaining cent goes first
+    assert subtotals == pytest.approx([43.35, 13.33, 33.33])
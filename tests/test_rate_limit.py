@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from modules.models import gemini
+from modules.models.async_runner import ASYNC_RUNNER
+from modules.models.gemini import GeminiModel
+from modules.models.rate_limit import KeyRateScheduler, RateLimits
+
+
+class FakeClock:
+    """Clock that only moves when it is slept on."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        # let the tasks that are ready run first, they are not sleeping
+        for _ in range(10):
+            await asyncio.sleep(0)
+        self.now += seconds
+
+
+def make_scheduler(
+    clock: FakeClock, requests_per_minute: float, tokens_per_minute: float
+) -> KeyRateScheduler:
+    return KeyRateScheduler(
+        RateLimits(requests_per_minute, tokens_per_minute),
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+
+async def send_times(
+    clock: FakeClock, scheduler: KeyRateScheduler, requests: list[tuple[str, float]]
+) -> list[float]:
+    """Acquire all requests at once, returns the time each one is allowed."""
+
+    async def send(key: str, tokens: float) -> float:
+        await scheduler.acquire(key, tokens)
+        return clock.now
+
+    return list(await asyncio.gather(*(send(k, t) for k, t in requests)))
+
+
+def test_requests_over_rpm_are_queued() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_minute=2, tokens_per_minute=1e6)
+    times = asyncio.run(send_times(clock, scheduler, [("key", 10)] * 5))
+    assert times == pytest.approx([0, 0, 30, 60, 90])
+
+
+def test_tokens_over_tpm_are_queued() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_minute=100, tokens_per_minute=1000)
+    times = asyncio.run(send_times(clock, scheduler, [("key", 600)] * 3))
+    # 600 tokens are refilled in 36 seconds
+    assert times == pytest.approx([0, 12, 48])
+
+
+def test_keys_are_isolated() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_minute=1, tokens_per_minute=1e6)
+    requests = [("busy", 10)] * 3 + [("idle", 10)]
+    times = asyncio.run(send_times(clock, scheduler, requests))
+    assert times[:3] == pytest.approx([0, 60, 120])
+    assert scheduler.estimated_wait("idle") == 0.0
+    assert asyncio.run(send_times(clock, scheduler, [("idle", 10)])) == [clock.now]
+
+
+def test_estimated_wait_covers_queued_requests() -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_minute=2, tokens_per_minute=1e6)
+    waits = []
+
+    async def scenario() -> None:
+        await scheduler.acquire("key", 10)
+        await scheduler.acquire("key", 10)
+        assert scheduler.estimated_wait("key") == 0.0
+        queued = [asyncio.create_task(scheduler.acquire("key", 10)) for _ in range(3)]
+        await asyncio.sleep(0)
+        waits.append(scheduler.estimated_wait("key"))
+        await asyncio.gather(*queued)
+        waits.append(scheduler.estimated_wait("key"))
+
+    asyncio.run(scenario())
+    # the first queued request is sleeping, the next two need 60 seconds more
+    assert 30 <= waits[0] <= 90
+    assert waits[1] == 0.0
+
+
+def test_gemini_requests_over_quota_are_queued_not_failed(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_minute=2, tokens_per_minute=1e6)
+    monkeypatch.setattr(gemini, "_rate_scheduler", scheduler)
+    model = GeminiModel(api_key="test-key")
+    received_at: list[float] = []
+
+    async def fake_endpoint(messages, schema, on_text) -> BaseMessage:
+        received_at.append(clock.now)
+        return AIMessage(content="{}")
+
+    model._arequest = fake_endpoint
+
+    async def send_all() -> list[BaseMessage]:
+        messages = [HumanMessage(content="receipt")]
+        return await asyncio.gather(*(model._ainvoke(messages, 10) for _ in range(4)))
+
+    responses = ASYNC_RUNNER.run(send_all())
+    assert len(responses) == 4
+    assert received_at == pytest.approx([0, 0, 30, 60])
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+import types
+
+import pytest
+from PIL import Image
+
+from modules.data.receipt_data import ItemData, ReceiptData
+from modules.models.base import AIModel
+from modules.models.service import InferenceService
+
+
+class FakeModel(AIModel):
+    """Model that reads every image as the same receipt."""
+
+    def __init__(self, total: float) -> None:
+        self.total = total
+
+    def run(self, image: Image.Image) -> ReceiptData:
+        item = ItemData(name="coffee", count=2, total_price=self.total)
+        return ReceiptData(items={item.id: item}, total=self.total)
+
+
+def load_fake_model(**config) -> AIModel:
+    return FakeModel(**config)
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "modules.models.base",
+        "modules.models.loader",
+        "modules.models.service",
+        "modules.data.session_data",
+        "modules.data.report_data",
+        "modules.utils",
+    ],
+)
+def test_module_imports_first_in_fresh_process(module: str) -> None:
+    """Spawned workers import the model modules without the app imported."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {module}"], capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_service_runs_job_in_spawned_worker(monkeypatch: pytest.MonkeyPatch) -> None:
+    # spawned workers run the main script again, AppTest leaves its script there
+    monkeypatch.setitem(sys.modules, "__main__", types.ModuleType("__main__"))
+    service = InferenceService(load_fake_model, {"total": 12.5}, num_workers=1)
+    try:
+        receipt = service.submit(Image.new("RGB", (8, 8))).result(timeout=120)
+    finally:
+        service.shutdown()
+    assert receipt.total == 12.5
+    assert [it.name for it in receipt.items.values()] == ["coffee"]
+    assert service.stats.completed == 1
+    assert service.stats.failed == 0
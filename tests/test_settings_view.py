@@ -0,0 +1,32 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from modules.models.base import InferencePrecision, ModelNames
+from modules.views import view_settings
+
+
+def model_selection() -> None:
+    import streamlit as st
+
+    from modules.views.view_settings import SettingsData, model_selection_view
+
+    settings = model_selection_view(SettingsData())
+    st.session_state["selected_precision"] = settings.model_precision
+
+
+@pytest.mark.parametrize("experimental", [False, True])
+def test_precision_options_need_experimental_flag(
+    monkeypatch: pytest.MonkeyPatch, experimental: bool
+) -> None:
+    """Without the flag, int8 and bf16 cannot be selected nor kept."""
+    monkeypatch.setattr(view_settings, "EXPERIMENTAL_PRECISIONS", experimental)
+    at = AppTest.from_function(model_selection)
+    at.session_state["model_name"] = ModelNames.DONUT
+    at.session_state["model_precision"] = InferencePrecision.INT8
+    at.run()
+    assert not at.exception
+
+    labels = [it.label for it in at.selectbox]
+    assert ("Inference precision" in labels) == experimental
+    expected = InferencePrecision.INT8 if experimental else InferencePrecision.FP32
+    assert at.session_state["selected_precision"] == expected
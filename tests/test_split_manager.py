@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from modules.data.assignment_data import GroupData, SplitManager
+from modules.data.assignment_matrix import MatrixSplitManager
+from modules.data.receipt_data import ItemData, ReceiptData
+
+NUM_STEPS = 2000
+
+
+def build_manager(
+    manager_class: type[SplitManager], rng: random.Random
+) -> SplitManager:
+    """Build a manager with random participants and receipt items."""
+    items = [
+        ItemData(f"item {idx}", rng.randint(0, 4), rng.randint(0, 50000) / 100)
+        for idx in range(30)
+    ]
+    receipt = ReceiptData({item.id: item for item in items}, total=1234.5)
+    group_data = GroupData()
+    for idx in range(10):
+        group_data.add(f"participant {idx}")
+    return manager_class(group_data, receipt)
+
+
+def expected_differences(manager: SplitManager) -> dict[int, int]:
+    """Count the not assigned items from the listed assignments."""
+    differences = {item.id: item.count for item in manager.get_all_items()}
+    for participant in manager.get_all_participants():
+        for assigned in manager.get_participant_items_assignment_list(participant.id):
+            differences[assigned.item.id] -= assigned.assigned_count
+    return differences
+
+
+@pytest.mark.parametrize("manager_class", [SplitManager, MatrixSplitManager])
+@pytest.mark.parametrize("seed", range(5))
+def test_random_operations_keep_totals_consistent(
+    manager_class: type[SplitManager], seed: int
+) -> None:
+    rng = random.Random(seed)
+    manager = build_manager(manager_class, rng)
+    item_ids = manager.item_ids
+
+    for _ in range(NUM_STEPS):
+        participants = manager.get_all_participants()
+        if len(participants) == 0:
+            manager.group_data.add("newcomer")
+            continue
+        participant_id = rng.choice(participants).id
+        assigned = manager.get_participant_items_assignment_list(participant_id)
+        operation = rng.choices(
+            ["add", "set_count", "remove", "remove_participant", "add_participant"],
+            weights=[10, 10, 4, 1, 1],
+        )[0]
+        if operation == "add":
+            manager.add_item_assignment(participant_id, rng.choice(item_ids))
+        elif operation == "set_count" and len(assigned) > 0:
+            rng.choice(assigned).set_count(rng.randint(0, 5))
+        elif operation == "remove" and len(assigned) > 0:
+            idxs = rng.sample(range(len(assigned)), rng.randint(1, len(assigned)))
+            manager.remove_items_assignment(participant_id, idxs)
+        elif operation == "remove_participant":
+            # assignments listed before the removal must not change the totals
+            manager.remove_participant(participant_id)
+            if len(assigned) > 0:
+                rng.choice(assigned).set_count(rng.randint(0, 5))
+        elif operation == "add_participant":
+            manager.group_data.add("newcomer")
+
+        assert manager.is_consistent()
+        assert manager.get_assignment_differences() == expected_differences(manager)
+
+    assert manager.get_assigned_subtotal() == pytest.approx(
+        sum(
+            manager.get_participant_subtotal(participant.id)
+            for participant in manager.get_all_participants()
+        )
+    )
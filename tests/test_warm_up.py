@@ -0,0 +1,53 @@
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from modules.models import loader
+from modules.models.base import InferencePrecision, ModelNames
+from modules.models.registry import ModelKey
+
+
+@pytest.fixture
+def warmed_up_keys(monkeypatch: pytest.MonkeyPatch) -> list[ModelKey]:
+    """Record the warmed up models instead of loading them."""
+    keys: list[ModelKey] = []
+    monkeypatch.setattr(loader.MODEL_REGISTRY, "warm_up", keys.append)
+    st.cache_resource.clear()
+    yield keys
+    st.cache_resource.clear()
+
+
+def app_warm_up() -> None:
+    import app
+
+    app.warm_up_default_model()
+
+
+def settings_apply() -> None:
+    from modules.models.base import ModelNames
+    from modules.views.view_settings import SettingsData
+
+    SettingsData(model_name=ModelNames.DONUT).apply()
+
+
+def test_default_model_is_warmed_up_once(warmed_up_keys: list[ModelKey]) -> None:
+    """Reruns and new sessions do not warm up the default model again."""
+    for _ in range(2):
+        at = AppTest.from_function(app_warm_up)
+        at.session_state["model_name"] = ModelNames.DONUT
+        for _ in range(3):
+            at.run()
+            assert not at.exception
+    assert warmed_up_keys == [loader.get_default_model_key()]
+    assert warmed_up_keys[0].name == ModelNames.GEMINI
+
+
+def test_model_switch_is_warmed_up(warmed_up_keys: list[ModelKey]) -> None:
+    """Switching model warms up the new one, applying it again does not."""
+    at = AppTest.from_function(settings_apply)
+    for _ in range(3):
+        at.run()
+        assert not at.exception
+    assert warmed_up_keys == [
+        ModelKey.create(ModelNames.DONUT, precision=InferencePrecision.FP32)
+    ]